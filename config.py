@@ -81,7 +81,90 @@ TRANSLATION_MEMORY = {
     "similarity_threshold": 0.85,  # Порог схожести для поиска
     "max_results": 5,              # Максимум результатов поиска
     "context_window": 3,           # Количество предложений контекста
-    "enable_learning": True        # Включить обучение на переводах
+    "enable_learning": True,       # Включить обучение на переводах
+    "write_buffer_size": 64,       # Записей в буфере до пакетной записи в память
+    "chapter_cache_size": 32       # Глав в LRU-кэше контекста
+}
+
+# Компакция памяти переводов (python tools/context_manager.py --compact)
+TM_COMPACTION = {
+    "quality_floor": 60,           # Записи с quality_score ниже порога удаляются
+    "max_age_days": None,          # Удалять записи старше N дней (None — без ограничения)
+    "max_entries": 200000,         # Потолок размера: лишние удаляются по качеству и давности
+    "latency_sample_size": 20      # Строк для замера времени поиска до и после
+}
+
+# Хранилище векторов памяти переводов
+VECTOR_BACKEND = {
+    "backend": "auto",                 # "auto", "numpy" или "chromadb"
+    "numpy_max_entries": 50000,        # В режиме auto NumPy выбирается до этого размера памяти
+    "index_dir": "./translation_memory/vectors",
+    "dtype": "float32"                 # float16 вдвое экономит память ценой точности
+}
+
+# Дисковый кэш embeddings (хэш текста + модель → вектор), общий для всех коллекций
+EMBEDDING_CACHE = {
+    "enabled": True,
+    "cache_dir": "./translation_memory/embedding_cache",
+    "dtype": "float32"
+}
+
+# =============================================================================
+# НАСТРОЙКИ КЭШИРОВАНИЯ И ИНКРЕМЕНТАЛЬНОГО ПЕРЕВОДА
+# =============================================================================
+
+# Кэш DeepL: файл translations.json + журнал новых записей, общий для процессов
+DEEPL_CACHE = {
+    "cache_dir": "./deepl_cache",
+    "save_every": 10,              # Новых записей между дозаписями в журнал
+    "journal_merge_every": 1000,   # Строк журнала до слияния в translations.json
+    # Снимок кэша только для чтения (mmap) для параллельных рабочих процессов.
+    # Экспорт: python -m tools.deepl_cache --export-snapshot [путь]; None — обычный режим
+    "snapshot_path": os.getenv("DEEPL_CACHE_SNAPSHOT")
+}
+
+# Построчная карта предыдущего перевода (хэш строки → перевод + источник)
+INCREMENTAL_TRANSLATION = {
+    "enabled": True,                                 # Переводить только изменённые строки
+    "line_map_dir": "./translation_memory/line_maps" # Каталог карт строк
+}
+
+# Bloom-фильтр исходных строк памяти переводов и ключей кэша DeepL
+BLOOM_FILTER = {
+    "false_positive_rate": 0.01,             # Допустимая доля ложных срабатываний
+    "exact_lookup": True                     # Точный повтор строки главы — из памяти без поиска похожих
+}
+
+# Мемоизация пост-обработки (глоссарий, запрещённые слова, стили) по выходу MT
+POSTPROCESS_MEMO = {
+    "enabled": True,
+    "max_entries": 50000,                                  # Максимум записей в памяти
+    "memo_file": "./translation_memory/postprocess_memo.json",
+    "rules_check_interval": 1.0                            # Как часто (с) проверять изменение правил
+}
+
+# Мемо ответов глоссария и таблицы фраз в OptimizedTranslationMemoryManager
+LOOKUP_MEMO = {
+    "glossary_max_entries": 1000,
+    "phrase_max_entries": 1000
+}
+
+# Скомпилированная справочная база (translation_memory.json), общая для всех менеджеров
+REFERENCE_BUNDLE = {
+    "cache_enabled": True,     # Кэш скомпилированной базы рядом с JSON (*.bundle.pickle)
+    "check_interval": 1.0      # Как часто (с) проверять изменение файла
+}
+
+# Детектор персонажей: мемо результатов по хэшу строки и версии профилей
+CHARACTER_DETECTION = {
+    "memo_max_entries": 20000
+}
+
+# Хронология говорящих по главе: кто говорит/думает в каждой строке
+SPEAKER_TIMELINE = {
+    "max_chapters": 64,          # Хронологий глав в кэше (ключ — хэш главы)
+    "max_narration_gap": 2,      # Строк повествования без имени, после которых говорящий сбрасывается
+    "carried_confidence": 0.7    # Максимальная уверенность для унаследованного говорящего
 }
 
 # =============================================================================
@@ -102,6 +185,58 @@ BANNED_ARCHAISMS = [
     "осуществлять", "производить впечатление", "испытывать чувство"
 ]
 
+# Современные замены архаизмов (StyleModernizer, ChapterTranslator)
+ARCHAISM_REPLACEMENTS = {
+    "воззрел": "посмотрел",
+    "молвил": "сказал",
+    "вопрошал": "спрашивал",
+    "весьма": "очень",
+    "чрезвычайно": "очень",
+    "дабы": "чтобы",
+    "ибо": "потому что",
+    "сей": "этот",
+    "сия": "эта",
+    "оный": "тот",
+    "ныне": "сейчас",
+    "отнюдь": "совсем не",
+    "непременно": "обязательно",
+    "воистину": "правда",
+    "осуществлять": "делать",
+    "производить впечатление": "впечатлять",
+    "испытывать чувство": "чувствовать"
+}
+
+# Кальки и канцеляризмы → естественный вариант
+CALQUES = {
+    "крайне": "очень",
+    "слева и справа": "направо и налево",
+    "совершенна": "идеальна",
+    "На его взгляд": "С его точки зрения",
+    "резюмировал": "размышлял",
+    "осуществлять": "делать",
+    "производить впечатление": "впечатлять",
+    "испытывать чувство": "чувствовать"
+}
+
+# Формальные конструкции в диалогах → разговорный вариант (подсказки линтера и валидатора;
+# модернизатор применяет собственную, более осторожную таблицу замен)
+FORMAL_DIALOGUE = {
+    "Я собираюсь": "Буду",
+    "Позвольте мне": "Дай мне",
+    "Не могли бы вы": "Можешь",
+    "Я хотел бы": "Хочу",
+    "Кажется, что": "Похоже",
+    "Я боюсь, что": "Боюсь",
+    "Позвольте мне выразить": "Спасибо",
+    "Не соблаговолите ли вы": "Не могли бы вы",
+    "Осмелюсь спросить": "Можно спросить?",
+    "Сие деяние недопустимо": "Так нельзя",
+    "Воистину могущественный": "Реально мощный"
+}
+
+# Признаки естественной разговорной речи (повышают оценку качества)
+NATURAL_DIALOGUE_MARKERS = ["Дай мне", "Можешь", "Хочу", "Похоже"]
+
 # Современные замены для молодых персонажей
 YOUTH_SLANG = {
     "очень мощный": "крутой",
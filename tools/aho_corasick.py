@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Автомат Ахо–Корасик для поиска множества подстрок за один проход по тексту
+"""
+
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class AhoCorasick:
+    """Автомат по набору шаблонов; шаблон задаётся индексом в исходном списке"""
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = list(patterns)
+
+        # Узел: переходы, ссылка неудачи, индексы шаблонов, оканчивающихся в узле
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for index, pattern in enumerate(self.patterns):
+            if pattern:
+                self._insert(pattern, index)
+        self._build_failure_links()
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def _insert(self, pattern: str, index: int):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(index)
+
+    def _build_failure_links(self):
+        """BFS по бору: ссылки неудачи и объединение выходов по ним"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Все вхождения шаблонов: (позиция конца вхождения, индекс шаблона)"""
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in output[node]:
+                yield position, index
+
+    def longest_match(self, text: str) -> Optional[int]:
+        """Индекс самого длинного найденного шаблона (при равной длине — первого в списке)"""
+        best = None
+        best_length = 0
+        for _, index in self.iter_matches(text):
+            length = len(self.patterns[index])
+            if length > best_length or (length == best_length and index < best):
+                best, best_length = index, length
+        return best
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bloom-фильтр для быстрых отрицательных ответов
+Позволяет пропускать дорогие поиски в кэше и памяти переводов для строк,
+которых там гарантированно нет
+"""
+
+import os
+import math
+import struct
+import hashlib
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+BLOOM_MAGIC = b'BLMF'
+
+# magic, число хэш-функций, ёмкость, число добавленных ключей, число бит, FPR, отпечаток источника
+_HEADER = struct.Struct('<4sIQQQd32s')
+
+
+class BloomFilter:
+    """Классический Bloom-фильтр с двойным хэшированием
+
+    "Нет" — точный ответ, "да" — с вероятностью ложного срабатывания
+    не выше false_positive_rate, пока число ключей не превышает capacity.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float = 0.01):
+        self.capacity = max(int(capacity), 1)
+        self.false_positive_rate = false_positive_rate
+
+        self.num_bits = max(8, int(math.ceil(
+            -self.capacity * math.log(false_positive_rate) / (math.log(2) ** 2)
+        )))
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+        # Отпечаток данных, из которых построен фильтр (для проверки актуальности)
+        self.source_fingerprint = ''
+
+    @classmethod
+    def from_keys(cls, keys: Iterable[str], false_positive_rate: float = 0.01,
+                  capacity: Optional[int] = None) -> 'BloomFilter':
+        """Построить фильтр по набору ключей (с запасом ёмкости на рост)"""
+        keys = list(keys)
+        bloom = cls(capacity or max(len(keys) * 2, 1024), false_positive_rate)
+        for key in keys:
+            bloom.add(key)
+        return bloom
+
+    def _positions(self, key: str):
+        """Позиции бит ключа: h1 + i·h2 (Kirsch–Mitzenmacher)"""
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        num_bits = self.num_bits
+        return [(h1 + i * h2) % num_bits for i in range(self.num_hashes)]
+
+    def add(self, key: str):
+        """Добавить ключ"""
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def is_saturated(self) -> bool:
+        """Фильтр переполнен и пора его перестроить"""
+        return self.count > self.capacity
+
+    def save(self, path: Union[str, Path]):
+        """Сохранить фильтр в бинарный файл (атомарно)"""
+        path = str(path)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(
+                BLOOM_MAGIC, self.num_hashes, self.capacity, self.count,
+                self.num_bits, self.false_positive_rate,
+                self.source_fingerprint.encode('ascii')[:32].ljust(32, b'\0')
+            ))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> Optional['BloomFilter']:
+        """Загрузить фильтр; None, если файла нет или он повреждён"""
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(_HEADER.size)
+                magic, num_hashes, capacity, count, num_bits, fp_rate, fingerprint = _HEADER.unpack(header)
+                if magic != BLOOM_MAGIC:
+                    return None
+                bits = bytearray(f.read())
+        except (OSError, struct.error):
+            return None
+
+        if len(bits) != (num_bits + 7) // 8:
+            return None
+
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.false_positive_rate = fp_rate
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.bits = bits
+        bloom.count = count
+        bloom.source_fingerprint = fingerprint.rstrip(b'\0').decode('ascii')
+        return bloom
+
+
+def test_bloom_filter():
+    """Тестирование Bloom-фильтра"""
+    print("🧪 ТЕСТИРОВАНИЕ BLOOM-ФИЛЬТРА")
+    print("=" * 50)
+
+    keys = [f"key-{i}" for i in range(10000)]
+    bloom = BloomFilter.from_keys(keys, false_positive_rate=0.01)
+
+    assert all(key in bloom for key in keys), "Ложноотрицательный ответ"
+
+    probes = [f"missing-{i}" for i in range(10000)]
+    false_positives = sum(1 for key in probes if key in bloom)
+    print(f"Бит: {bloom.num_bits}, хэш-функций: {bloom.num_hashes}")
+    print(f"Ложных срабатываний: {false_positives / len(probes):.2%}")
+
+    print("✅ Тестирование завершено")
+
+if __name__ == "__main__":
+    test_bloom_filter()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Неизменяемый снимок кэша переводов для отображения в память (mmap)
+Рабочие процессы читают один файл через page cache ОС, не разбирая JSON
+и не копируя кэш в собственную память
+
+Формат файла (little-endian):
+    заголовок   magic 'DLSN', версия (uint32), число записей N (uint32)
+    ключи       N × 16 байт — отсортированные md5-дайджесты ключей
+    индекс      N × (offset uint64, length uint32, timestamp float64)
+    данные      UTF-8 переводы подряд
+"""
+
+import os
+import mmap
+import struct
+import hashlib
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+SNAPSHOT_MAGIC = b'DLSN'
+SNAPSHOT_VERSION = 1
+
+_HEADER = struct.Struct('<4sII')
+_INDEX_ENTRY = struct.Struct('<QId')
+_KEY_SIZE = 16
+
+
+def write_cache_snapshot(entries: Dict[str, Tuple[str, float]], path: Union[str, Path]) -> int:
+    """Записать снимок: {md5-ключ (hex) → (перевод, timestamp)}
+
+    Возвращает число записанных записей. Файл заменяется атомарно.
+    """
+    items = sorted((bytes.fromhex(key), value) for key, value in entries.items())
+
+    index = bytearray()
+    payload = bytearray()
+    for _, (translation, timestamp) in items:
+        encoded = translation.encode('utf-8')
+        index += _INDEX_ENTRY.pack(len(payload), len(encoded), timestamp)
+        payload += encoded
+
+    path = str(path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(items)))
+        f.write(b''.join(key for key, _ in items))
+        f.write(index)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    return len(items)
+
+
+class CacheSnapshot:
+    """Читатель снимка: бинарный поиск по ключам прямо в mmap"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            self.close()
+            raise ValueError(f"Неподдерживаемый формат снимка кэша: {self.path}")
+
+        self.count = count
+        self._keys_offset = _HEADER.size
+        self._index_offset = self._keys_offset + count * _KEY_SIZE
+        self._payload_offset = self._index_offset + count * _INDEX_ENTRY.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _find(self, digest: bytes) -> int:
+        """Бинарный поиск дайджеста; -1, если ключа нет"""
+        mm = self._mm
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self._keys_offset + mid * _KEY_SIZE
+            probe = mm[start:start + _KEY_SIZE]
+            if probe < digest:
+                lo = mid + 1
+            elif probe > digest:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """Получить (перевод, timestamp) по md5-ключу (hex)"""
+        position = self._find(bytes.fromhex(key))
+        if position < 0:
+            return None
+
+        offset, length, timestamp = _INDEX_ENTRY.unpack_from(
+            self._mm, self._index_offset + position * _INDEX_ENTRY.size
+        )
+        start = self._payload_offset + offset
+        return self._mm[start:start + length].decode('utf-8'), timestamp
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(bytes.fromhex(key)) >= 0
+
+    def iter_keys(self) -> Iterator[str]:
+        """Перебрать все ключи снимка (hex)"""
+        for i in range(self.count):
+            start = self._keys_offset + i * _KEY_SIZE
+            yield self._mm[start:start + _KEY_SIZE].hex()
+
+    def fingerprint(self) -> str:
+        """Отпечаток файла снимка (для проверки производных индексов)"""
+        stat = os.stat(self.path)
+        return hashlib.md5(f"{self.count}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+
+    def close(self):
+        """Закрыть отображение и файл"""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
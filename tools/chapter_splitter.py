@@ -6,18 +6,36 @@
 """
 
 import re
-from typing import List, Dict, Any, Tuple
-from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple
 
-@dataclass
 class TextSegment:
-    """Сегмент текста с метаданными"""
-    content: str
-    segment_type: str  # 'paragraph', 'dialogue', 'description', 'system'
-    line_number: int
-    character: str = None
-    is_dialogue: bool = False
-    is_system: bool = False
+    """Сегмент текста с метаданными
+    
+    Класс со __slots__ вместо dataclass: на строку главы создаётся сегмент,
+    без __dict__ они заметно легче. Конструктор, сравнение и repr — как у dataclass.
+    """
+    __slots__ = ('content', 'segment_type', 'line_number', 'character', 'is_dialogue', 'is_system')
+    
+    def __init__(self, content: str, segment_type: str, line_number: int,
+                 character: Optional[str] = None, is_dialogue: bool = False, is_system: bool = False):
+        self.content = content
+        self.segment_type = segment_type  # 'paragraph', 'dialogue', 'description', 'system'
+        self.line_number = line_number
+        self.character = character
+        self.is_dialogue = is_dialogue
+        self.is_system = is_system
+    
+    def _fields(self) -> Tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+    
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._fields() == other._fields()
+    
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{self.__class__.__name__}({fields})"
 
 class ChapterSplitter:
     """Разделитель глав на логические сегменты"""
@@ -44,6 +62,36 @@ class ChapterSplitter:
             'Ду Гуюнь', 'Du Guyun',
             'Старейшина', 'Elder'
         ]
+        
+        self._compile_patterns()
+    
+    def _compile_patterns(self):
+        """Скомпилировать паттерны: одно выражение на класс (вызывать после их изменения)"""
+        self._dialogue_regex = self._join_patterns(self.dialogue_patterns)
+        self._system_regex = self._join_patterns(self.system_patterns)
+        self._system_regex_ci = self._join_patterns(self.system_patterns, re.IGNORECASE)
+    
+    @staticmethod
+    def _join_patterns(patterns: List[str], flags: int = 0) -> Optional["re.Pattern"]:
+        """Одно выражение из списка альтернатив (None для пустого списка)"""
+        if not patterns:
+            return None
+        return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), flags)
+    
+    def _classify(self, line: str, system_regex: Optional["re.Pattern"] = None) -> Tuple[str, Optional[str], bool, bool]:
+        """Один проход по строке: (тип сегмента, персонаж, диалог, системное сообщение)"""
+        system_regex = system_regex or self._system_regex
+        is_dialogue = self._dialogue_regex is not None and self._dialogue_regex.search(line) is not None
+        is_system = system_regex is not None and system_regex.search(line) is not None
+        
+        if is_dialogue:
+            segment_type = 'dialogue'
+        elif is_system:
+            segment_type = 'system'
+        else:
+            segment_type = 'description'
+        
+        return segment_type, self._detect_character(line), is_dialogue, is_system
     
     def split_by_paragraphs(self, text: str) -> List[str]:
         """Разбить текст на параграфы по двойным переносам"""
@@ -54,34 +102,19 @@ class ChapterSplitter:
         """Разбить текст построчно с сохранением структуры"""
         lines = text.split('\n')
         segments = []
+        classify = self._classify
         
         for i, line in enumerate(lines, 1):
             # Убираем только \r, оставляем \n для сохранения структуры
-            original_line = line
             line = line.rstrip('\r')
             
-            # Пустая строка - это строка, которая содержит только пробелы и \n
-            if not line.strip() or line == '\n':
-                segments.append(TextSegment(
-                    content='',
-                    segment_type='empty_line',
-                    line_number=i
-                ))
+            # Пустая строка - это строка, которая содержит только пробелы
+            if not line.strip():
+                segments.append(TextSegment('', 'empty_line', i))
             else:
-                # Определяем тип сегмента
-                segment_type = self._detect_segment_type(line)
-                character = self._detect_character(line)
-                is_dialogue = self._is_dialogue(line)
-                is_system = self._is_system(line)
-                
-                segments.append(TextSegment(
-                    content=line,
-                    segment_type=segment_type,
-                    line_number=i,
-                    character=character,
-                    is_dialogue=is_dialogue,
-                    is_system=is_system
-                ))
+                # Тип, персонаж и флаги — за один разбор строки
+                segment_type, character, is_dialogue, is_system = classify(line)
+                segments.append(TextSegment(line, segment_type, i, character, is_dialogue, is_system))
         
         return segments
     
@@ -89,12 +122,7 @@ class ChapterSplitter:
         """Определить тип сегмента"""
         if not line.strip():
             return 'empty_line'
-        elif any(re.search(pattern, line) for pattern in self.dialogue_patterns):
-            return 'dialogue'
-        elif any(re.search(pattern, line) for pattern in self.system_patterns):
-            return 'system'
-        else:
-            return 'description'
+        return self._classify(line)[0]
     
     def _detect_character(self, line: str) -> str:
         """Определить персонажа в строке"""
@@ -105,11 +133,11 @@ class ChapterSplitter:
     
     def _is_dialogue(self, line: str) -> bool:
         """Проверить, является ли строка диалогом"""
-        return any(re.search(pattern, line) for pattern in self.dialogue_patterns)
+        return self._dialogue_regex is not None and self._dialogue_regex.search(line) is not None
     
     def _is_system(self, line: str) -> bool:
         """Проверить, является ли строка системным сообщением"""
-        return any(re.search(pattern, line) for pattern in self.system_patterns)
+        return self._system_regex is not None and self._system_regex.search(line) is not None
     
     def split_by_sentences(self, text: str) -> List[str]:
         """Разбить текст на предложения"""
@@ -152,30 +180,14 @@ class ChapterSplitter:
     
     def _analyze_segment(self, text: str, line_number: int) -> TextSegment:
         """Анализировать сегмент и определить его тип"""
-        segment_type = 'description'
-        character = None
-        is_dialogue = False
-        is_system = False
-        
-        # Проверяем на диалог
-        for pattern in self.dialogue_patterns:
-            if re.search(pattern, text):
-                segment_type = 'dialogue'
-                is_dialogue = True
-                break
-        
-        # Проверяем на системные уведомления
-        for pattern in self.system_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                segment_type = 'system'
-                is_system = True
-                break
-        
-        # Определяем персонажа
-        for indicator in self.character_indicators:
-            if indicator in text:
-                character = indicator
-                break
+        # Системные уведомления здесь ищутся без учёта регистра и важнее диалога
+        _, character, is_dialogue, is_system = self._classify(text, self._system_regex_ci)
+        if is_system:
+            segment_type = 'system'
+        elif is_dialogue:
+            segment_type = 'dialogue'
+        else:
+            segment_type = 'description'
         
         return TextSegment(
             content=text,
@@ -7,18 +7,27 @@
 
 import os
 import json
+import time
+import hashlib
+from collections import Counter
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 
-from config import get_api_key, TRANSLATION_MEMORY
+from config import (get_api_key, TRANSLATION_MEMORY, INCREMENTAL_TRANSLATION, POSTPROCESS_MEMO,
+                    DEEPL_CACHE, BLOOM_FILTER)
 from tools.context_manager import TranslationMemoryManager
 from tools.consultation_base import DeepLConsultationBase
 from tools.chapter_splitter import ChapterSplitter, TextSegment
 from tools.deepl_cache import CachedDeepLTranslator
 from tools.error_handler import ErrorHandler, ErrorCategory, ErrorSeverity, handle_errors
 from tools.character_detector import CharacterDetector, CharacterType
+from tools.speaker_timeline import SpeakerTimelineAnalyzer, SpeakerTimeline
 from tools.performance_optimizer import PerformanceOptimizer, optimize_performance
+from tools.line_map import LineTranslationMap
+from tools.style_rules import get_style_engine
+from tools.lru_cache import LRUCache
+from tools.file_lock import atomic_write_json
 
 @dataclass
 class TranslationContext:
@@ -51,7 +60,13 @@ class ChapterTranslator:
         self.splitter = ChapterSplitter()
         
         # Кэшированный DeepL переводчик
-        self.cached_translator = CachedDeepLTranslator()
+        self.cached_translator = CachedDeepLTranslator(
+            DEEPL_CACHE["cache_dir"],
+            snapshot_path=DEEPL_CACHE["snapshot_path"],
+            bloom_fp_rate=BLOOM_FILTER["false_positive_rate"],
+            save_every=DEEPL_CACHE["save_every"],
+            journal_merge_every=DEEPL_CACHE["journal_merge_every"]
+        )
         
         # Обработчик ошибок
         self.error_handler = ErrorHandler()
@@ -59,12 +74,181 @@ class ChapterTranslator:
         # Детектор персонажей
         self.character_detector = CharacterDetector()
         
+        # Хронология говорящих текущей главы (строится один раз на главу)
+        self.speaker_analyzer = SpeakerTimelineAnalyzer(self.character_detector)
+        self._speaker_timeline: Optional[SpeakerTimeline] = None
+        
         # Оптимизатор производительности
         self.performance_optimizer = PerformanceOptimizer()
         
+        # Общие стилевые правила (архаизмы, разговорные конструкции)
+        self.style_engine = get_style_engine()
+        
         # Локальный кэш для быстрого доступа
         self.translation_cache = {}
         
+        # Похожие переводы, найденные одним пакетным запросом до перевода главы
+        self._similar_prefetch: Dict[str, List[Dict]] = {}
+        
+        # Переводы из окна последних глав (готовится памятью в finish_chapter)
+        self._window_translations: Dict[str, Dict] = {}
+        
+        # Мемо пост-обработки: (выход MT, строка, контекст, версия правил) → результат
+        self.postprocess_memo = LRUCache(POSTPROCESS_MEMO["max_entries"])
+        
+        # Срабатывания правил пост-обработки: вид правила → {термин: число замен}
+        self.rule_hits: Dict[str, Counter] = {'glossary': Counter(), 'forbidden': Counter()}
+        self._memo_dirty = False
+        # Версия правил — по загруженным значениям (справочная база, стилевые правила
+        # из config.py, профили персонажей), а не по файлам на диске
+        self._rules_checked_at = time.monotonic()
+        self._rules_sources = self._rules_sources_versions()
+        self.rules_version = self._compute_rules_version()
+        self._load_postprocess_memo()
+        
+    def _rules_sources_versions(self) -> Tuple[str, ...]:
+        """Версии правил, которые действительно применяет пост-обработка"""
+        return (
+            self.memory_manager.reference.version,
+            self.style_engine.version,
+            self.character_detector.profiles_version
+        )
+    
+    def _compute_rules_version(self) -> str:
+        """Хэш справочной базы, стилевых правил и профилей персонажей"""
+        return hashlib.md5('\x1f'.join(self._rules_sources).encode('utf-8')).hexdigest()
+    
+    def _check_rules_changed(self):
+        """Сбросить мемо, если изменились применяемые правила
+        
+        Справочная база перечитывается при изменении translation_memory.json;
+        правила из config.py загружаются при импорте, поэтому правка config.py
+        вступает в силу (и меняет версию) только в новом процессе.
+        """
+        now = time.monotonic()
+        if now - self._rules_checked_at < POSTPROCESS_MEMO["rules_check_interval"]:
+            return
+        self._rules_checked_at = now
+        
+        sources = self._rules_sources_versions()
+        if sources == self._rules_sources:
+            return
+        
+        self._rules_sources = sources
+        print("🔄 Правила пост-обработки изменились, мемо сброшено")
+        self.rules_version = self._compute_rules_version()
+        self.postprocess_memo.clear()
+        self.translation_cache.clear()
+        self._memo_dirty = True
+    
+    def _load_postprocess_memo(self):
+        """Загрузить мемо пост-обработки, если оно построено по текущим правилам"""
+        memo_file = POSTPROCESS_MEMO["memo_file"]
+        if not POSTPROCESS_MEMO["enabled"] or not os.path.exists(memo_file):
+            return
+        try:
+            with open(memo_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('rules_version') != self.rules_version:
+                return
+            for key, value in data.get('entries', {}).items():
+                # (перевод, оценка качества, срабатывания правил)
+                if len(value) == 3:
+                    self.postprocess_memo.put(key, tuple(value))
+        except Exception as e:
+            print(f"⚠️ Ошибка загрузки мемо пост-обработки: {e}")
+    
+    def _save_postprocess_memo(self):
+        """Сохранить мемо пост-обработки на диск"""
+        if not POSTPROCESS_MEMO["enabled"] or not self._memo_dirty:
+            return
+        try:
+            memo_file = POSTPROCESS_MEMO["memo_file"]
+            os.makedirs(os.path.dirname(memo_file) or '.', exist_ok=True)
+            atomic_write_json(memo_file, {
+                'rules_version': self.rules_version,
+                'entries': {key: list(value) for key, value in self.postprocess_memo.items()}
+            }, ensure_ascii=False)
+            self._memo_dirty = False
+        except Exception as e:
+            print(f"⚠️ Ошибка сохранения мемо пост-обработки: {e}")
+    
+    def _speaker_of(self, segment: TextSegment) -> Tuple[CharacterType, float]:
+        """Говорящий в строке: из хронологии главы, вне главы — детектором по строке"""
+        if self._speaker_timeline is not None:
+            turn = self._speaker_timeline.turn_at(segment.line_number, segment.content)
+            if turn is not None:
+                return turn.character, turn.confidence
+        return self.character_detector.detect_character_from_text(segment.content)
+    
+    def _cache_key(self, segment: TextSegment, context: TranslationContext) -> str:
+        """Ключ локального кэша: одна и та же реплика у разных говорящих переводится по-разному"""
+        speaker, _ = self._speaker_of(segment)
+        return f"{segment.content}_{context.translation_style}_{speaker.value}"
+    
+    def _postprocess_key(self, base_translation: str, segment: TextSegment,
+                         context: TranslationContext) -> str:
+        """Ключ мемо пост-обработки"""
+        speaker, confidence = self._speaker_of(segment)
+        parts = (
+            self.rules_version, base_translation, segment.content, segment.character or '',
+            speaker.value, f"{confidence:.2f}",
+            context.current_scene or '', context.emotional_tone or '', context.translation_style
+        )
+        return hashlib.md5('\x1f'.join(parts).encode('utf-8')).hexdigest()
+    
+    def _postprocess(self, base_translation: str, segment: TextSegment,
+                     context: TranslationContext) -> Tuple[str, float]:
+        """Пост-обработка выхода MT: глоссарий, запрещённые слова, стиль, контекст"""
+        if POSTPROCESS_MEMO["enabled"]:
+            memo_key = self._postprocess_key(base_translation, segment, context)
+            memoized = self.postprocess_memo.get(memo_key)
+            if memoized is not None:
+                adapted_translation, quality_score, hits = memoized
+                self._record_rule_hits(hits)
+                return adapted_translation, quality_score
+        
+        # Применяем глоссарий
+        base_translation, glossary_hits = self._apply_glossary(base_translation)
+        hits = {'glossary': glossary_hits}
+        
+        # Проверяем запрещенные слова
+        base_translation, forbidden_hits = self._check_forbidden_words(base_translation)
+        hits['forbidden'] = forbidden_hits
+        
+        # Применяем стили персонажей (говорящий — из хронологии главы)
+        character_type, confidence = self._speaker_of(segment)
+        if character_type != CharacterType.UNKNOWN:
+            base_translation = self._apply_character_style(base_translation, character_type.value)
+        
+        # Адаптируем под текущий контекст
+        adapted_translation = self._adapt_translation(
+            base_translation, segment, context
+        )
+        
+        quality_score = self._calculate_quality_score(adapted_translation)
+        self._record_rule_hits(hits)
+        if POSTPROCESS_MEMO["enabled"]:
+            self.postprocess_memo.put(memo_key, (adapted_translation, quality_score, hits))
+            self._memo_dirty = True
+        return adapted_translation, quality_score
+    
+    def _record_rule_hits(self, hits: Dict[str, Dict[str, int]]):
+        """Учесть срабатывания правил пост-обработки одной строки"""
+        for kind, counts in hits.items():
+            if counts:
+                self.rule_hits.setdefault(kind, Counter()).update(counts)
+    
+    def _snapshot_rule_hits(self) -> Dict[str, Counter]:
+        return {kind: Counter(counts) for kind, counts in self.rule_hits.items()}
+    
+    def _rule_hits_since(self, snapshot: Dict[str, Counter]) -> Dict[str, Dict[str, int]]:
+        """Срабатывания правил с момента снимка (например, за один файл)"""
+        return {
+            kind: dict(counts - snapshot.get(kind, Counter()))
+            for kind, counts in self.rule_hits.items()
+        }
+    
     @optimize_performance("translate_with_context")
     def translate_with_context(self, text: str, context: TranslationContext) -> List[TranslationResult]:
         """Перевести текст с учетом контекста"""
@@ -73,6 +257,11 @@ class ChapterTranslator:
         # Разбиваем построчно для сохранения структуры
         segments = self.splitter.split_by_lines(text)
         results = []
+        self._speaker_timeline = self.speaker_analyzer.analyze([s.content for s in segments])
+        self._load_context_window(context)
+        
+        # Поиск по памяти для всей главы одним пакетом
+        self._prefetch_similar(segments, context)
         
         # Оптимизированная обработка сегментов
         if len(segments) > 10:
@@ -87,8 +276,64 @@ class ChapterTranslator:
                 # Сохраняем в память для будущего использования
                 self._save_to_memory(segment, result, context)
         
+        self._similar_prefetch.clear()
+        self._speaker_timeline = None
+        self._window_translations = {}
+        self.memory_manager.finish_chapter(context.chapter_number)
+        self._save_postprocess_memo()
         return results
     
+    def _load_context_window(self, context: TranslationContext):
+        """Окно контекста предыдущих глав: их переводы используются для точных повторов"""
+        window = self.memory_manager.get_context_window(context.previous_chapters or None)
+        self._window_translations = {}
+        for entry in window:
+            if entry.get('source_text') and entry.get('target_text'):
+                self._window_translations[entry['source_text']] = {
+                    "source_text": entry['source_text'],
+                    "target_text": entry['target_text'],
+                    "chapter": entry.get('chapter', ''),
+                    "character": entry.get('character', ''),
+                    "similarity": 1.0,
+                    "context": entry.get('context', '')
+                }
+    
+    def _find_exact(self, text: str, context: TranslationContext) -> Optional[Dict]:
+        """Точный повтор: сначала в памяти текущей главы, затем в окне предыдущих глав"""
+        exact = self.memory_manager.find_exact(text, context.chapter_number)
+        if exact is None:
+            exact = self._window_translations.get(text)
+        return exact
+    
+    def _prefetch_similar(self, segments: List[TextSegment], context: TranslationContext):
+        """Пре-проход: найти похожие переводы для всех строк, которым нужен MT"""
+        self._check_rules_changed()
+        
+        texts = []
+        for segment in segments:
+            content = segment.content
+            if segment.segment_type == 'empty_line' or not content.strip():
+                continue
+            if self._cache_key(segment, context) in self.translation_cache:
+                continue
+            if self.memory_manager.get_phrase_translation(content, context.chapter_number):
+                continue
+            # Точный повтор строки этой или недавних глав
+            exact = self._find_exact(content, context)
+            if exact is not None:
+                self._similar_prefetch[content] = [exact]
+                continue
+            texts.append(content)
+        
+        if not texts:
+            return
+        
+        matches = self.memory_manager.find_similar_many(
+            texts,
+            threshold=TRANSLATION_MEMORY["similarity_threshold"]
+        )
+        self._similar_prefetch.update(zip(texts, matches))
+    
     def _translate_segments_batch(self, segments: List[TextSegment], context: TranslationContext) -> List[TranslationResult]:
         """Пакетная обработка сегментов для оптимизации"""
         results = []
@@ -128,8 +373,11 @@ class ChapterTranslator:
                 timestamp=datetime.now().isoformat()
             )
         
+        # Правила могли измениться — тогда мемо и кэш недействительны
+        self._check_rules_changed()
+        
         # Проверяем кэш
-        cache_key = f"{segment.content}_{context.translation_style}"
+        cache_key = self._cache_key(segment, context)
         if cache_key in self.translation_cache:
             cached_result = self.translation_cache[cache_key]
             return TranslationResult(
@@ -161,11 +409,19 @@ class ChapterTranslator:
                 timestamp=datetime.now().isoformat()
             )
         
-        # Ищем похожие переводы в памяти
-        similar_translations = self.memory_manager.find_similar(
-            segment.content, 
-            threshold=TRANSLATION_MEMORY["similarity_threshold"]
-        )
+        # Ищем похожие переводы в памяти (обычно уже найдены пре-проходом главы)
+        similar_translations = self._similar_prefetch.get(segment.content)
+        if similar_translations is None:
+            exact = self._find_exact(segment.content, context)
+            similar_translations = [exact] if exact is not None else None
+        if similar_translations is None:
+            similar_translations = self.memory_manager.find_similar(
+                segment.content, 
+                threshold=TRANSLATION_MEMORY["similarity_threshold"]
+            )
+        
+        # Попадание без перевода нельзя использовать как основу
+        similar_translations = [match for match in similar_translations if match.get('target_text')]
         
         if similar_translations:
             # Используем похожий перевод как основу
@@ -175,21 +431,8 @@ class ChapterTranslator:
             # Базовый перевод через DeepL
             base_translation = self.cached_translator.translate_text(segment.content)
         
-        # Применяем глоссарий
-        base_translation = self._apply_glossary(base_translation)
-        
-        # Проверяем запрещенные слова
-        base_translation = self._check_forbidden_words(base_translation)
-        
-        # Применяем стили персонажей
-        character_type, confidence = self.character_detector.detect_character_from_text(segment.content)
-        if character_type != CharacterType.UNKNOWN:
-            base_translation = self._apply_character_style(base_translation, character_type.value)
-        
-        # Адаптируем под текущий контекст
-        adapted_translation = self._adapt_translation(
-            base_translation, segment, context
-        )
+        # Пост-обработка (мемоизирована по выходу MT и версии правил)
+        adapted_translation, quality_score = self._postprocess(base_translation, segment, context)
         
         # Определяем источник перевода
         if similar_translations:
@@ -208,7 +451,7 @@ class ChapterTranslator:
             confidence=confidence,
             context_used=True,
             memory_hit=memory_hit,
-            quality_score=self._calculate_quality_score(adapted_translation),
+            quality_score=quality_score,
             timestamp=datetime.now().isoformat()
         )
         
@@ -225,9 +468,10 @@ class ChapterTranslator:
         """Адаптировать перевод под текущий контекст"""
         adapted = base_translation
         
-        # Адаптация под персонажа
-        if segment.character:
-            adapted = self._adapt_for_character(adapted, segment.character, context)
+        # Адаптация под персонажа (говорящий — из хронологии главы)
+        char_type, confidence = self._speaker_of(segment)
+        if char_type != CharacterType.UNKNOWN:
+            adapted = self._adapt_for_character(adapted, char_type, confidence, context)
         
         # Адаптация под сцену
         if context.current_scene:
@@ -239,11 +483,9 @@ class ChapterTranslator:
         
         return adapted
     
-    def _adapt_for_character(self, text: str, character: str, context: TranslationContext) -> str:
+    def _adapt_for_character(self, text: str, char_type: CharacterType, confidence: float,
+                             context: TranslationContext) -> str:
         """Адаптировать перевод под персонажа"""
-        # Определяем тип персонажа
-        char_type, confidence = self.character_detector.detect_character_from_text(text)
-        
         if char_type != CharacterType.UNKNOWN and confidence > 0.5:
             # Получаем предпочтения персонажа
             avoid_words = self.character_detector.get_character_avoid_words(char_type)
@@ -265,17 +507,8 @@ class ChapterTranslator:
         return text
     
     def _find_replacement(self, word: str, prefer_words: List[str]) -> str:
-        """Найти замену для нежелательного слова"""
-        # Простая логика замены - можно расширить
-        replacements = {
-            "сей": "этот",
-            "дабы": "чтобы", 
-            "ибо": "потому что",
-            "весьма": "очень",
-            "отнюдь": "совсем не"
-        }
-        
-        return replacements.get(word, word)
+        """Найти замену для нежелательного слова (современные замены архаизмов из config.py)"""
+        return self.style_engine.replacement(word, ("archaism_replacement",)) or word
     
     def _should_apply_word(self, word: str, text: str) -> bool:
         """Определить, стоит ли применять предпочитаемое слово"""
@@ -333,23 +566,20 @@ class ChapterTranslator:
         elif len(text) > 500:
             score -= 10
         
-        # Проверяем на архаизмы
-        archaisms = ["сей", "дабы", "ибо", "весьма", "отнюдь"]
-        for archaism in archaisms:
-            if archaism in text.lower():
-                score -= 5
-        
-        # Проверяем на естественность
-        natural_patterns = ["Дай мне", "Можешь", "Хочу", "Похоже"]
-        for pattern in natural_patterns:
-            if pattern in text:
-                score += 2
+        # Архаизмы (-5) и признаки естественной речи (+2): каждое правило один раз, один проход
+        fired = {(match.rule.category, match.rule.pattern)
+                 for match in self.style_engine.scan(text, ("archaism", "natural_dialogue"))}
+        for category, _ in fired:
+            score += -5 if category == "archaism" else 2
         
         return max(0, min(100, score))
     
     def _save_to_memory(self, segment: TextSegment, result: TranslationResult, 
                        context: TranslationContext):
         """Сохранить перевод в память"""
+        if not result.translated_text:
+            return
+        
         try:
             from tools.context_manager import TranslationMemory
             
@@ -359,54 +589,29 @@ class ChapterTranslator:
                 chapter=context.chapter_number,
                 character=segment.character,
                 context=context.current_scene,
-                quality_score=result.quality_score
+                quality_score=result.quality_score,
+                translator=result.translator
             )
             
-            self.memory_manager.add_translation(memory)
+            # Запись отложенная: буфер сбрасывается пакетом в конце главы
+            self.memory_manager.buffer_translation(memory)
         except Exception as e:
             print(f"⚠️ Ошибка сохранения в память: {e}")
     
-    def _apply_glossary(self, text: str) -> str:
-        """Применить глоссарий к переводу"""
-        if not self.memory_manager.reference_data or 'glossary_terms' not in self.memory_manager.reference_data:
-            return text
-        
-        glossary = self.memory_manager.reference_data['glossary_terms']
-        
-        # Применяем термины из всех категорий глоссария
-        for category, terms in glossary.items():
-            for english_term, russian_term in terms.items():
-                # Заменяем английские термины на русские
-                text = text.replace(english_term, russian_term)
+    def _apply_glossary(self, text: str) -> Tuple[str, Dict[str, int]]:
+        """Применить глоссарий к переводу: один проход, самые длинные термины первыми
         
-        return text
+        Возвращает строку и число замен каждого термина.
+        """
+        return self.memory_manager.reference.glossary_replacer.replace(text)
     
-    def _check_forbidden_words(self, text: str) -> str:
-        """Проверить и заменить запрещенные слова"""
-        forbidden_words = self.memory_manager.get_forbidden_words()
-        
-        if not forbidden_words:
-            return text
-        
-        # Получаем предпочтительные альтернативы
-        alternatives = {}
-        if (self.memory_manager.reference_data and 
-            'translation_errors' in self.memory_manager.reference_data and
-            'preferred_alternatives' in self.memory_manager.reference_data['translation_errors']):
-            alternatives = self.memory_manager.reference_data['translation_errors']['preferred_alternatives']
-        
-        # Заменяем запрещенные слова
-        for forbidden_word in forbidden_words:
-            if forbidden_word in text:
-                if forbidden_word in alternatives:
-                    # Используем первую альтернативу
-                    alternative = alternatives[forbidden_word].split(',')[0].strip()
-                    text = text.replace(forbidden_word, alternative)
-                    print(f"⚠️ Заменено запрещенное слово '{forbidden_word}' на '{alternative}'")
-                else:
-                    print(f"⚠️ Найдено запрещенное слово: '{forbidden_word}'")
+    def _check_forbidden_words(self, text: str) -> Tuple[str, Dict[str, int]]:
+        """Проверить и заменить запрещенные слова (первой из предпочтительных альтернатив)
         
-        return text
+        Возвращает строку и число вхождений каждого слова; итог по файлу
+        выводится один раз в translate_file.
+        """
+        return self.memory_manager.reference.forbidden_scanner.scan(text)
     
     def _apply_character_style(self, text: str, character: str) -> str:
         """Применить стиль персонажа"""
@@ -451,13 +656,91 @@ class ChapterTranslator:
         
         return validation
     
+    def _line_key(self, segment: TextSegment, context: TranslationContext) -> str:
+        """Ключ строки в карте: реплика у другого говорящего переводится заново"""
+        speaker, _ = self._speaker_of(segment)
+        return LineTranslationMap.line_key(segment.content, context.translation_style, speaker.value)
+    
+    def translate_incremental(self, text: str, context: TranslationContext,
+                              line_map: LineTranslationMap) -> List[TranslationResult]:
+        """Перевести текст, переиспользуя строки из предыдущего прогона
+        
+        Через pipeline проходят только изменённые и добавленные строки,
+        остальные берутся из карты строк вместе с их происхождением.
+        """
+        segments = self.splitter.split_by_lines(text)
+        results = []
+        self._speaker_timeline = self.speaker_analyzer.analyze([s.content for s in segments])
+        self._load_context_window(context)
+        
+        # Переводы, сделанные по другим правилам пост-обработки, не переиспользуем
+        self._check_rules_changed()
+        line_map.set_rules_version(self.rules_version)
+        
+        # Пакетный поиск по памяти только для строк, которых нет в карте
+        self._prefetch_similar([
+            segment for segment in segments
+            if self._line_key(segment, context) not in line_map.previous
+        ], context)
+        
+        for segment in segments:
+            if segment.segment_type == 'empty_line' or not segment.content.strip():
+                results.append(self._translate_segment(segment, context))
+                continue
+            
+            key = self._line_key(segment, context)
+            previous = line_map.lookup(key)
+            
+            if previous is not None:
+                result = TranslationResult(
+                    original_text=segment.content,
+                    translated_text=previous['translated_text'],
+                    translator=previous['translator'],
+                    confidence=previous['confidence'],
+                    context_used=previous.get('context_used', True),
+                    memory_hit=previous['memory_hit'],
+                    quality_score=previous['quality_score'],
+                    timestamp=previous['timestamp']
+                )
+            else:
+                result = self._translate_segment(segment, context)
+                self._save_to_memory(segment, result, context)
+            
+            line_map.record(key, {
+                'translated_text': result.translated_text,
+                'translator': result.translator,
+                'confidence': result.confidence,
+                'context_used': result.context_used,
+                'memory_hit': result.memory_hit,
+                'quality_score': result.quality_score,
+                'timestamp': result.timestamp
+            }, reused=previous is not None)
+            results.append(result)
+        
+        self._similar_prefetch.clear()
+        self._speaker_timeline = None
+        self._window_translations = {}
+        return results
+    
     def translate_file(self, file_path: str, context: TranslationContext) -> Dict[str, Any]:
         """Перевести файл целиком"""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 text = f.read()
             
-            results = self.translate_with_context(text, context)
+            hits_snapshot = self._snapshot_rule_hits()
+            line_map = None
+            if INCREMENTAL_TRANSLATION["enabled"]:
+                line_map = LineTranslationMap(INCREMENTAL_TRANSLATION["line_map_dir"], file_path,
+                                              self.rules_version)
+                results = self.translate_incremental(text, context, line_map)
+                line_map.save()
+                self.memory_manager.finish_chapter(context.chapter_number)
+                self._save_postprocess_memo()
+                print(f"♻️ Строк переиспользовано: {line_map.stats['reused']}, "
+                      f"переведено заново: {line_map.stats['translated']}")
+            else:
+                results = self.translate_with_context(text, context)
             
             # Объединяем результаты построчно
             translated_text = '\n'.join([r.translated_text for r in results])
@@ -474,6 +757,17 @@ class ChapterTranslator:
             total_segments = len(results)
             memory_hits = sum(1 for r in results if r.memory_hit)
             avg_quality = sum(r.quality_score for r in results) / total_segments if total_segments > 0 else 0
+            rule_hits = self._rule_hits_since(hits_snapshot)
+            for kind, counts in rule_hits.items():
+                self.performance_optimizer.monitor.add_metric(
+                    f"{kind}_hits", sum(counts.values()), "count", category="postprocess"
+                )
+            
+            forbidden_hits = rule_hits.get('forbidden', {})
+            if forbidden_hits:
+                unresolved = self.memory_manager.reference.forbidden_scanner.unresolved(forbidden_hits)
+                print(f"⚠️ Запрещенных слов: {sum(forbidden_hits.values())}"
+                      + (f", без замены: {', '.join(unresolved)}" if unresolved else ""))
             
             return {
                 'original_text': text,
@@ -485,7 +779,11 @@ class ChapterTranslator:
                     'memory_hits': memory_hits,
                     'memory_hit_rate': memory_hits / total_segments if total_segments > 0 else 0,
                     'average_quality': avg_quality,
-                    'translators_used': list(set(r.translator for r in results))
+                    'translators_used': list(set(r.translator for r in results)),
+                    'reused_lines': line_map.stats['reused'] if line_map else 0,
+                    'retranslated_lines': line_map.stats['translated'] if line_map else total_segments,
+                    'glossary_terms': rule_hits.get('glossary', {}),
+                    'forbidden_words': forbidden_hits
                 },
                 'context': context,
                 'timestamp': datetime.now().isoformat()
@@ -10,8 +10,16 @@ from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 
-from config import QUALITY_METRICS, MIN_QUALITY_THRESHOLDS, BANNED_ARCHAISMS
+from config import QUALITY_METRICS, MIN_QUALITY_THRESHOLDS, BANNED_ARCHAISMS, CALQUES, FORMAL_DIALOGUE
 from tools.chapter_splitter import ChapterSplitter, TextSegment
+from tools.style_rules import get_style_engine
+
+# Категории общих стилевых правил → (тип проблемы, важность, сообщение, совет)
+STYLE_ISSUES = {
+    "archaism": ("Архаизм", "critical", "Найден архаизм: '{}'", "Заменить на современный аналог"),
+    "calque": ("Калька", "high", "Найдена калька: '{}'", "Переформулировать естественно"),
+    "formal_dialogue": ("Формальный диалог", "medium", "Формальная конструкция: '{}'", "Упростить для естественности")
+}
 
 @dataclass
 class ValidationIssue:
@@ -38,17 +46,11 @@ class ChapterValidator:
     def __init__(self):
         self.splitter = ChapterSplitter()
         
-        # Паттерны для проверки
+        # Паттерны для проверки (общие с линтером и модернизатором, см. config.py)
         self.archaism_patterns = BANNED_ARCHAISMS
-        self.calque_patterns = [
-            "крайне", "слева и справа", "совершенна", 
-            "На его взгляд", "резюмировал", "осуществлять",
-            "производить впечатление", "испытывать чувство"
-        ]
-        self.formal_dialogue_patterns = [
-            "Я собираюсь", "Позвольте мне", "Не могли бы вы",
-            "Я хотел бы", "Кажется, что", "Я боюсь, что"
-        ]
+        self.calque_patterns = list(CALQUES)
+        self.formal_dialogue_patterns = list(FORMAL_DIALOGUE)
+        self.style_engine = get_style_engine()
         
         # Терминология из глоссария
         self.glossary_terms = {
@@ -70,17 +72,9 @@ class ChapterValidator:
         structure_issues = self._validate_structure(original_text, translated_text)
         issues.extend(structure_issues)
         
-        # 2. Проверка архаизмов
-        archaism_issues = self._validate_archaisms(translated_text)
-        issues.extend(archaism_issues)
-        
-        # 3. Проверка кальки
-        calque_issues = self._validate_calques(translated_text)
-        issues.extend(calque_issues)
-        
-        # 4. Проверка диалогов
-        dialogue_issues = self._validate_dialogues(translated_text)
-        issues.extend(dialogue_issues)
+        # 2-4. Архаизмы, кальки и формальные диалоги — одним проходом
+        style_issues = self._validate_style_rules(translated_text)
+        issues.extend(style_issues)
         
         # 5. Проверка терминологии
         terminology_issues = self._validate_terminology(translated_text)
@@ -147,69 +141,39 @@ class ChapterValidator:
         
         return issues
     
-    def _validate_archaisms(self, text: str) -> List[ValidationIssue]:
-        """Проверка на архаизмы"""
+    def _validate_style_rules(self, text: str,
+                              categories=tuple(STYLE_ISSUES)) -> List[ValidationIssue]:
+        """Проверка архаизмов, калек и формальных диалогов (по типам, в порядке текста)"""
+        matches = self.style_engine.scan(text, categories)
         issues = []
         
-        for archaism in self.archaism_patterns:
-            if archaism in text.lower():
-                # Находим все вхождения
-                for match in re.finditer(re.escape(archaism), text, re.IGNORECASE):
-                    line_number = text[:match.start()].count('\n') + 1
-                    context = text[max(0, match.start()-30):match.end()+30]
-                    
-                    issues.append(ValidationIssue(
-                        issue_type="Архаизм",
-                        severity="critical",
-                        message=f"Найден архаизм: '{archaism}'",
-                        line_number=line_number,
-                        context=context,
-                        suggestion=f"Заменить на современный аналог"
-                    ))
+        for category in categories:
+            issue_type, severity, message, suggestion = STYLE_ISSUES[category]
+            for match in matches:
+                if match.rule.category != category:
+                    continue
+                issues.append(ValidationIssue(
+                    issue_type=issue_type,
+                    severity=severity,
+                    message=message.format(match.rule.pattern),
+                    line_number=match.line,
+                    context=match.context(text),
+                    suggestion=f"Заменить на '{match.rule.replacement}'" if match.rule.replacement else suggestion
+                ))
         
         return issues
     
+    def _validate_archaisms(self, text: str) -> List[ValidationIssue]:
+        """Проверка на архаизмы"""
+        return self._validate_style_rules(text, ("archaism",))
+    
     def _validate_calques(self, text: str) -> List[ValidationIssue]:
         """Проверка на кальки"""
-        issues = []
-        
-        for calque in self.calque_patterns:
-            if calque in text:
-                for match in re.finditer(re.escape(calque), text):
-                    line_number = text[:match.start()].count('\n') + 1
-                    context = text[max(0, match.start()-30):match.end()+30]
-                    
-                    issues.append(ValidationIssue(
-                        issue_type="Калька",
-                        severity="high",
-                        message=f"Найдена калька: '{calque}'",
-                        line_number=line_number,
-                        context=context,
-                        suggestion="Переформулировать естественно"
-                    ))
-        
-        return issues
+        return self._validate_style_rules(text, ("calque",))
     
     def _validate_dialogues(self, text: str) -> List[ValidationIssue]:
         """Проверка диалогов"""
-        issues = []
-        
-        for pattern in self.formal_dialogue_patterns:
-            if pattern in text:
-                for match in re.finditer(re.escape(pattern), text):
-                    line_number = text[:match.start()].count('\n') + 1
-                    context = text[max(0, match.start()-30):match.end()+30]
-                    
-                    issues.append(ValidationIssue(
-                        issue_type="Формальный диалог",
-                        severity="medium",
-                        message=f"Формальная конструкция: '{pattern}'",
-                        line_number=line_number,
-                        context=context,
-                        suggestion="Упростить для естественности"
-                    ))
-        
-        return issues
+        return self._validate_style_rules(text, ("formal_dialogue",))
     
     def _validate_terminology(self, text: str) -> List[ValidationIssue]:
         """Проверка терминологии"""
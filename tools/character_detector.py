@@ -7,10 +7,18 @@
 
 import re
 import json
-from typing import Dict, List, Optional, Tuple, Any
+import hashlib
+from bisect import bisect_right
+from typing import Dict, List, Optional, Set, Tuple, Any
 from dataclasses import dataclass
 from enum import Enum
 
+from config import CHARACTER_DETECTION
+from tools.lru_cache import LRUCache
+
+# Разделитель строк при пакетном анализе (в именах и словах профилей не встречается)
+_LINE_SEPARATOR = '\x1f'
+
 class CharacterType(Enum):
     """Типы персонажей"""
     JIANG_CHEN = "Jiang_Chen"
@@ -86,6 +94,66 @@ class CharacterDetector:
             r'\[[^\]]*\]',  # Квадратные скобки
             r'\([^)]*\)',   # Круглые скобки
         ]
+        
+        # Мемо результатов: (хэш строки, версия профилей) → (персонаж, уверенность)
+        self.detection_memo = LRUCache(CHARACTER_DETECTION["memo_max_entries"])
+        self._compile_patterns()
+    
+    def _compile_patterns(self):
+        """Скомпилировать имена, слова профилей и регулярные выражения
+        
+        Вызывается при создании и после изменения профилей или паттернов.
+        Имена ищутся с учётом регистра (приоритет — порядок в name_patterns),
+        слова профилей — по тексту в нижнем регистре; общее выражение по всем
+        именам (словам) отбирает строки, в которых вообще есть совпадения.
+        """
+        self._names = list(self.name_patterns.items())
+        self._name_regex = self._join_patterns([re.escape(name) for name, _ in self._names if name])
+        
+        self._system_regex = self._join_patterns(self.system_patterns, re.IGNORECASE)
+        self._dialogue_regex = self._join_patterns(self.dialogue_patterns)
+        self._thought_regex = self._join_patterns(self.thought_patterns)
+        
+        # Слово в нижнем регистре → индекс; для профиля — веса стиля речи и ключевые слова
+        words: Dict[str, int] = {}
+        
+        def word_index(word: str) -> int:
+            return words.setdefault(word.lower(), len(words))
+        
+        self._profile_rules = []
+        for char_type, profile in self.character_profiles.items():
+            style_weights = (
+                [(word_index(word), 0.2) for word in profile.prefer_words if word] +
+                [(word_index(word), -0.1) for word in profile.avoid_words if word] +
+                [(word_index(word), 0.3) for word in profile.speech_patterns if word]
+            )
+            keywords = [word_index(word) for word in profile.keywords if word]
+            self._profile_rules.append((char_type, style_weights, keywords))
+        self._words = list(words)
+        self._word_regex = self._join_patterns([re.escape(word) for word in self._words])
+        
+        version_data = [
+            [[name, char_type.value] for name, char_type in self._names],
+            self.system_patterns,
+            [[char_type.value, profile.prefer_words, profile.avoid_words,
+              profile.speech_patterns, profile.keywords]
+             for char_type, profile in self.character_profiles.items()],
+        ]
+        self.profiles_version = hashlib.md5(
+            json.dumps(version_data, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+    
+    @staticmethod
+    def _join_patterns(patterns: List[str], flags: int = 0) -> Optional["re.Pattern"]:
+        """Одно выражение из списка альтернатив (None для пустого списка)"""
+        if not patterns:
+            return None
+        return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), flags)
+    
+    def reload_profiles(self):
+        """Перечитать профили персонажей (записи мемо старой версии больше не используются)"""
+        self.character_profiles = self._load_character_profiles()
+        self._compile_patterns()
     
     def _load_character_profiles(self) -> Dict[CharacterType, CharacterProfile]:
         """Загрузить профили персонажей"""
@@ -150,51 +218,90 @@ class CharacterDetector:
     
     def detect_character_from_text(self, text: str) -> Tuple[CharacterType, float]:
         """Определить персонажа по тексту"""
-        # Проверяем прямые упоминания имен
-        for name, char_type in self.name_patterns.items():
-            if name in text:
-                return char_type, 1.0
-        
-        # Проверяем системные паттерны
-        for pattern in self.system_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return CharacterType.SYSTEM, 0.9
-        
-        # Анализируем стиль речи
-        style_analysis = self._analyze_speech_style(text)
-        if style_analysis:
-            return style_analysis
-        
-        # Анализируем ключевые слова
-        keyword_analysis = self._analyze_keywords(text)
-        if keyword_analysis:
-            return keyword_analysis
-        
-        return CharacterType.UNKNOWN, 0.0
+        return self.detect_many([text])[0]
+    
+    def detect_many(self, lines: List[str]) -> List[Tuple[CharacterType, float]]:
+        """Определить персонажей для набора строк (например, всей главы)
+        
+        Уже встречавшиеся строки берутся из мемо, остальные анализируются
+        вместе: один проход автоматов по склеенному тексту.
+        """
+        keys = [self._memo_key(line) for line in lines]
+        results: Dict[Tuple[str, str], Tuple[CharacterType, float]] = {}
+        pending: Dict[Tuple[str, str], str] = {}
+        for line, key in zip(lines, keys):
+            if key in results or key in pending:
+                continue
+            memoized = self.detection_memo.get(key)
+            if memoized is not None:
+                results[key] = memoized
+            else:
+                pending[key] = line
+        
+        if pending:
+            detected = self._detect_batch(list(pending.values()))
+            for key, result in zip(pending, detected):
+                self.detection_memo.put(key, result)
+                results[key] = result
+        
+        return [results[key] for key in keys]
+    
+    def _memo_key(self, text: str) -> Tuple[str, str]:
+        return hashlib.md5(text.encode('utf-8')).hexdigest(), self.profiles_version
+    
+    def _detect_batch(self, lines: List[str]) -> List[Tuple[CharacterType, float]]:
+        """Анализ строк без мемо: имена, системные сообщения, стиль речи, ключевые слова"""
+        lowered = [line.lower() for line in lines]
+        name_lines = self._lines_with_matches(self._name_regex, lines)
+        word_lines = self._lines_with_matches(self._word_regex, lowered)
+        
+        results = []
+        for number, (line, line_lower) in enumerate(zip(lines, lowered)):
+            # Прямое упоминание имени (первое по порядку в name_patterns)
+            if number in name_lines:
+                char_type = next(char_type for name, char_type in self._names if name and name in line)
+                results.append((char_type, 1.0))
+                continue
+            
+            # Системные паттерны
+            if self._system_regex is not None and self._system_regex.search(line):
+                results.append((CharacterType.SYSTEM, 0.9))
+                continue
+            
+            words: Set[int] = set()
+            if number in word_lines:
+                words = {index for index, word in enumerate(self._words) if word in line_lower}
+            results.append(self._analyze_speech_style(words)
+                           or self._analyze_keywords(words)
+                           or (CharacterType.UNKNOWN, 0.0))
+        return results
     
-    def _analyze_speech_style(self, text: str) -> Optional[Tuple[CharacterType, float]]:
-        """Анализировать стиль речи"""
-        # Проверяем профили персонажей
+    @staticmethod
+    def _lines_with_matches(pattern: Optional["re.Pattern"], lines: List[str]) -> Set[int]:
+        """Номера строк, в которых есть совпадение (один поиск по склеенному тексту)"""
+        if pattern is None or not lines:
+            return set()
+        
+        starts = []
+        offset = 0
+        for line in lines:
+            starts.append(offset)
+            offset += len(line) + len(_LINE_SEPARATOR)
+        
+        joined = _LINE_SEPARATOR.join(lines)
+        return {bisect_right(starts, found.start()) - 1 for found in pattern.finditer(joined)}
+    
+    def _analyze_speech_style(self, words: Set[int]) -> Optional[Tuple[CharacterType, float]]:
+        """Анализировать стиль речи по найденным словам профилей"""
         best_match = None
         best_score = 0.0
         
-        for char_type, profile in self.character_profiles.items():
+        # Предпочитаемые слова +0.2, избегаемые −0.1, паттерны речи +0.3
+        for char_type, style_weights, _ in self._profile_rules:
             score = 0.0
-            
-            # Проверяем предпочитаемые слова
-            for word in profile.prefer_words:
-                if word.lower() in text.lower():
-                    score += 0.2
-            
-            # Проверяем избегаемые слова (отрицательный балл)
-            for word in profile.avoid_words:
-                if word.lower() in text.lower():
-                    score -= 0.1
-            
-            # Проверяем паттерны речи
-            for pattern in profile.speech_patterns:
-                if pattern.lower() in text.lower():
-                    score += 0.3
+            for index, weight in style_weights:
+                if index in words:
+                    score += weight
             
             if score > best_score:
                 best_score = score
@@ -205,27 +312,18 @@ class CharacterDetector:
         
         return None
     
-    def _analyze_keywords(self, text: str) -> Optional[Tuple[CharacterType, float]]:
-        """Анализировать ключевые слова"""
-        text_lower = text.lower()
+    def _analyze_keywords(self, words: Set[int]) -> Optional[Tuple[CharacterType, float]]:
+        """Анализировать ключевые слова по найденным словам профилей"""
+        best_type = None
+        best_score = 0
+        for char_type, _, keywords in self._profile_rules:
+            score = sum(1 for index in keywords if index in words)
+            if best_type is None or score > best_score:
+                best_type, best_score = char_type, score
         
-        # Подсчитываем совпадения ключевых слов
-        keyword_scores = {}
-        for char_type, profile in self.character_profiles.items():
-            score = 0
-            for keyword in profile.keywords:
-                if keyword.lower() in text_lower:
-                    score += 1
-            keyword_scores[char_type] = score
-        
-        # Находим лучшее совпадение
-        if keyword_scores:
-            best_type = max(keyword_scores, key=keyword_scores.get)
-            best_score = keyword_scores[best_type]
-            
-            if best_score > 0:
-                confidence = min(0.8, best_score * 0.2)
-                return best_type, confidence
+        if best_score > 0:
+            confidence = min(0.8, best_score * 0.2)
+            return best_type, confidence
         
         return None
     
@@ -263,29 +361,34 @@ class CharacterDetector:
             return self.character_profiles[character_type].prefer_words
         return []
     
+    def segment_type(self, text: str) -> str:
+        """Тип фрагмента: dialogue, thoughts, system или description"""
+        if self._dialogue_regex is not None and self._dialogue_regex.search(text):
+            return "dialogue"
+        if self._thought_regex is not None and self._thought_regex.search(text):
+            return "thoughts"
+        if self._system_regex is not None and self._system_regex.search(text):
+            return "system"
+        return "description"
+    
     def analyze_text_segments(self, text: str) -> List[Dict[str, Any]]:
         """Анализировать все сегменты текста"""
         segments = []
         
         # Разбиваем на предложения
-        sentences = re.split(r'[.!?]+', text)
+        sentences = [sentence.strip() for sentence in re.split(r'[.!?]+', text)]
+        non_empty = [sentence for sentence in sentences if sentence]
+        detected = dict(zip(non_empty, self.detect_many(non_empty)))
         
         for i, sentence in enumerate(sentences):
-            sentence = sentence.strip()
             if not sentence:
                 continue
             
             # Определяем тип сегмента
-            segment_type = "description"
-            if any(re.search(pattern, sentence) for pattern in self.dialogue_patterns):
-                segment_type = "dialogue"
-            elif any(re.search(pattern, sentence) for pattern in self.thought_patterns):
-                segment_type = "thoughts"
-            elif any(re.search(pattern, sentence, re.IGNORECASE) for pattern in self.system_patterns):
-                segment_type = "system"
+            segment_type = self.segment_type(sentence)
             
             # Определяем персонажа
-            character_type, confidence = self.detect_character_from_text(sentence)
+            character_type, confidence = detected[sentence]
             
             segments.append({
                 "index": i,
@@ -7,17 +7,29 @@
 
 import json
 import os
+import sys
+import time
 import hashlib
+import importlib.util
+from collections import deque
+from pathlib import Path
 from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
-from datetime import datetime
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timedelta
 
-try:
-    import chromadb
-    from chromadb.config import Settings
-    CHROMADB_AVAILABLE = True
-except ImportError:
-    CHROMADB_AVAILABLE = False
+from config import BLOOM_FILTER, TRANSLATION_MEMORY, VECTOR_BACKEND, TM_COMPACTION
+from tools.bloom_filter import BloomFilter
+from tools.jsonl_store import JsonlMemoryStore
+from tools.similarity_index import TokenIndex
+from tools.reference_bundle import ReferenceBundle, get_reference_bundle
+from tools.embeddings import EmbeddingModel, embeddings_available, get_shared_model
+from tools.vector_index import NumpyVectorIndex
+from tools.lru_cache import LRUCache
+from tools.file_lock import FileLock, atomic_write_json
+
+# Сам chromadb импортируется только при выборе этого бэкенда (импорт дорогой)
+CHROMADB_AVAILABLE = importlib.util.find_spec("chromadb") is not None
+if not CHROMADB_AVAILABLE:
     print("⚠️ ChromaDB не установлен. Установите: pip install chromadb")
 
 @dataclass
@@ -30,6 +42,7 @@ class TranslationMemory:
     context: Optional[str] = None
     quality_score: Optional[float] = None
     timestamp: Optional[str] = None
+    translator: Optional[str] = None  # Источник перевода: DeepL, память, справочная база
 
 class TranslationMemoryManager:
     """Менеджер контекстной памяти для переводов"""
@@ -38,35 +51,187 @@ class TranslationMemoryManager:
         self.db_path = db_path
         self.client = None
         self.collection = None
+        self.memory_store: Optional[JsonlMemoryStore] = None
+        self.vector_index: Optional[NumpyVectorIndex] = None
+        self.embedding_model: Optional[EmbeddingModel] = None
         
-        # Загружаем справочную базу из translation_memory.json
-        self.reference_data = self._load_reference_data()
+        # Справочная база translation_memory.json: компилируется один раз на процесс
+        # и перечитывается при изменении файла
+        self.reference_file = os.path.join(self.db_path, "translation_memory.json")
+        get_reference_bundle(self.reference_file)
         
-        if CHROMADB_AVAILABLE:
-            self._initialize_database()
+        # Общий для процессов счётчик записей в память: сохранённый Bloom-фильтр
+        # актуален, только если построен при том же значении счётчика
+        self.source_filter_file = os.path.join(self.db_path, "tm_sources.bloom")
+        self.write_counter_file = f"{self.source_filter_file}.writes"
+        self._filter_writes: Optional[int] = None
+        self._filter_dirty = False
+        
+        # Выбор бэкенда в режиме auto (запоминается между запусками)
+        self.backend_choice_file = os.path.join(self.db_path, "vector_backend.json")
+        self.backend = self._select_backend()
+        if self.backend == "numpy":
+            self._initialize_numpy_backend()
+        elif self.backend == "chromadb":
+            if self.collection is None:
+                self._initialize_database()
         else:
             print("❌ ChromaDB недоступен. Используется файловая система.")
             self._initialize_file_system()
+        
+        # Bloom-фильтр исходных строк: гарантированные промахи не идут в поиск
+        self.filter_stats = {"checks": 0, "definite_misses": 0}
+        self.source_filter = self._load_source_filter()
+        
+        # Буфер отложенной записи: id → запись (повторный id заменяет старую запись)
+        self.write_buffer_size = TRANSLATION_MEMORY["write_buffer_size"]
+        self._write_buffer: Dict[str, TranslationMemory] = {}
+        
+        # Контекст глав: LRU недавних глав и окно из context_window последних завершённых,
+        # подготовленное к переводу следующей главы
+        self.chapter_cache = LRUCache(TRANSLATION_MEMORY["chapter_cache_size"])
+        self._window_chapters = deque(maxlen=TRANSLATION_MEMORY["context_window"])
+        self._context_window: List[Dict] = []
+    
+    @property
+    def reference(self) -> ReferenceBundle:
+        """Скомпилированная справочная база (общая для процесса, всегда актуальная)"""
+        return get_reference_bundle(self.reference_file)
+    
+    @property
+    def reference_data(self) -> Dict[str, Any]:
+        """Исходный JSON справочной базы"""
+        return self.reference.data
+    
+    def _select_backend(self) -> str:
+        """Выбрать хранилище: NumPy для памяти до numpy_max_entries записей, иначе ChromaDB
+        
+        Выбор режима auto запоминается в vector_backend.json и сам не меняется:
+        переход NumPy → ChromaDB делается только вместе с переносом записей
+        (см. _initialize_numpy_backend), иначе записи после переноса пропали бы.
+        """
+        backend = VECTOR_BACKEND["backend"]
+        if backend != "auto":
+            return backend if backend == "numpy" or CHROMADB_AVAILABLE else "file"
+        if not embeddings_available():
+            return "chromadb" if CHROMADB_AVAILABLE else "file"
+        
+        saved = self._load_backend_choice()
+        if saved == "numpy":
+            return saved
+        if saved == "chromadb":
+            return saved if CHROMADB_AVAILABLE else "file"
+        
+        store_file = os.path.join(self.db_path, "translation_memory.jsonl")
+        if os.path.exists(store_file) or not CHROMADB_AVAILABLE:
+            # Записи уже в журнале JSONL: начинаем с NumPy, переросшую память перенесёт инициализация
+            choice = "numpy"
+        else:
+            # Первый запуск: размер существующей памяти узнаём у ChromaDB
+            self._initialize_database()
+            size = self.collection.count() if self.collection else 0
+            choice = "numpy" if size <= VECTOR_BACKEND["numpy_max_entries"] else "chromadb"
+        
+        self._save_backend_choice(choice)
+        return choice
     
-    def _load_reference_data(self) -> Dict[str, Any]:
-        """Загрузить справочную базу из translation_memory.json"""
+    def _load_backend_choice(self) -> Optional[str]:
+        """Запомненный выбор режима auto"""
         try:
-            memory_file = os.path.join(self.db_path, "translation_memory.json")
-            if os.path.exists(memory_file):
-                with open(memory_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                print("✅ Справочная база загружена из translation_memory.json")
-                return data
-            else:
-                print("⚠️ Файл translation_memory.json не найден, создается пустая база")
-                return {}
-        except Exception as e:
-            print(f"❌ Ошибка загрузки справочной базы: {e}")
-            return {}
+            with open(self.backend_choice_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get("backend")
+        except (OSError, ValueError, AttributeError):
+            return None
+    
+    def _save_backend_choice(self, backend: str):
+        """Запомнить выбор режима auto"""
+        try:
+            os.makedirs(self.db_path, exist_ok=True)
+            atomic_write_json(self.backend_choice_file, {
+                "backend": backend,
+                "selected_at": datetime.now().isoformat()
+            })
+        except OSError as e:
+            print(f"⚠️ Не удалось сохранить выбор хранилища памяти: {e}")
+    
+    def _initialize_numpy_backend(self):
+        """Журнал JSONL для записей + матрица embeddings NumPy для поиска"""
+        self._initialize_file_system(token_index=False)
+        self.embedding_model = get_shared_model()
+        self.vector_index = NumpyVectorIndex(
+            VECTOR_BACKEND["index_dir"], self.embedding_model, dtype=VECTOR_BACKEND["dtype"]
+        )
+        self.memory_store.attach_index(self.vector_index)
+        
+        # Однократный перенос записей из ChromaDB, если память раньше жила там
+        if self.collection is not None:
+            if not len(self.memory_store):
+                self._import_from_chromadb()
+            self.collection = None
+            self.client = None
+        
+        # Память переросла NumPy (считаются только живые записи журнала) — переносим в ChromaDB
+        if (VECTOR_BACKEND["backend"] == "auto" and CHROMADB_AVAILABLE
+                and len(self.memory_store) > VECTOR_BACKEND["numpy_max_entries"]):
+            self._export_to_chromadb()
+            return
+        print("✅ Векторный поиск NumPy инициализирован")
+    
+    def _export_to_chromadb(self, page_size: int = 1000):
+        """Перенести записи журнала JSONL в ChromaDB и дальше работать с ней"""
+        store = self.memory_store
+        self._initialize_database()
+        if self.collection is None:
+            # ChromaDB не поднялась — остаёмся на NumPy
+            self.memory_store = store
+            return
+        
+        records = list(store.values())
+        field_names = [field.name for field in fields(TranslationMemory)]
+        for start in range(0, len(records), page_size):
+            page = records[start:start + page_size]
+            memories = [TranslationMemory(**{name: record.get(name) for name in field_names})
+                        for record in page]
+            documents = [memory.source_text for memory in memories]
+            self.collection.upsert(
+                ids=[record['id'] for record in page],
+                documents=documents,
+                embeddings=self._embed(documents),
+                metadatas=[self._chromadb_metadata(memory) for memory in memories]
+            )
+        self._count_write()
+        
+        self.memory_store = None
+        self.vector_index = None
+        self.backend = "chromadb"
+        self._save_backend_choice("chromadb")
+        print(f"✅ Перенесено записей в ChromaDB: {len(records)}")
+    
+    def _import_from_chromadb(self, page_size: int = 1000):
+        """Скопировать записи с переводом из ChromaDB в журнал JSONL"""
+        offset, imported = 0, 0
+        while True:
+            page = self.collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            records = []
+            for memory_id, doc, metadata in zip(page['ids'], page['documents'], page['metadatas']):
+                metadata = metadata or {}
+                if not metadata.get("target_text"):
+                    continue
+                records.append(dict(metadata, id=memory_id, source_text=doc))
+            imported += self.memory_store.append_many(records)
+            if len(page['ids']) < page_size:
+                break
+            offset += page_size
+        if imported:
+            self._count_write()
+        print(f"✅ Перенесено записей из ChromaDB: {imported}")
     
     def _initialize_database(self):
         """Инициализация ChromaDB"""
         try:
+            import chromadb
+            from chromadb.config import Settings
+            
             self.client = chromadb.PersistentClient(
                 path=self.db_path,
                 settings=Settings(anonymized_telemetry=False)
@@ -75,50 +240,238 @@ class TranslationMemoryManager:
                 name="translations",
                 metadata={"description": "Translation memory for novel chapters"}
             )
+            # Векторы считаем сами через общий кэш embeddings, а не функцией коллекции
+            self.embedding_model = get_shared_model()
             print("✅ ChromaDB инициализирован")
         except Exception as e:
             print(f"❌ Ошибка инициализации ChromaDB: {e}")
             self._initialize_file_system()
     
-    def _initialize_file_system(self):
+    def _initialize_file_system(self, token_index: bool = True):
         """Инициализация файловой системы как fallback"""
         os.makedirs(self.db_path, exist_ok=True)
-        self.memory_file = os.path.join(self.db_path, "translation_memory.json")
-        if not os.path.exists(self.memory_file):
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump([], f)
+        # translation_memory.json занят справочной базой, записи живут в отдельном журнале
+        self.memory_store = JsonlMemoryStore(os.path.join(self.db_path, "translation_memory.jsonl"))
+        self._import_legacy_memory_file()
+        
+        # Инвертированный индекс токенов для поиска похожих по Жаккару
+        self.similarity_index = TokenIndex()
+        if token_index:
+            self.memory_store.attach_index(self.similarity_index)
         print("✅ Файловая система инициализирована")
     
+    def _import_legacy_memory_file(self):
+        """Перенести записи старого формата (JSON-список) в журнал JSONL"""
+        if len(self.memory_store):
+            return
+        legacy_file = os.path.join(self.db_path, "translation_memory.json")
+        try:
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if isinstance(data, list) and data:
+            imported = self.memory_store.append_many(data)
+            self._count_write()
+            print(f"✅ Импортировано записей из старого формата: {imported}")
+    
+    @staticmethod
+    def _source_key(text: str) -> str:
+        """Ключ исходной строки для Bloom-фильтра"""
+        return hashlib.md5(text.encode('utf-8')).hexdigest()
+    
+    def _iter_source_texts(self, page_size: int = 1000):
+        """Перебрать исходные тексты всех записей памяти"""
+        if self.collection:
+            offset = 0
+            while True:
+                page = self.collection.get(include=["documents"], limit=page_size, offset=offset)
+                documents = page.get('documents') or []
+                yield from documents
+                if len(documents) < page_size:
+                    break
+                offset += page_size
+        else:
+            for item in self.memory_store.values():
+                yield item['source_text']
+    
+    def _read_write_counter(self) -> int:
+        """Текущее значение общего счётчика записей в память"""
+        try:
+            with open(self.write_counter_file, 'r', encoding='utf-8') as f:
+                return int(json.load(f).get("writes", 0))
+        except (OSError, ValueError, AttributeError):
+            return 0
+    
+    def _count_write(self):
+        """Отметить запись в память в общем счётчике (вызывается после самой записи)"""
+        try:
+            os.makedirs(self.db_path, exist_ok=True)
+            with FileLock(f"{self.write_counter_file}.lock"):
+                writes = self._read_write_counter()
+                atomic_write_json(self.write_counter_file, {"writes": writes + 1})
+            # Фильтр покрывает все записи, только если между нашими записями никто не писал
+            self._filter_writes = writes + 1 if self._filter_writes == writes else None
+        except Exception as e:
+            print(f"⚠️ Ошибка обновления счётчика записей памяти: {e}")
+            self._filter_writes = None
+    
+    def _load_source_filter(self) -> Optional[BloomFilter]:
+        """Загрузить сохранённый фильтр или перестроить его, если память изменилась"""
+        writes = self._read_write_counter()
+        bloom = BloomFilter.load(self.source_filter_file)
+        if bloom is not None and bloom.source_fingerprint == str(writes):
+            self._filter_writes = writes
+            return bloom
+        return self.rebuild_source_filter()
+    
+    def rebuild_source_filter(self) -> Optional[BloomFilter]:
+        """Перестроить Bloom-фильтр по всем записям памяти (например, после компакции)"""
+        try:
+            # Счётчик читаем до обхода: записи, сделанные во время обхода, сделают фильтр неактуальным
+            writes = self._read_write_counter()
+            bloom = BloomFilter.from_keys(
+                (self._source_key(text) for text in self._iter_source_texts()),
+                false_positive_rate=BLOOM_FILTER["false_positive_rate"]
+            )
+            bloom.source_fingerprint = str(writes)
+            bloom.save(self.source_filter_file)
+            self.source_filter = bloom
+            self._filter_writes = writes
+            self._filter_dirty = False
+            return bloom
+        except Exception as e:
+            print(f"⚠️ Ошибка построения Bloom-фильтра памяти: {e}")
+            self.source_filter = None
+            return None
+    
+    def save_source_filter(self):
+        """Сохранить фильтр с новыми строками, если он покрывает все записи памяти
+        
+        Если в память писали другие процессы, фильтр не сохраняется —
+        следующий запуск перестроит его.
+        """
+        if self.source_filter is None or not self._filter_dirty or self._filter_writes is None:
+            return
+        try:
+            self.source_filter.source_fingerprint = str(self._filter_writes)
+            self.source_filter.save(self.source_filter_file)
+            self._filter_dirty = False
+        except OSError as e:
+            print(f"⚠️ Не удалось сохранить Bloom-фильтр памяти: {e}")
+    
+    def might_contain(self, text: str) -> bool:
+        """Может ли строка быть в памяти (False — гарантированно нет)"""
+        if self.source_filter is None:
+            return True
+        self.filter_stats["checks"] += 1
+        if self._source_key(text) in self.source_filter:
+            return True
+        self.filter_stats["definite_misses"] += 1
+        return False
+    
+    def _remember_source(self, text: str):
+        """Учесть новую исходную строку в фильтре"""
+        if self.source_filter is None:
+            return
+        self.source_filter.add(self._source_key(text))
+        self._filter_dirty = True
+        if self.source_filter.is_saturated:
+            self.rebuild_source_filter()
+    
     def add_translation(self, memory: TranslationMemory) -> str:
         """Добавить перевод в память"""
         if self.collection:
-            return self._add_to_chromadb(memory)
+            memory_id = self._add_to_chromadb(memory)
         else:
-            return self._add_to_file_system(memory)
+            memory_id = self._add_to_file_system(memory)
+        
+        if memory_id:
+            self._remember_source(memory.source_text)
+            self.chapter_cache.pop(memory.chapter)
+        return memory_id
+    
+    def buffer_translation(self, memory: TranslationMemory) -> str:
+        """Добавить перевод в буфер; запись в память — пакетом при заполнении или flush()"""
+        memory_id = self._memory_id(memory)
+        self._write_buffer[memory_id] = memory
+        self._remember_source(memory.source_text)
+        
+        if len(self._write_buffer) >= self.write_buffer_size:
+            self.flush()
+        return memory_id
+    
+    def flush(self) -> int:
+        """Записать буфер одним пакетом; возвращает число записанных записей"""
+        if not self._write_buffer:
+            return 0
+        
+        memories = list(self._write_buffer.values())
+        self._write_buffer.clear()
+        for memory in memories:
+            self.chapter_cache.pop(memory.chapter)
+        
+        written = 0
+        if self.collection:
+            try:
+                # upsert идемпотентен: повторные id обновляют запись, а не падают
+                documents = [memory.source_text for memory in memories]
+                self.collection.upsert(
+                    ids=[self._memory_id(memory) for memory in memories],
+                    documents=documents,
+                    embeddings=self._embed(documents),
+                    metadatas=[self._chromadb_metadata(memory) for memory in memories]
+                )
+                self._count_write()
+                written = len(memories)
+            except Exception as e:
+                print(f"❌ Ошибка пакетной записи в ChromaDB: {e}")
+        
+        if not written:
+            written = self._add_many_to_file_system(memories)
+        self.save_source_filter()
+        return written
+    
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Векторы строк через дисковый кэш embeddings (повторные строки не пересчитываются)"""
+        return self.embedding_model.encode(texts).tolist()
+    
+    @staticmethod
+    def _memory_id(memory: TranslationMemory) -> str:
+        """ID записи: хэш исходного текста и главы"""
+        return hashlib.md5(
+            f"{memory.source_text}_{memory.chapter}".encode()
+        ).hexdigest()
+    
+    @staticmethod
+    def _chromadb_metadata(memory: TranslationMemory) -> Dict[str, Any]:
+        """Метаданные записи для ChromaDB (None ChromaDB не хранит: нет оценки — нет ключа)"""
+        metadata = {
+            "target_text": memory.target_text,
+            "translator": memory.translator or "",
+            "chapter": memory.chapter,
+            "character": memory.character or "",
+            "context": memory.context or "",
+            "timestamp": memory.timestamp or datetime.now().isoformat()
+        }
+        if memory.quality_score is not None:
+            metadata["quality_score"] = memory.quality_score
+        return metadata
     
     def _add_to_chromadb(self, memory: TranslationMemory) -> str:
         """Добавить в ChromaDB"""
         try:
             # Генерируем уникальный ID
-            memory_id = hashlib.md5(
-                f"{memory.source_text}_{memory.chapter}".encode()
-            ).hexdigest()
-            
-            # Подготавливаем метаданные
-            metadata = {
-                "chapter": memory.chapter,
-                "character": memory.character or "",
-                "context": memory.context or "",
-                "quality_score": memory.quality_score or 0.0,
-                "timestamp": memory.timestamp or datetime.now().isoformat()
-            }
+            memory_id = self._memory_id(memory)
             
-            # Добавляем в коллекцию
-            self.collection.add(
+            # Добавляем в коллекцию (upsert — повторное добавление не ошибка)
+            self.collection.upsert(
                 documents=[memory.source_text],
-                metadatas=[metadata],
+                embeddings=self._embed([memory.source_text]),
+                metadatas=[self._chromadb_metadata(memory)],
                 ids=[memory_id]
             )
+            self._count_write()
             
             return memory_id
         except Exception as e:
@@ -127,38 +480,70 @@ class TranslationMemoryManager:
     
     def _add_to_file_system(self, memory: TranslationMemory) -> str:
         """Добавить в файловую систему"""
+        if self._add_many_to_file_system([memory]):
+            return self._memory_id(memory)
+        return ""
+    
+    def _add_many_to_file_system(self, memories: List[TranslationMemory]) -> int:
+        """Дописать пачку записей в журнал файловой системы"""
         try:
-            # Читаем существующие данные
-            with open(self.memory_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Генерируем ID
-            memory_id = hashlib.md5(
-                f"{memory.source_text}_{memory.chapter}".encode()
-            ).hexdigest()
-            
-            # Добавляем новый перевод
-            translation_data = {
-                "id": memory_id,
-                "source_text": memory.source_text,
-                "target_text": memory.target_text,
-                "chapter": memory.chapter,
-                "character": memory.character,
-                "context": memory.context,
-                "quality_score": memory.quality_score,
-                "timestamp": memory.timestamp or datetime.now().isoformat()
-            }
-            
-            data.append(translation_data)
+            if self.memory_store is None:
+                self._initialize_file_system()
             
-            # Сохраняем обратно
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            records = []
+            for memory in memories:
+                records.append({
+                    "id": self._memory_id(memory),
+                    "source_text": memory.source_text,
+                    "target_text": memory.target_text,
+                    "chapter": memory.chapter,
+                    "character": memory.character,
+                    "context": memory.context,
+                    "quality_score": memory.quality_score,
+                    "timestamp": memory.timestamp or datetime.now().isoformat(),
+                    "translator": memory.translator
+                })
             
-            return memory_id
+            # Повторный id заменяет старую запись в индексе хранилища
+            written = self.memory_store.append_many(records)
+            self._count_write()
+            return written
         except Exception as e:
             print(f"❌ Ошибка добавления в файловую систему: {e}")
-            return ""
+            return 0
+    
+    def find_exact(self, text: str, chapter: str) -> Optional[Dict]:
+        """Точный повтор строки в той же главе — без поиска похожих
+        
+        Bloom-фильтр отсекает строки, которых гарантированно нет в памяти;
+        остальные ищутся по id записи (хэш строки и главы). Для нечёткого
+        поиска фильтр не годится: он знает только точные строки.
+        """
+        if not BLOOM_FILTER["exact_lookup"] or not text.strip() or not self.might_contain(text):
+            return None
+        
+        memory_id = self._memory_id(TranslationMemory(source_text=text, target_text='', chapter=chapter))
+        pending = self._write_buffer.get(memory_id)
+        if pending is not None:
+            item = asdict(pending)
+        elif self.collection:
+            try:
+                page = self.collection.get(ids=[memory_id], include=["documents", "metadatas"])
+            except Exception as e:
+                print(f"❌ Ошибка точного поиска в ChromaDB: {e}")
+                return None
+            if not page.get('ids'):
+                return None
+            item = dict(page['metadatas'][0] or {}, source_text=page['documents'][0])
+        else:
+            self.memory_store.refresh()
+            item = self.memory_store.get(memory_id)
+        
+        if not item or not item.get('target_text'):
+            return None
+        match = self._file_record_match(item, 1.0)
+        match["translator"] = item.get("translator") or ""
+        return match
     
     def find_similar(self, text: str, threshold: float = 0.85, max_results: int = 5) -> List[Dict]:
         """Найти похожие переводы"""
@@ -167,166 +552,416 @@ class TranslationMemoryManager:
         else:
             return self._find_similar_file_system(text, threshold, max_results)
     
+    def find_similar_many(self, texts: List[str], threshold: float = 0.85, max_results: int = 5,
+                          batch_size: int = 64) -> List[List[Dict]]:
+        """Найти похожие переводы для пачки строк (результаты в порядке texts)
+        
+        Уникальные строки уходят в ChromaDB пакетами по batch_size: модель
+        embeddings считает весь пакет за один вызов вместо вызова на строку.
+        """
+        results: List[List[Dict]] = [[] for _ in texts]
+        
+        positions: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            if not text.strip():
+                continue
+            positions.setdefault(text, []).append(i)
+        
+        unique_texts = list(positions)
+        if self.collection:
+            found = []
+            for start in range(0, len(unique_texts), batch_size):
+                found.extend(self._query_chromadb(unique_texts[start:start + batch_size], threshold, max_results))
+        elif self.vector_index is not None:
+            found = self._find_similar_numpy_many(unique_texts, threshold, max_results)
+        else:
+            found = [self._find_similar_file_system(text, threshold, max_results) for text in unique_texts]
+        
+        for text, matches in zip(unique_texts, found):
+            for i in positions[text]:
+                results[i] = list(matches)
+        return results
+    
+    def _find_similar_numpy_many(self, texts: List[str], threshold: float, max_results: int) -> List[List[Dict]]:
+        """Пакетный поиск в NumPy-индексе: одно матричное произведение на все строки"""
+        try:
+            self.memory_store.refresh()
+            found = []
+            for matches in self.vector_index.search_many(texts, threshold, max_results):
+                found.append([
+                    self._file_record_match(self.memory_store.get(entry_id), similarity)
+                    for similarity, entry_id in matches
+                ])
+            return found
+        except Exception as e:
+            print(f"❌ Ошибка поиска в векторном индексе: {e}")
+            return [[] for _ in texts]
+    
+    @staticmethod
+    def _file_record_match(item: Dict[str, Any], similarity: float) -> Dict[str, Any]:
+        """Запись журнала в формате результата поиска"""
+        return {
+            "source_text": item['source_text'],
+            "target_text": item['target_text'],
+            "chapter": item['chapter'],
+            "character": item.get('character', ''),
+            "similarity": similarity,
+            "context": item.get('context', '')
+        }
+    
     def _find_similar_chromadb(self, text: str, threshold: float, max_results: int) -> List[Dict]:
         """Поиск в ChromaDB"""
+        return self._query_chromadb([text], threshold, max_results)[0]
+    
+    def _query_chromadb(self, texts: List[str], threshold: float, max_results: int) -> List[List[Dict]]:
+        """Один запрос к ChromaDB на несколько строк"""
         try:
             results = self.collection.query(
-                query_texts=[text],
+                query_embeddings=self._embed(texts),
                 n_results=max_results
             )
             
-            similar_translations = []
-            if results['documents'] and results['documents'][0]:
-                for i, doc in enumerate(results['documents'][0]):
-                    metadata = results['metadatas'][0][i]
-                    distance = results['distances'][0][i] if 'distances' in results else 0.0
-                    similarity = 1.0 - distance  # Преобразуем расстояние в схожесть
-                    
-                    if similarity >= threshold:
-                        similar_translations.append({
-                            "source_text": doc,
-                            "target_text": metadata.get("target_text", ""),
-                            "chapter": metadata.get("chapter", ""),
-                            "character": metadata.get("character", ""),
-                            "similarity": similarity,
-                            "context": metadata.get("context", "")
-                        })
-            
-            return similar_translations
+            return [self._parse_query_row(results, row, threshold) for row in range(len(texts))]
         except Exception as e:
             print(f"❌ Ошибка поиска в ChromaDB: {e}")
-            return []
+            return [[] for _ in texts]
+    
+    @staticmethod
+    def _parse_query_row(results: Dict[str, Any], row: int, threshold: float) -> List[Dict]:
+        """Похожие переводы для одной строки многострочного запроса"""
+        similar_translations = []
+        if results['documents'] and results['documents'][row]:
+            for i, doc in enumerate(results['documents'][row]):
+                metadata = results['metadatas'][row][i]
+                distance = results['distances'][row][i] if results.get('distances') else 0.0
+                similarity = 1.0 - distance  # Преобразуем расстояние в схожесть
+                
+                # Записи без перевода (до миграции) бесполезны как попадания
+                if similarity >= threshold and metadata.get("target_text"):
+                    similar_translations.append({
+                        "source_text": doc,
+                        "target_text": metadata["target_text"],
+                        "translator": metadata.get("translator", ""),
+                        "chapter": metadata.get("chapter", ""),
+                        "character": metadata.get("character", ""),
+                        "similarity": similarity,
+                        "context": metadata.get("context", "")
+                    })
+        
+        return similar_translations
     
     def _find_similar_file_system(self, text: str, threshold: float, max_results: int) -> List[Dict]:
-        """Поиск в файловой системе (упрощенный)"""
+        """Поиск в файловой системе: косинусная схожесть в NumPy-бэкенде, иначе мера Жаккара по токенам"""
         try:
-            with open(self.memory_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            similar_translations = []
-            for item in data:
-                # Простая проверка на схожесть по ключевым словам
-                source_words = set(text.lower().split())
-                item_words = set(item['source_text'].lower().split())
-                
-                if source_words and item_words:
-                    similarity = len(source_words.intersection(item_words)) / len(source_words.union(item_words))
-                    
-                    if similarity >= threshold:
-                        similar_translations.append({
-                            "source_text": item['source_text'],
-                            "target_text": item['target_text'],
-                            "chapter": item['chapter'],
-                            "character": item.get('character', ''),
-                            "similarity": similarity,
-                            "context": item.get('context', '')
-                        })
-            
-            # Сортируем по схожести и возвращаем топ результатов
-            similar_translations.sort(key=lambda x: x['similarity'], reverse=True)
-            return similar_translations[:max_results]
+            self.memory_store.refresh()
+            index = self.vector_index if self.vector_index is not None else self.similarity_index
+            return [
+                self._file_record_match(self.memory_store.get(entry_id), similarity)
+                for similarity, entry_id in index.search(text, threshold, max_results)
+            ]
         except Exception as e:
             print(f"❌ Ошибка поиска в файловой системе: {e}")
             return []
     
     def get_phrase_translation(self, text: str, chapter: str = None) -> Optional[str]:
         """Найти готовый перевод фразы из справочной базы"""
-        if not self.reference_data or 'phrase_translations' not in self.reference_data:
+        phrase_table = self.reference.phrase_table
+        if phrase_table is None:
             return None
         
-        phrase_translations = self.reference_data['phrase_translations']
-        
-        # Ищем точное совпадение
-        for chapter_key, phrases in phrase_translations.items():
-            if text in phrases:
-                return phrases[text]
-        
-        # Ищем частичное совпадение
-        for chapter_key, phrases in phrase_translations.items():
-            for phrase, translation in phrases.items():
-                if text.lower() in phrase.lower() or phrase.lower() in text.lower():
-                    return translation
-        
-        return None
+        # Точное совпадение, затем самая длинная фраза внутри строки за один проход
+        return phrase_table.lookup(text, chapter)
     
     def get_glossary_term(self, term: str) -> Optional[str]:
-        """Найти термин в глоссарии"""
-        if not self.reference_data or 'glossary_terms' not in self.reference_data:
-            return None
-        
-        glossary = self.reference_data['glossary_terms']
-        
-        # Ищем во всех категориях глоссария
-        for category, terms in glossary.items():
-            if term in terms:
-                return terms[term]
-        
-        return None
+        """Найти термин в глоссарии (все категории в одном словаре)"""
+        return self.reference.glossary.get(term)
     
     def get_forbidden_words(self) -> List[str]:
         """Получить список запрещенных слов"""
-        if not self.reference_data or 'translation_errors' not in self.reference_data:
-            return []
-        
-        errors = self.reference_data['translation_errors']
-        return errors.get('forbidden_words', [])
+        return self.reference.forbidden_words
     
     def get_character_style(self, character: str) -> Dict[str, Any]:
         """Получить стиль персонажа"""
-        if not self.reference_data or 'contextual_style_rules' not in self.reference_data:
-            return {}
-        
-        style_rules = self.reference_data['contextual_style_rules']
-        return style_rules.get(f"{character}_thoughts", {})
+        return self.reference.style_rules.get(f"{character}_thoughts", {})
     
     def get_system_style(self) -> Dict[str, Any]:
         """Получить стиль системных уведомлений"""
-        if not self.reference_data or 'contextual_style_rules' not in self.reference_data:
-            return {}
-        
-        style_rules = self.reference_data['contextual_style_rules']
-        return style_rules.get('system_notifications', {})
+        return self.reference.style_rules.get('system_notifications', {})
     
     def get_chapter_context(self, chapter: str, context_window: int = 3) -> List[Dict]:
-        """Получить контекст главы"""
+        """Получить контекст главы (записи главы из кэша или одной выборкой по метаданным)"""
+        cached = self.chapter_cache.get(chapter)
+        if cached is not None:
+            return cached
+        
+        entries = self._fetch_chapter_entries(chapter)
+        if entries is not None:
+            self.chapter_cache.put(chapter, entries)
+        return entries or []
+    
+    def _fetch_chapter_entries(self, chapter: str, page_size: int = 1000) -> Optional[List[Dict]]:
+        """Все записи главы без векторного поиска; None при ошибке"""
         if self.collection:
             try:
-                results = self.collection.query(
-                    query_texts=[""],
-                    where={"chapter": chapter},
-                    n_results=100  # Получаем все переводы из главы
-                )
-                
                 translations = []
-                if results['documents'] and results['documents'][0]:
-                    for i, doc in enumerate(results['documents'][0]):
-                        metadata = results['metadatas'][0][i]
+                offset = 0
+                while True:
+                    page = self.collection.get(
+                        where={"chapter": chapter},
+                        include=["documents", "metadatas"],
+                        limit=page_size,
+                        offset=offset
+                    )
+                    for doc, metadata in zip(page['documents'], page['metadatas']):
+                        metadata = metadata or {}
                         translations.append({
                             "source_text": doc,
                             "target_text": metadata.get("target_text", ""),
                             "character": metadata.get("character", ""),
-                            "context": metadata.get("context", "")
+                            "context": metadata.get("context", ""),
+                            "timestamp": metadata.get("timestamp", "")
                         })
+                    if len(page['ids']) < page_size:
+                        break
+                    offset += page_size
                 
+                # Порядок выдачи ChromaDB не гарантирован — упорядочиваем по времени добавления
+                translations.sort(key=lambda item: item["timestamp"])
                 return translations
             except Exception as e:
                 print(f"❌ Ошибка получения контекста главы: {e}")
-                return []
+                return None
         else:
             # Файловая система
             try:
-                with open(self.memory_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                chapter_translations = [
-                    item for item in data 
-                    if item.get('chapter') == chapter
-                ]
-                
-                return chapter_translations
+                self.memory_store.refresh()
+                return self.memory_store.by_chapter(chapter)
             except Exception as e:
                 print(f"❌ Ошибка получения контекста главы: {e}")
-                return []
+                return None
+    
+    def finish_chapter(self, chapter: str):
+        """Глава переведена: записать буфер и подготовить окно контекста для следующей главы"""
+        self.flush()
+        self.save_source_filter()
+        self.chapter_cache.pop(chapter)
+        
+        if chapter in self._window_chapters:
+            self._window_chapters.remove(chapter)
+        self._window_chapters.append(chapter)
+        
+        self._context_window = [
+            entry
+            for window_chapter in self._window_chapters
+            for entry in self.get_chapter_context(window_chapter)
+        ]
+    
+    def get_context_window(self, previous_chapters: Optional[List[str]] = None) -> List[Dict]:
+        """Контекст из последних context_window глав
+        
+        Без аргумента (или для тех же глав) возвращается окно, подготовленное
+        в finish_chapter; иначе собирается из LRU-кэша глав.
+        """
+        if previous_chapters is None:
+            return self._context_window
+        
+        window = list(previous_chapters)[-TRANSLATION_MEMORY["context_window"]:]
+        if window == list(self._window_chapters):
+            return self._context_window
+        return [entry for chapter in window for entry in self.get_chapter_context(chapter)]
+    
+    def backfill_target_texts(self, original_dir: str = "original",
+                              translated_dir: str = "translated",
+                              page_size: int = 1000) -> Dict[str, int]:
+        """Миграция: заполнить target_text у старых записей ChromaDB по готовым главам
+        
+        Строки оригинала и перевода сопоставляются по порядку непустых строк;
+        главы с разным числом непустых строк пропускаются.
+        """
+        stats = {"chapters": 0, "skipped_chapters": 0, "missing": 0, "filled": 0}
+        if not self.collection:
+            print("⚠️ Миграция нужна только для ChromaDB")
+            return stats
+        
+        # Исходная строка → перевод по всем выровненным главам
+        line_pairs: Dict[str, str] = {}
+        for original_file in sorted(Path(original_dir).iterdir()):
+            if not original_file.is_file():
+                continue
+            stem = original_file.name[:-4] if original_file.name.endswith('.txt') else original_file.name
+            translated_file = Path(translated_dir) / f"{stem}-ru.txt"
+            if not translated_file.exists():
+                continue
+            
+            original_lines = [line.strip() for line in original_file.read_text(encoding='utf-8').split('\n') if line.strip()]
+            translated_lines = [line.strip() for line in translated_file.read_text(encoding='utf-8').split('\n') if line.strip()]
+            if len(original_lines) != len(translated_lines):
+                print(f"⚠️ {original_file.name}: строки не совпадают ({len(original_lines)} → {len(translated_lines)}), пропуск")
+                stats["skipped_chapters"] += 1
+                continue
+            
+            stats["chapters"] += 1
+            line_pairs.update(zip(original_lines, translated_lines))
+        
+        # Собираем записи без перевода постранично, обновляем одним пакетом
+        ids, metadatas = [], []
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            page_ids = page.get('ids') or []
+            for memory_id, doc, metadata in zip(page_ids, page['documents'], page['metadatas']):
+                metadata = dict(metadata or {})
+                if metadata.get("target_text"):
+                    continue
+                stats["missing"] += 1
+                target_text = line_pairs.get(doc.strip())
+                if target_text:
+                    metadata["target_text"] = target_text
+                    metadata.setdefault("translator", "Backfill")
+                    ids.append(memory_id)
+                    metadatas.append(metadata)
+            if len(page_ids) < page_size:
+                break
+            offset += page_size
+        
+        if ids:
+            self.collection.update(ids=ids, metadatas=metadatas)
+        stats["filled"] = len(ids)
+        
+        print(f"✅ Заполнено переводов: {stats['filled']}/{stats['missing']} "
+              f"(глав: {stats['chapters']}, пропущено: {stats['skipped_chapters']})")
+        return stats
+    
+    def _iter_entries(self, page_size: int = 1000):
+        """Перебрать все записи памяти: (id, исходный текст, метаданные)"""
+        if self.collection:
+            offset = 0
+            while True:
+                page = self.collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+                for memory_id, doc, metadata in zip(page['ids'], page['documents'], page['metadatas']):
+                    yield memory_id, doc, metadata or {}
+                if len(page['ids']) < page_size:
+                    break
+                offset += page_size
+        else:
+            for item in self.memory_store.values():
+                yield item['id'], item['source_text'], item
+    
+    def _disk_usage(self) -> int:
+        """Размер каталога памяти на диске (байт)"""
+        total = 0
+        for root, _, files in os.walk(self.db_path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+    
+    def _measure_search_latency(self, samples: List[str]) -> float:
+        """Среднее время find_similar по выборке строк (мс)"""
+        if not samples:
+            return 0.0
+        start_time = time.time()
+        for text in samples:
+            self.find_similar(text, threshold=TRANSLATION_MEMORY["similarity_threshold"])
+        return (time.time() - start_time) / len(samples) * 1000
+    
+    def compact(self, quality_floor: Optional[float] = None, max_age_days: Optional[float] = None,
+                max_entries: Optional[int] = None) -> Dict[str, Any]:
+        """Компакция памяти: дубликаты, низкое качество, возраст и потолок размера
+        
+        Из записей с одинаковым исходным текстом в одной главе остаётся одна —
+        с лучшим quality_score, при равенстве — самая свежая. Записи разных глав
+        не схлопываются: find_exact и контекст глав ищут их по главе. Записи без
+        оценки порогом качества не удаляются. Параметры по умолчанию берутся
+        из TM_COMPACTION.
+        """
+        quality_floor = TM_COMPACTION["quality_floor"] if quality_floor is None else quality_floor
+        max_age_days = TM_COMPACTION["max_age_days"] if max_age_days is None else max_age_days
+        max_entries = TM_COMPACTION["max_entries"] if max_entries is None else max_entries
+        
+        self.flush()
+        entries = list(self._iter_entries())
+        samples = [doc for _, doc, _ in entries[:: max(1, len(entries) // TM_COMPACTION["latency_sample_size"])]]
+        samples = samples[:TM_COMPACTION["latency_sample_size"]]
+        
+        report = {
+            "entries_before": len(entries),
+            "disk_bytes_before": self._disk_usage(),
+            "search_ms_before": self._measure_search_latency(samples),
+            "removed_duplicates": 0,
+            "removed_low_quality": 0,
+            "removed_old": 0,
+            "removed_over_cap": 0
+        }
+        
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat() if max_age_days else None
+        to_delete = []
+        best: Dict[tuple, tuple] = {}
+        
+        for memory_id, doc, metadata in entries:
+            quality = metadata.get("quality_score")
+            if self.collection and quality == 0.0:
+                # Раньше ChromaDB получала 0.0 вместо отсутствующей оценки
+                quality = None
+            timestamp = metadata.get("timestamp") or ""
+            
+            if quality is not None and quality < quality_floor:
+                to_delete.append(memory_id)
+                report["removed_low_quality"] += 1
+                continue
+            if cutoff and timestamp and timestamp < cutoff:
+                to_delete.append(memory_id)
+                report["removed_old"] += 1
+                continue
+            
+            # Дубликаты — та же строка в той же главе (id, по которому её ищут): лучшее качество, затем свежесть
+            rank = (quality if quality is not None else 0.0, timestamp)
+            source_key = (self._source_key(doc), metadata.get("chapter") or "")
+            current = best.get(source_key)
+            if current is None:
+                best[source_key] = (rank, memory_id)
+            else:
+                loser = memory_id if rank <= current[0] else current[1]
+                if loser == current[1]:
+                    best[source_key] = (rank, memory_id)
+                to_delete.append(loser)
+                report["removed_duplicates"] += 1
+        
+        if max_entries and len(best) > max_entries:
+            ranked = sorted(best.values(), reverse=True)
+            over_cap = [memory_id for _, memory_id in ranked[max_entries:]]
+            to_delete.extend(over_cap)
+            report["removed_over_cap"] = len(over_cap)
+        
+        if to_delete:
+            if self.collection:
+                for start in range(0, len(to_delete), 1000):
+                    self.collection.delete(ids=to_delete[start:start + 1000])
+            else:
+                self.memory_store.delete_many(to_delete)
+                self.memory_store.compact()
+            
+            self.chapter_cache.clear()
+            self.rebuild_source_filter()
+        
+        report["entries_after"] = report["entries_before"] - len(to_delete)
+        report["disk_bytes_after"] = self._disk_usage()
+        report["search_ms_after"] = self._measure_search_latency(samples)
+        
+        print(f"🧹 Компакция памяти: {report['entries_before']} → {report['entries_after']} записей")
+        print(f"   • дубликатов: {report['removed_duplicates']}, низкое качество: {report['removed_low_quality']}, "
+              f"устаревших: {report['removed_old']}, сверх лимита: {report['removed_over_cap']}")
+        print(f"   • диск: {report['disk_bytes_before'] / 1024:.0f} → {report['disk_bytes_after'] / 1024:.0f} КБ")
+        print(f"   • поиск: {report['search_ms_before']:.2f} → {report['search_ms_after']:.2f} мс")
+        return report
+    
+    def get_embedding_cache_stats(self) -> Dict[str, Any]:
+        """Статистика дискового кэша embeddings"""
+        if self.embedding_model is None or self.embedding_model.cache is None:
+            return {}
+        return self.embedding_model.cache.get_stats()
     
     def get_statistics(self) -> Dict[str, Any]:
         """Получить статистику по переводам"""
@@ -342,18 +977,10 @@ class TranslationMemoryManager:
                 return {"total_translations": 0, "database_type": "ChromaDB (ошибка)"}
         else:
             try:
-                with open(self.memory_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                chapters = set(item.get('chapter', '') for item in data)
-                characters = set(item.get('character', '') for item in data if item.get('character'))
-                
-                return {
-                    "total_translations": len(data),
-                    "chapters": len(chapters),
-                    "characters": len(characters),
-                    "database_type": "File System"
-                }
+                # Счётчики ведутся хранилищем по мере добавления записей
+                stats = self.memory_store.get_stats()
+                stats["database_type"] = "NumPy" if self.vector_index is not None else "File System"
+                return stats
             except Exception as e:
                 print(f"❌ Ошибка получения статистики: {e}")
                 return {"total_translations": 0, "database_type": "File System (ошибка)"}
@@ -400,4 +1027,10 @@ def test_translation_memory():
     print(f"\n📊 Статистика: {stats}")
 
 if __name__ == "__main__":
-    test_translation_memory()
+    if len(sys.argv) > 1 and sys.argv[1] == "--backfill-targets":
+        # python tools/context_manager.py --backfill-targets [original_dir] [translated_dir]
+        TranslationMemoryManager().backfill_target_texts(*sys.argv[2:4])
+    elif len(sys.argv) > 1 and sys.argv[1] == "--compact":
+        TranslationMemoryManager().compact()
+    else:
+        test_translation_memory()
@@ -8,31 +8,89 @@
 import json
 import hashlib
 import os
+import sys
 import time
+import tempfile
+import uuid
+import multiprocessing
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from tools.file_lock import FileLock, atomic_write_json, replace_file
+from tools.cache_snapshot import CacheSnapshot, write_cache_snapshot
+from tools.bloom_filter import BloomFilter
+
 class DeepLCache:
     """Кэш для DeepL API запросов"""
     
-    def __init__(self, cache_dir: str = "./deepl_cache", max_age_hours: int = 24):
+    def __init__(self, cache_dir: str = "./deepl_cache", max_age_hours: int = 24,
+                 save_every: int = 10, lock_timeout: float = 30.0,
+                 snapshot_path: Optional[str] = None, bloom_fp_rate: float = 0.01,
+                 journal_merge_every: int = 1000):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
         self.max_age_hours = max_age_hours
         self.cache_file = self.cache_dir / "translations.json"
+        self.lock_file = self.cache_dir / "translations.json.lock"
+        self.journal_file = self.cache_dir / "translations.journal.jsonl"
+        self.snapshot_file = self.cache_dir / "translations.snapshot"
+        self.save_every = save_every
+        self.lock_timeout = lock_timeout
+        self.bloom_fp_rate = bloom_fp_rate
+        self.journal_merge_every = journal_merge_every
+        
+        # Поколение журнала и позиция прочитанной части (для подхвата записей других процессов)
+        self._journal_offset = 0
+        self._journal_id = None
+        self._journal_lines = 0
+        
+        # Режим снимка: общий неизменяемый mmap-снимок + маленькая локальная дельта.
+        # Свои новые записи процесс только дописывает в журнал, не читая файл кэша
+        self.snapshot = None
+        self.snapshot_bloom = None
+        if snapshot_path and not Path(snapshot_path).exists():
+            print(f"⚠️ Снимок кэша не найден: {snapshot_path}, загружаем кэш целиком")
+        if snapshot_path and Path(snapshot_path).exists():
+            self.snapshot = CacheSnapshot(snapshot_path)
+            self.snapshot_bloom = self._load_snapshot_bloom()
+            self.cache = {}
+        else:
+            # Загружаем существующий кэш и дописанные после него записи журнала
+            # (под блокировкой, чтобы не попасть между записью файла и сменой журнала)
+            with FileLock(self.lock_file, timeout=self.lock_timeout):
+                self.cache = self._load_state()
         
-        # Загружаем существующий кэш
-        self.cache = self._load_cache()
+        # Изменения с момента последнего сохранения (для слияния с другими процессами)
+        self._dirty_keys = set()
+        self._deleted_keys: Dict[str, str] = {}  # ключ → timestamp удалённой записи
         
         # Статистика
         self.stats = {
             "hits": 0,
             "misses": 0,
             "total_requests": 0,
-            "cache_size": 0
+            "cache_size": len(self.cache) + (len(self.snapshot) if self.snapshot else 0),
+            "snapshot_hits": 0,
+            "bloom_skips": 0
         }
     
+    def _load_snapshot_bloom(self) -> BloomFilter:
+        """Загрузить Bloom-фильтр ключей снимка или перестроить, если он устарел"""
+        bloom_path = Path(f"{self.snapshot.path}.bloom")
+        fingerprint = self.snapshot.fingerprint()
+        
+        bloom = BloomFilter.load(bloom_path)
+        if bloom is None or bloom.source_fingerprint != fingerprint:
+            bloom = BloomFilter.from_keys(self.snapshot.iter_keys(), self.bloom_fp_rate,
+                                          capacity=max(len(self.snapshot), 1024))
+            bloom.source_fingerprint = fingerprint
+            try:
+                bloom.save(bloom_path)
+            except OSError as e:
+                print(f"⚠️ Не удалось сохранить Bloom-фильтр снимка: {e}")
+        return bloom
+    
     def _load_cache(self) -> Dict[str, Any]:
         """Загрузить кэш из файла"""
         if self.cache_file.exists():
@@ -45,18 +103,147 @@ class DeepLCache:
                 return {}
         return {}
     
-    def _save_cache(self):
-        """Сохранить кэш в файл"""
+    def _load_state(self) -> Dict[str, Any]:
+        """Загрузить основной файл кэша и применить к нему журнал целиком"""
+        cache = self._load_cache()
+        self._journal_offset = 0
+        self._journal_id = None
+        self._journal_lines = 0
+        self._read_journal(cache)
+        return cache
+    
+    def _read_journal(self, cache: Dict[str, Any]):
+        """Применить к кэшу строки журнала, появившиеся после последнего чтения
+        
+        Первая строка журнала — заголовок с идентификатором поколения.
+        """
+        if not self.journal_file.exists():
+            return
+        
+        with open(self.journal_file, 'rb') as f:
+            if self._journal_offset == 0:
+                header = f.readline()
+                if not header.endswith(b'\n'):
+                    return
+                try:
+                    self._journal_id = json.loads(header).get('journal')
+                except json.JSONDecodeError:
+                    return
+                self._journal_offset = len(header)
+            
+            f.seek(self._journal_offset)
+            for raw_line in f:
+                # Недописанная последняя строка будет прочитана при следующем обновлении
+                if not raw_line.endswith(b'\n'):
+                    break
+                self._journal_offset += len(raw_line)
+                self._journal_lines += 1
+                try:
+                    record = json.loads(raw_line)
+                except json.JSONDecodeError:
+                    continue
+                self._apply_journal_record(cache, record)
+    
+    def _journal_generation(self) -> Optional[str]:
+        """Идентификатор текущего поколения журнала (None — журнала нет)"""
         try:
-            data = {
-                'cache': self.cache,
-                'metadata': {
-                    'last_updated': datetime.now().isoformat(),
-                    'stats': self.stats
-                }
+            with open(self.journal_file, 'rb') as f:
+                return json.loads(f.readline()).get('journal')
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    def _start_journal(self):
+        """Начать новое поколение журнала (атомарно заменяет старый файл)"""
+        tmp_path = f"{self.journal_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'journal': uuid.uuid4().hex}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        replace_file(tmp_path, self.journal_file)
+    
+    def _apply_journal_record(self, cache: Dict[str, Any], record: Dict[str, Any]):
+        """Применить строку журнала (новее timestamp — побеждает)"""
+        key = record.get('key')
+        if not key:
+            return
+        
+        entry = cache.get(key)
+        if 'deleted' in record:
+            # Удаление применяется только к той версии записи, которую видел удаливший
+            if entry is not None and entry.get('timestamp', '') <= record['deleted']:
+                del cache[key]
+        elif entry is None or entry.get('timestamp', '') < record['entry'].get('timestamp', ''):
+            cache[key] = record['entry']
+    
+    def _refresh(self):
+        """Подхватить записи других процессов из журнала"""
+        generation = self._journal_generation()
+        
+        # Журнал слит в основной файл другим процессом — перечитываем всё
+        if generation != self._journal_id:
+            self.cache = self._load_state()
+        elif generation is not None and os.path.getsize(self.journal_file) > self._journal_offset:
+            self._read_journal(self.cache)
+    
+    def _journal_records(self) -> List[Dict[str, Any]]:
+        """Строки журнала для локальных изменений с момента последнего сохранения"""
+        records = [{'key': key, 'deleted': timestamp} for key, timestamp in self._deleted_keys.items()]
+        records.extend({'key': key, 'entry': self.cache[key]}
+                       for key in self._dirty_keys if key in self.cache)
+        return records
+    
+    def _merge_journal(self):
+        """Слить журнал в основной файл и начать новый журнал (под блокировкой)
+        
+        Вызывается после _refresh, поэтому self.cache уже содержит основной
+        файл вместе со всем журналом.
+        """
+        data = {
+            'cache': self.cache,
+            'metadata': {
+                'last_updated': datetime.now().isoformat(),
+                'stats': self.stats
             }
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+        }
+        atomic_write_json(self.cache_file, data, ensure_ascii=False, indent=2)
+        
+        # Другие процессы увидят новое поколение журнала и перечитают файл кэша
+        self._start_journal()
+        self._journal_offset = 0
+        self._journal_lines = 0
+        self._read_journal(self.cache)
+    
+    def _save_cache(self):
+        """Сохранить кэш в файл
+        
+        Под межпроцессной блокировкой дописывает локальные изменения в журнал
+        и подхватывает записи других процессов, поэтому параллельные процессы
+        не затирают записи друг друга. Основной файл переписывается только
+        при слиянии журнала — раз в journal_merge_every строк.
+        """
+        try:
+            with FileLock(self.lock_file, timeout=self.lock_timeout):
+                records = self._journal_records()
+                if records:
+                    if not self.journal_file.exists():
+                        self._start_journal()
+                    payload = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+                    with open(self.journal_file, 'a', encoding='utf-8') as f:
+                        f.write(payload)
+                        f.flush()
+                        os.fsync(f.fileno())
+                
+                # В режиме снимка держим в памяти только свою дельту
+                if self.snapshot is None:
+                    # Свои строки журнала применяются повторно без изменений
+                    self._refresh()
+                    if self._journal_lines >= self.journal_merge_every:
+                        self._merge_journal()
+            
+            if self.snapshot is None:
+                self.stats["cache_size"] = len(self.cache)
+            self._dirty_keys.clear()
+            self._deleted_keys.clear()
         except Exception as e:
             print(f"⚠️ Ошибка сохранения кэша: {e}")
     
@@ -89,7 +276,21 @@ class DeepLCache:
                 return cache_entry['translation']
             else:
                 # Удаляем устаревшую запись
-                del self.cache[key]
+                self._forget(key)
+        elif self.snapshot is not None:
+            # Гарантированный промах — без бинарного поиска по снимку
+            if key not in self.snapshot_bloom:
+                self.stats["bloom_skips"] += 1
+                self.stats["misses"] += 1
+                return None
+            
+            snapshot_entry = self.snapshot.get(key)
+            if snapshot_entry is not None:
+                translation, timestamp = snapshot_entry
+                if time.time() - timestamp <= self.max_age_hours * 3600:
+                    self.stats["hits"] += 1
+                    self.stats["snapshot_hits"] += 1
+                    return translation
         
         self.stats["misses"] += 1
         return None
@@ -107,12 +308,20 @@ class DeepLCache:
             'text_length': len(text)
         }
         
-        self.stats["cache_size"] = len(self.cache)
+        self._dirty_keys.add(key)
+        self.stats["cache_size"] = len(self.cache) + (len(self.snapshot) if self.snapshot else 0)
         
         # Периодически сохраняем кэш
-        if len(self.cache) % 10 == 0:
+        if len(self._dirty_keys) >= self.save_every:
             self._save_cache()
     
+    def _forget(self, key: str):
+        """Удалить запись локально и запомнить удаление для слияния при сохранении"""
+        entry = self.cache.pop(key, None)
+        if entry is not None:
+            self._deleted_keys[key] = entry.get('timestamp', '')
+        self._dirty_keys.discard(key)
+    
     def get_or_translate(self, text: str, translate_func, source_lang: str = 'EN', target_lang: str = 'RU') -> str:
         """Получить из кэша или перевести"""
         # Проверяем кэш
@@ -165,6 +374,46 @@ class DeepLCache:
         
         return results
     
+    def export_snapshot(self, path: Optional[str] = None) -> Path:
+        """Экспортировать неизменяемый снимок кэша для рабочих процессов
+        
+        Сначала сохраняет локальные изменения и сливает журнал в файл кэша,
+        затем пишет снимок из актуальных записей (без устаревших).
+        """
+        snapshot_path = Path(path) if path else self.snapshot_file
+        self._save_cache()
+        
+        # Снимок пишется из полного состояния: основной файл + журнал
+        with FileLock(self.lock_file, timeout=self.lock_timeout):
+            local_cache = self.cache
+            self.cache = self._load_state()
+            self._merge_journal()
+            state = self.cache
+            if self.snapshot is not None:
+                self.cache = local_cache
+        
+        entries = {}
+        for key, entry in state.items():
+            if self._is_expired(entry['timestamp']):
+                continue
+            timestamp = datetime.fromisoformat(entry['timestamp']).timestamp()
+            entries[key] = (entry['translation'], timestamp)
+        
+        count = write_cache_snapshot(entries, snapshot_path)
+        
+        # Фильтр ключей перестраивается вместе со снимком
+        snapshot = CacheSnapshot(snapshot_path)
+        try:
+            bloom = BloomFilter.from_keys(entries.keys(), self.bloom_fp_rate,
+                                          capacity=max(count, 1024))
+            bloom.source_fingerprint = snapshot.fingerprint()
+            bloom.save(f"{snapshot_path}.bloom")
+        finally:
+            snapshot.close()
+        
+        print(f"📦 Снимок кэша экспортирован: {count} записей → {snapshot_path}")
+        return snapshot_path
+    
     def clear_expired(self):
         """Очистить устаревшие записи"""
         expired_keys = []
@@ -173,14 +422,15 @@ class DeepLCache:
                 expired_keys.append(key)
         
         for key in expired_keys:
-            del self.cache[key]
+            self._forget(key)
         
         self.stats["cache_size"] = len(self.cache)
         print(f"🧹 Удалено устаревших записей: {len(expired_keys)}")
     
     def clear_all(self):
         """Очистить весь кэш"""
-        self.cache.clear()
+        for key in list(self.cache):
+            self._forget(key)
         self.stats["cache_size"] = 0
         print("🧹 Кэш полностью очищен")
     
@@ -194,6 +444,9 @@ class DeepLCache:
             "hits": self.stats["hits"],
             "misses": self.stats["misses"],
             "hit_rate": round(hit_rate, 2),
+            "snapshot_hits": self.stats["snapshot_hits"],
+            "bloom_skips": self.stats["bloom_skips"],
+            "snapshot_file": str(self.snapshot.path) if self.snapshot else None,
             "cache_file": str(self.cache_file),
             "max_age_hours": self.max_age_hours
         }
@@ -221,8 +474,10 @@ class DeepLCache:
 class CachedDeepLTranslator:
     """DeepL переводчик с кэшированием"""
     
-    def __init__(self, cache_dir: str = "./deepl_cache"):
-        self.cache = DeepLCache(cache_dir)
+    def __init__(self, cache_dir: str = "./deepl_cache", snapshot_path: Optional[str] = None,
+                 bloom_fp_rate: float = 0.01, save_every: int = 10, journal_merge_every: int = 1000):
+        self.cache = DeepLCache(cache_dir, snapshot_path=snapshot_path, bloom_fp_rate=bloom_fp_rate,
+                                save_every=save_every, journal_merge_every=journal_merge_every)
         
         # Инициализируем базовый переводчик
         try:
@@ -306,5 +561,49 @@ def test_deepl_cache():
     
     print("✅ Тестирование завершено")
 
+def _concurrent_writer(cache_dir: str, worker_id: int, entries: int):
+    """Процесс-писатель для стресс-теста: пишет свои записи в общий кэш"""
+    cache = DeepLCache(cache_dir, save_every=7, journal_merge_every=50)
+    for i in range(entries):
+        cache.set(f"worker {worker_id} line {i}", f"[RU] {worker_id}-{i}")
+    cache._save_cache()
+
+def test_concurrent_writers(num_workers: int = 4, entries_per_worker: int = 100):
+    """Стресс-тест: N процессов пишут в один кэш, ни одна запись не теряется"""
+    print("🧪 СТРЕСС-ТЕСТ ПАРАЛЛЕЛЬНОЙ ЗАПИСИ В КЭШ")
+    print("=" * 50)
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        workers = [
+            multiprocessing.Process(target=_concurrent_writer,
+                                    args=(cache_dir, worker_id, entries_per_worker))
+            for worker_id in range(num_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        
+        cache = DeepLCache(cache_dir)
+        expected = num_workers * entries_per_worker
+        missing = [
+            (worker_id, i)
+            for worker_id in range(num_workers)
+            for i in range(entries_per_worker)
+            if cache.get(f"worker {worker_id} line {i}") != f"[RU] {worker_id}-{i}"
+        ]
+        
+        print(f"Процессов: {num_workers}, ожидалось записей: {expected}, в кэше: {len(cache.cache)}")
+        assert all(worker.exitcode == 0 for worker in workers), "Процесс-писатель завершился с ошибкой"
+        assert not missing, f"Потеряно записей: {len(missing)}"
+    
+    print("✅ Ни одна запись не потеряна")
+
 if __name__ == "__main__":
-    test_deepl_cache()
+    if len(sys.argv) > 1 and sys.argv[1] == "--export-snapshot":
+        # python -m tools.deepl_cache --export-snapshot [путь_снимка]
+        from config import DEEPL_CACHE
+        DeepLCache(DEEPL_CACHE["cache_dir"]).export_snapshot(sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        test_deepl_cache()
+        test_concurrent_writers()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Дисковый кэш embeddings: хэш текста + модель → вектор
+Векторы лежат в memory-mapped .npy, ключи — в JSONL-сайдкаре; одна и та же
+строка не пересчитывается ни между запусками, ни между коллекциями
+"""
+
+import os
+import re
+import json
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from tools.file_lock import FileLock, atomic_write_json, replace_file
+
+
+def grow_npy_memmap(path: Path, used_rows: int, capacity: int, dim: int,
+                    dtype: np.dtype) -> np.ndarray:
+    """Пересоздать .npy большей ёмкости, скопировав занятые строки; вернуть новый memmap
+
+    Вызывается под блокировкой файла. Вызывающий закрывает своё отображение
+    файла до вызова (отображённый файл на Windows не заменить): строки
+    копируются из самого файла.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+    grown = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=dtype, shape=(capacity, dim))
+    if used_rows and path.exists():
+        current = np.load(path, mmap_mode='r')
+        grown[:used_rows] = current[:used_rows]
+        del current
+    grown.flush()
+    del grown
+    replace_file(tmp_path, path)
+    return np.load(path, mmap_mode='r+')
+
+
+class EmbeddingCache:
+    """Кэш векторов одной модели (файлы разных моделей не пересекаются)"""
+
+    def __init__(self, cache_dir: Union[str, Path], model_id: str,
+                 dtype: str = "float32", initial_capacity: int = 4096,
+                 lock_timeout: float = 30.0):
+        self.model_id = model_id
+        self.dtype = np.dtype(dtype)
+        self.initial_capacity = initial_capacity
+        self.lock_timeout = lock_timeout
+
+        # Защита от смешения моделей: отдельный каталог на модель и тип векторов
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', f"{model_id}-{self.dtype.name}")
+        self.cache_dir = Path(cache_dir) / slug
+        self.vectors_file = self.cache_dir / "vectors.npy"
+        self.keys_file = self.cache_dir / "keys.jsonl"
+        self.meta_file = self.cache_dir / "meta.json"
+        self.lock_path = self.cache_dir / "cache.lock"
+
+        self._rows: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._keys_offset = 0
+        self.count = 0
+        self.dim: Optional[int] = None
+
+        self.hits = 0
+        self.misses = 0
+
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @staticmethod
+    def text_key(text: str) -> str:
+        return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+    def _load(self):
+        """Открыть кэш, если он создан той же моделью"""
+        if not (self.meta_file.exists() and self.vectors_file.exists()):
+            return
+        try:
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get("model_id") != self.model_id or meta.get("dtype") != self.dtype.name:
+                return
+            self.dim = meta["dim"]
+            self._matrix = np.load(self.vectors_file, mmap_mode='r+')
+            self._read_keys()
+        except Exception as e:
+            print(f"⚠️ Ошибка загрузки кэша embeddings: {e}")
+            self._rows.clear()
+            self._matrix = None
+            self.count = 0
+            self._keys_offset = 0
+
+    def _read_keys(self):
+        """Дочитать ключи, добавленные после последнего чтения (в том числе другими процессами)"""
+        if not self.keys_file.exists():
+            return
+        with open(self.keys_file, 'rb') as f:
+            f.seek(self._keys_offset)
+            for raw_line in f:
+                if not raw_line.endswith(b'\n'):
+                    break
+                self._keys_offset += len(raw_line)
+                entry = json.loads(raw_line)
+                self._rows[entry["key"]] = entry["row"]
+                self.count = max(self.count, entry["row"] + 1)
+
+        # Файл мог быть создан или увеличен другим процессом — переоткрываем отображение
+        if self.count and (self._matrix is None or self.count > len(self._matrix)):
+            self._matrix = None
+            self._matrix = np.load(self.vectors_file, mmap_mode='r+')
+            self.dim = self._matrix.shape[1]
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Векторы из кэша (None для промахов)"""
+        vectors: List[Optional[np.ndarray]] = []
+        for text in texts:
+            row = self._rows.get(self.text_key(text))
+            if row is not None and self._matrix is not None and row < len(self._matrix):
+                # Копия, а не срез отображения: иначе файл остаётся отображённым и его не заменить
+                vectors.append(np.array(self._matrix[row], dtype=np.float32))
+                self.hits += 1
+            else:
+                vectors.append(None)
+                self.misses += 1
+        return vectors
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """Сохранить векторы новых строк"""
+        if not texts:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with FileLock(self.lock_path, timeout=self.lock_timeout):
+                self._read_keys()
+
+                items = {}
+                for text, vector in zip(texts, vectors):
+                    key = self.text_key(text)
+                    if key not in self._rows:
+                        items[key] = vector
+                if not items:
+                    return
+
+                dim = int(vectors.shape[1])
+                if self.dim is None:
+                    self.dim = dim
+
+                capacity = 0 if self._matrix is None else len(self._matrix)
+                if self.count + len(items) > capacity:
+                    new_capacity = max(self.initial_capacity, capacity * 2, self.count + len(items))
+                    # Отображение закрываем до замены файла
+                    self._matrix = None
+                    self._matrix = grow_npy_memmap(self.vectors_file, self.count,
+                                                   new_capacity, dim, self.dtype)
+
+                lines = []
+                for key, vector in items.items():
+                    self._matrix[self.count] = vector
+                    self._rows[key] = self.count
+                    lines.append(json.dumps({"key": key, "row": self.count}))
+                    self.count += 1
+                self._matrix.flush()
+
+                with open(self.keys_file, 'a', encoding='utf-8') as f:
+                    f.write('\n'.join(lines) + '\n')
+                self._keys_offset = os.path.getsize(self.keys_file)
+                atomic_write_json(self.meta_file, {
+                    "model_id": self.model_id, "dim": self.dim, "dtype": self.dtype.name
+                })
+        except Exception as e:
+            print(f"⚠️ Ошибка сохранения кэша embeddings: {e}")
+
+    def get_stats(self) -> Dict[str, Union[int, float, str]]:
+        """Статистика попаданий"""
+        total = self.hits + self.misses
+        return {
+            "model_id": self.model_id,
+            "size": len(self._rows),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Модель embeddings для поиска похожих переводов
+Загружается при первом обращении (или заранее в фоновом потоке):
+sentence-transformers, если установлен, иначе встроенная ONNX-модель
+ChromaDB (та же all-MiniLM-L6-v2)
+"""
+
+import time
+import threading
+import importlib.util
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import EMBEDDING_CACHE
+from tools.embedding_cache import EmbeddingCache
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Общие модели процесса: обе коллекции используют одну загрузку и один кэш
+_shared_models: Dict[str, "EmbeddingModel"] = {}
+
+
+def embeddings_available() -> bool:
+    """Есть ли в окружении библиотека для вычисления embeddings"""
+    return any(importlib.util.find_spec(name) is not None
+               for name in ("sentence_transformers", "chromadb"))
+
+
+class EmbeddingModel:
+    """Обёртка модели: нормализованные float32-векторы, ленивая загрузка"""
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, device: str = "cpu",
+                 batch_size: int = 64, cache_dir: Optional[str] = None):
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = batch_size
+        self._encode = None
+        self._lock = threading.Lock()
+        self._warm_up_thread: Optional[threading.Thread] = None
+
+        # Время загрузки модели (с), None — ещё не загружена
+        self.load_time: Optional[float] = None
+
+        # Библиотека выбирается сразу, сама модель — при первом encode()
+        if importlib.util.find_spec("sentence_transformers") is not None:
+            self._backend = "sentence-transformers"
+        else:
+            self._backend = "chromadb-onnx"
+
+        # Дисковый кэш векторов (ключ — хэш текста, каталог — id модели)
+        self.cache: Optional[EmbeddingCache] = None
+        if cache_dir:
+            self.cache = EmbeddingCache(cache_dir, self.model_id, dtype=EMBEDDING_CACHE["dtype"])
+
+    @property
+    def model_id(self) -> str:
+        """Идентификатор модели (векторы разных моделей несовместимы)"""
+        return f"{self._backend}:{self.model_name}"
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._encode is not None
+
+    def _ensure_loaded(self):
+        if self._encode is not None:
+            return
+        # Параллельные вызовы (фоновый прогрев и первый запрос) ждут одну загрузку
+        with self._lock:
+            if self._encode is not None:
+                return
+            start_time = time.time()
+            self._load()
+            self.load_time = time.time() - start_time
+            print(f"✅ Модель embeddings {self.model_name} загружена за {self.load_time:.2f}с")
+
+    def _load(self):
+        if self._backend == "sentence-transformers":
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(self.model_name, device=self.device)
+            self._encode = lambda texts: model.encode(
+                texts, batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False
+            )
+        else:
+            from chromadb.utils import embedding_functions
+            function = embedding_functions.DefaultEmbeddingFunction()
+            self._encode = lambda texts: np.asarray(function(texts))
+
+    def warm_up_async(self) -> threading.Thread:
+        """Загрузить модель в фоновом потоке, не блокируя запуск"""
+        if self._warm_up_thread is None and self._encode is None:
+            self._warm_up_thread = threading.Thread(
+                target=self._warm_up, name="embedding-warm-up", daemon=True
+            )
+            self._warm_up_thread.start()
+        return self._warm_up_thread
+
+    def _warm_up(self):
+        try:
+            self._ensure_loaded()
+        except Exception as e:
+            print(f"⚠️ Не удалось загрузить модель embeddings: {e}")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Векторы строк (L2-нормализованные, float32); модель считает только промахи кэша"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if self.cache is None:
+            return self._compute(texts)
+
+        cached = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        if missing:
+            computed = self._compute(missing)
+            self.cache.put_many(missing, computed)
+            by_text = dict(zip(missing, computed))
+            cached = [by_text[text] if vector is None else vector for text, vector in zip(texts, cached)]
+        return np.vstack(cached).astype(np.float32)
+
+    def _compute(self, texts: List[str]) -> np.ndarray:
+        """Посчитать векторы моделью, пакетами по batch_size"""
+        self._ensure_loaded()
+
+        chunks = [
+            np.asarray(self._encode(texts[start:start + self.batch_size]), dtype=np.float32)
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        vectors = np.vstack(chunks)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+def get_shared_model(model_name: str = DEFAULT_EMBEDDING_MODEL) -> EmbeddingModel:
+    """Модель, общая для всех менеджеров памяти процесса (с дисковым кэшем из конфига)"""
+    model = _shared_models.get(model_name)
+    if model is None:
+        cache_dir = EMBEDDING_CACHE["cache_dir"] if EMBEDDING_CACHE["enabled"] else None
+        model = EmbeddingModel(model_name, device="cpu", cache_dir=cache_dir)
+        _shared_models[model_name] = model
+    return model
+
+
+class LazyEmbeddingFunction:
+    """Embedding-функция для коллекции ChromaDB поверх EmbeddingModel
+
+    Создание коллекции не загружает модель: она грузится при первом
+    векторном запросе или добавлении записи (если не прогрета заранее).
+    """
+
+    def __init__(self, model: EmbeddingModel):
+        self.model = model
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return self.model.encode(list(input)).tolist()
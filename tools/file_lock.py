@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Межпроцессная блокировка файлов и атомарная запись
+Позволяет нескольким процессам безопасно работать с общими файлами кэша
+"""
+
+import os
+import json
+import time
+from pathlib import Path
+from typing import Any, Union
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """Advisory-блокировка через lock-файл (fcntl на POSIX, msvcrt на Windows)"""
+
+    def __init__(self, lock_path: Union[str, Path], timeout: float = 30.0,
+                 poll_interval: float = 0.05):
+        self.lock_path = str(lock_path)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd = None
+
+    def _try_lock(self) -> bool:
+        """Одна попытка захватить блокировку"""
+        try:
+            if os.name == 'nt':
+                msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self):
+        """Захватить блокировку, ожидая не дольше timeout секунд"""
+        self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+
+        while not self._try_lock():
+            if time.monotonic() >= deadline:
+                os.close(self._fd)
+                self._fd = None
+                raise TimeoutError(f"Не удалось захватить блокировку {self.lock_path} за {self.timeout}с")
+            time.sleep(self.poll_interval)
+
+    def release(self):
+        """Освободить блокировку"""
+        if self._fd is None:
+            return
+        try:
+            if os.name == 'nt':
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+def atomic_write_json(path: Union[str, Path], data: Any, retries: int = 5, **json_kwargs):
+    """Атомарно записать JSON: временный файл + fsync + os.replace
+
+    Читатели всегда видят либо старую, либо новую версию файла целиком.
+    """
+    path = str(path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, **json_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+
+    replace_file(tmp_path, path, retries)
+
+
+def replace_file(tmp_path: Union[str, Path], path: Union[str, Path], retries: int = 5):
+    """os.replace с повторами; временный файл удаляется, если замена не удалась"""
+    # На Windows replace может временно падать, пока файл открыт читателем
+    for attempt in range(retries):
+        try:
+            os.replace(tmp_path, path)
+            return
+        except PermissionError:
+            if attempt == retries - 1:
+                os.remove(tmp_path)
+                raise
+            time.sleep(0.05 * (attempt + 1))
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сканер запрещённых слов перевода
+Слова и их замены разбираются один раз; строка проверяется одним проходом
+скомпилированного выражения (целые слова), результат — исправленная строка
+и счётчики срабатываний вместо вывода в консоль
+"""
+
+from typing import Dict, List, Tuple
+
+from tools.glossary_replacer import compile_terms
+
+
+class ForbiddenWordScanner:
+    """Запрещённые слова и первая из предпочтительных альтернатив для каждого"""
+
+    def __init__(self, forbidden_words: List[str], preferred_alternatives: Dict[str, str]):
+        self.forbidden_words = [word for word in forbidden_words if word]
+
+        # "очень, весьма, чрезвычайно" → "очень"
+        self.replacements = {
+            word: alternatives.split(',')[0].strip()
+            for word, alternatives in preferred_alternatives.items()
+            if alternatives and alternatives.split(',')[0].strip()
+        }
+        self.pattern = compile_terms(self.forbidden_words)
+
+    def __len__(self) -> int:
+        return len(self.forbidden_words)
+
+    def scan(self, text: str) -> Tuple[str, Dict[str, int]]:
+        """Заменить запрещённые слова, у которых есть альтернатива
+
+        Возвращает строку и число вхождений каждого найденного слова
+        (слова без альтернативы остаются в тексте, но тоже считаются).
+        """
+        if self.pattern is None or not text:
+            return text, {}
+
+        hits: Dict[str, int] = {}
+
+        def substitute(match) -> str:
+            word = match.group(0)
+            hits[word] = hits.get(word, 0) + 1
+            return self.replacements.get(word, word)
+
+        return self.pattern.sub(substitute, text), hits
+
+    def unresolved(self, hits: Dict[str, int]) -> List[str]:
+        """Найденные слова, для которых нет замены (нужна ручная правка)"""
+        return [word for word in hits if word not in self.replacements]
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Замена терминов глоссария за один проход по строке
+Все термины собраны в одно регулярное выражение: на каждой позиции побеждает
+самый длинный термин ("spiritual energy" раньше "energy"), термины заменяются
+только целыми словами, уже вставленный перевод повторно не обрабатывается
+"""
+
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+
+def term_pattern(term: str) -> str:
+    """Термин с границами слова (только с тех сторон, где термин начинается/кончается буквой)"""
+    pattern = re.escape(term)
+    if re.match(r'\w', term[0]):
+        pattern = r'\b' + pattern
+    if re.match(r'\w', term[-1]):
+        pattern = pattern + r'\b'
+    return pattern
+
+
+def compile_terms(terms: Iterable[str]) -> Optional["re.Pattern"]:
+    """Одно выражение для набора терминов: на каждой позиции — самый длинный"""
+    terms = sorted({term for term in terms if term}, key=len, reverse=True)
+    if not terms:
+        return None
+    return re.compile('|'.join(term_pattern(term) for term in terms))
+
+
+class GlossaryReplacer:
+    """Скомпилированный глоссарий {английский термин: русский перевод}"""
+
+    def __init__(self, glossary: Dict[str, str]):
+        self.glossary = {term: translation for term, translation in glossary.items() if term}
+        self.pattern = compile_terms(self.glossary)
+
+    def __len__(self) -> int:
+        return len(self.glossary)
+
+    def replace(self, text: str) -> Tuple[str, Dict[str, int]]:
+        """Заменить термины; вернуть новую строку и число срабатываний каждого термина"""
+        if self.pattern is None or not text:
+            return text, {}
+
+        fired: Dict[str, int] = {}
+
+        def substitute(match: "re.Match") -> str:
+            term = match.group(0)
+            fired[term] = fired.get(term, 0) + 1
+            return self.glossary[term]
+
+        return self.pattern.sub(substitute, text), fired
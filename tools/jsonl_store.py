@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Append-only JSONL-хранилище записей памяти переводов
+Используется файловым fallback'ом TranslationMemoryManager, когда ChromaDB недоступен:
+файл читается один раз, новые записи дописываются в конец, индекс и счётчики
+обновляются по мере добавления
+"""
+
+import os
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from tools.file_lock import FileLock
+
+
+class JsonlMemoryStore:
+    """Журнал записей "по одной JSON-строке" с индексом id → запись в памяти
+
+    Повторная запись с тем же id заменяет предыдущую, запись вида
+    {"id": ..., "deleted": true} удаляет её. Устаревшие строки убираются компакцией.
+    """
+
+    def __init__(self, path: Union[str, Path], compact_ratio: float = 0.5,
+                 lock_timeout: float = 30.0):
+        self.path = Path(path)
+        self.lock_path = f"{self.path}.lock"
+        self.compact_ratio = compact_ratio
+        self.lock_timeout = lock_timeout
+
+        # Индексы: id → запись, глава → id (в порядке добавления)
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.chapter_index: Dict[str, Dict[str, None]] = {}
+
+        # Счётчики для O(1)-статистики
+        self.chapter_counts: Counter = Counter()
+        self.character_counts: Counter = Counter()
+        self.dead_lines = 0
+
+        # Вторичные индексы по исходному тексту (add/remove/clear), обновляются вместе с журналом
+        self.text_indexes: List[Any] = []
+
+        # Позиция прочитанного хвоста файла (для подхвата записей других процессов)
+        self._offset = 0
+        self._inode = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, record_id: str) -> bool:
+        return record_id in self.records
+
+    def _reset(self):
+        """Очистить индексы перед полной перезагрузкой"""
+        self.records.clear()
+        self.chapter_index.clear()
+        self.chapter_counts.clear()
+        self.character_counts.clear()
+        self.dead_lines = 0
+        self._offset = 0
+        for index in self.text_indexes:
+            index.clear()
+
+    def _load(self):
+        """Прочитать журнал целиком"""
+        self._reset()
+        if not self.path.exists():
+            return
+        self._inode = os.stat(self.path).st_ino
+        self._read_tail()
+
+    def _read_tail(self):
+        """Дочитать строки, появившиеся после последнего чтения"""
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            for raw_line in f:
+                # Недописанная последняя строка будет прочитана при следующем обновлении
+                if not raw_line.endswith(b'\n'):
+                    break
+                self._offset += len(raw_line)
+                try:
+                    record = json.loads(raw_line)
+                except json.JSONDecodeError:
+                    self.dead_lines += 1
+                    continue
+                self._apply(record)
+
+    def refresh(self):
+        """Подхватить изменения файла другими процессами"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            if self.records:
+                self._reset()
+            return
+
+        # Файл заменён компакцией другого процесса — перечитываем полностью
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._load()
+        elif stat.st_size > self._offset:
+            self._read_tail()
+
+    def _apply(self, record: Dict[str, Any]):
+        """Применить строку журнала к индексам"""
+        record_id = record.get('id')
+        if not record_id:
+            self.dead_lines += 1
+            return
+
+        if record_id in self.records:
+            self._unindex(self.records.pop(record_id))
+            self.dead_lines += 1
+
+        if record.get('deleted'):
+            self.dead_lines += 1
+            return
+
+        self.records[record_id] = record
+        for index in self.text_indexes:
+            index.add(record_id, record.get('source_text', ''))
+        chapter = record.get('chapter') or ''
+        self.chapter_index.setdefault(chapter, {})[record_id] = None
+        self.chapter_counts[chapter] += 1
+        if record.get('character'):
+            self.character_counts[record['character']] += 1
+
+    def _unindex(self, record: Dict[str, Any]):
+        """Убрать запись из вторичных индексов и счётчиков"""
+        for index in self.text_indexes:
+            index.remove(record['id'])
+        chapter = record.get('chapter') or ''
+        self.chapter_index.get(chapter, {}).pop(record['id'], None)
+        self.chapter_counts[chapter] -= 1
+        if self.chapter_counts[chapter] <= 0:
+            del self.chapter_counts[chapter]
+            self.chapter_index.pop(chapter, None)
+        character = record.get('character')
+        if character:
+            self.character_counts[character] -= 1
+            if self.character_counts[character] <= 0:
+                del self.character_counts[character]
+
+    def attach_index(self, index: Any):
+        """Подключить индекс по исходному тексту и заполнить его текущими записями"""
+        self.text_indexes.append(index)
+        for record_id, record in self.records.items():
+            index.add(record_id, record.get('source_text', ''))
+
+    def _append_lines(self, records: List[Dict[str, Any]]):
+        """Дописать строки в конец журнала под блокировкой"""
+        if not records:
+            return
+        payload = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        with FileLock(self.lock_path, timeout=self.lock_timeout):
+            # Сначала подхватываем чужие записи, чтобы не пропустить их в индексе
+            self.refresh()
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            if self._inode is None:
+                self._inode = os.stat(self.path).st_ino
+            self._read_tail()
+
+        if self.dead_lines > max(len(self.records), 1) * self.compact_ratio:
+            self.compact()
+
+    def append_many(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Добавить (или заменить по id) пачку записей"""
+        records = [record for record in records if record.get('id')]
+        self._append_lines(records)
+        return len(records)
+
+    def append(self, record: Dict[str, Any]):
+        """Добавить одну запись"""
+        self.append_many([record])
+
+    def delete_many(self, record_ids: Iterable[str]) -> int:
+        """Удалить записи (пишутся отметки удаления)"""
+        tombstones = [{'id': record_id, 'deleted': True}
+                      for record_id in record_ids if record_id in self.records]
+        self._append_lines(tombstones)
+        return len(tombstones)
+
+    def get(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """Получить запись по id"""
+        return self.records.get(record_id)
+
+    def values(self) -> Iterator[Dict[str, Any]]:
+        """Все живые записи в порядке добавления"""
+        return iter(list(self.records.values()))
+
+    def by_chapter(self, chapter: str) -> List[Dict[str, Any]]:
+        """Записи главы в порядке добавления"""
+        return [self.records[record_id] for record_id in self.chapter_index.get(chapter, {})]
+
+    def compact(self):
+        """Переписать журнал без устаревших строк (атомарно)"""
+        with FileLock(self.lock_path, timeout=self.lock_timeout):
+            self.refresh()
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in self.records.values():
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+            stat = os.stat(self.path)
+            self._inode = stat.st_ino
+            self._offset = stat.st_size
+            self.dead_lines = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        """Статистика хранилища (без чтения файла)"""
+        return {
+            "total_translations": len(self.records),
+            "chapters": len(self.chapter_counts),
+            "characters": len(self.character_counts),
+            "dead_lines": self.dead_lines
+        }
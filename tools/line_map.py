@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Построчная карта переводов для инкрементального перевода глав
+Хранит для каждой строки оригинала итоговый перевод и его источник.
+Карта действительна только для той версии правил пост-обработки, по которой
+построена: при смене глоссария, запрещённых слов или стилей строки переводятся заново
+"""
+
+import json
+import hashlib
+from pathlib import Path
+from typing import Dict, Any, Optional
+from datetime import datetime
+
+from tools.file_lock import atomic_write_json
+
+
+class LineTranslationMap:
+    """Карта "хэш строки оригинала → перевод + происхождение" для одного файла"""
+
+    def __init__(self, map_dir: str, source_file: str, rules_version: str = ""):
+        self.map_dir = Path(map_dir)
+        self.source_file = source_file
+        self.rules_version = rules_version
+        self.map_file = self.map_dir / f"{Path(source_file).stem}.lines.json"
+
+        # Предыдущий прогон (читается) и текущий прогон (пишется)
+        self.previous = self._load()
+        self.current: Dict[str, Dict[str, Any]] = {}
+
+        # Статистика
+        self.stats = {
+            "reused": 0,
+            "translated": 0
+        }
+
+    @staticmethod
+    def line_key(line: str, translation_style: str = "", speaker: str = "") -> str:
+        """Ключ строки: хэш содержимого, стиля перевода и говорящего"""
+        return hashlib.md5(f"{line}|{translation_style}|{speaker}".encode('utf-8')).hexdigest()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Загрузить карту предыдущего прогона"""
+        if not self.map_file.exists():
+            return {}
+        try:
+            with open(self.map_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('rules_version', '') != self.rules_version:
+                print(f"🔄 Правила пост-обработки изменились, карта строк {self.map_file.name} не используется")
+                return {}
+            return data.get('lines', {})
+        except Exception as e:
+            print(f"⚠️ Ошибка загрузки карты строк: {e}")
+            return {}
+
+    def set_rules_version(self, rules_version: str):
+        """Сменить версию правил; переводы предыдущего прогона по старым правилам отбрасываются"""
+        if rules_version == self.rules_version:
+            return
+        self.rules_version = rules_version
+        if self.previous:
+            print(f"🔄 Правила пост-обработки изменились, карта строк {self.map_file.name} не используется")
+        self.previous = {}
+        self.current = {}
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Найти перевод строки из предыдущего прогона"""
+        entry = self.previous.get(key)
+        if entry is not None:
+            self.stats["reused"] += 1
+        return entry
+
+    def record(self, key: str, entry: Dict[str, Any], reused: bool = False):
+        """Запомнить итоговый перевод строки для следующего прогона"""
+        self.current[key] = entry
+        if not reused:
+            self.stats["translated"] += 1
+
+    def save(self):
+        """Сохранить карту текущего прогона (строки, которых больше нет, отбрасываются)"""
+        try:
+            self.map_dir.mkdir(parents=True, exist_ok=True)
+            data = {
+                'source_file': str(self.source_file),
+                'rules_version': self.rules_version,
+                'updated': datetime.now().isoformat(),
+                'lines': self.current
+            }
+            atomic_write_json(self.map_file, data, ensure_ascii=False, indent=2)
+            self.previous = self.current
+        except Exception as e:
+            print(f"⚠️ Ошибка сохранения карты строк: {e}")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ограниченный LRU-кэш со статистикой попаданий
+Используется для мемоизации дорогих операций в рамках одного экземпляра
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, Tuple
+
+
+class LRUCache:
+    """LRU-кэш фиксированного размера (вытесняет давно не использованные записи)"""
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 1000):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Получить значение и отметить запись как недавно использованную"""
+        value = self._data.get(key, self._MISSING)
+        if value is self._MISSING:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """Сохранить значение, вытеснив самую старую запись при переполнении"""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if self.maxsize and len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Удалить запись"""
+        return self._data.pop(key, default)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Записи от самой старой к самой свежей"""
+        return iter(list(self._data.items()))
+
+    def clear(self):
+        """Очистить кэш (статистика сохраняется)"""
+        self._data.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
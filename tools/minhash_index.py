@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MinHash/LSH-индекс почти дословных повторов для памяти переводов
+Быстрый первый этап нечёткого поиска: та же фраза с другим именем или числом
+находится без вычисления embeddings
+"""
+
+import os
+import re
+import json
+import zlib
+import random
+from pathlib import Path
+from typing import Dict, List, Set, Tuple, Union
+
+import numpy as np
+
+# Простое число Мерсенна 2^31 − 1: (a·x + b) не переполняет uint64
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+_MAX_HASH = np.uint64((1 << 31) - 1)
+
+_WHITESPACE = re.compile(r'\s+')
+_DIGITS = re.compile(r'\d+')
+
+
+class MinHashLSHIndex:
+    """MinHash-сигнатуры строк с LSH-бакетами по полосам
+
+    Схожесть — оценка меры Жаккара по символьным шинглам: доля совпавших
+    компонент сигнатуры. При 16 полосах по 8 строк кандидатами становятся
+    пары с схожестью примерно от 0.7, что ниже порога памяти переводов.
+    Файл — журнал сигнатур: повторный id заменяет прежнюю строку, устаревшие
+    строки убираются компакцией, когда их доля превышает compact_ratio.
+    """
+
+    def __init__(self, index_file: Union[str, Path], num_perm: int = 128,
+                 bands: int = 16, shingle_size: int = 5, seed: int = 1,
+                 compact_ratio: float = 0.5):
+        if num_perm % bands:
+            raise ValueError("num_perm должно делиться на bands")
+
+        self.index_file = Path(index_file)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # Фиксированный seed: сигнатуры совместимы между запусками
+        rng = random.Random(seed)
+        prime = int(_MERSENNE_PRIME)
+        self._a = np.array([rng.randrange(1, prime) for _ in range(num_perm)], dtype=np.uint64)
+        self._b = np.array([rng.randrange(0, prime) for _ in range(num_perm)], dtype=np.uint64)
+
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+
+        self.stats = {"queries": 0, "candidates": 0, "hits": 0}
+
+        # Строки файла, заменённые более поздней записью того же id
+        self.compact_ratio = compact_ratio
+        self.dead_lines = 0
+
+        self._load()
+        if self.dead_lines > max(len(self.signatures), 1) * self.compact_ratio:
+            self.compact()
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def __contains__(self, entry_id: str) -> bool:
+        return entry_id in self.signatures
+
+    def _shingles(self, text: str) -> Set[int]:
+        """Стабильные (crc32) хэши символьных шинглов нормализованной строки"""
+        normalized = _DIGITS.sub('0', _WHITESPACE.sub(' ', text.lower()).strip())
+        size = self.shingle_size
+        if len(normalized) <= size:
+            pieces = [normalized] if normalized else []
+        else:
+            pieces = [normalized[i:i + size] for i in range(len(normalized) - size + 1)]
+        return {zlib.crc32(piece.encode('utf-8')) for piece in pieces}
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash-сигнатура строки"""
+        shingles = self._shingles(text)
+        if not shingles:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles)) % _MERSENNE_PRIME
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray):
+        rows = self.rows
+        for band in range(self.bands):
+            yield band, signature[band * rows:(band + 1) * rows].tobytes()
+
+    def _insert(self, entry_id: str, signature: np.ndarray):
+        if entry_id in self.signatures:
+            self._remove_from_buckets(entry_id)
+        self.signatures[entry_id] = signature
+        for band, key in self._band_keys(signature):
+            self.buckets[band].setdefault(key, set()).add(entry_id)
+
+    def _remove_from_buckets(self, entry_id: str):
+        signature = self.signatures.pop(entry_id)
+        for band, key in self._band_keys(signature):
+            bucket = self.buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self.buckets[band][key]
+
+    def add(self, entry_id: str, text: str, persist: bool = True):
+        """Добавить строку в индекс (инкрементально дописывается в файл)"""
+        self.add_many([(entry_id, text)], persist=persist)
+
+    def add_many(self, items: List[Tuple[str, str]], persist: bool = True):
+        """Добавить пачку строк одной дозаписью файла"""
+        lines = []
+        for entry_id, text in items:
+            signature = self.signature(text)
+            previous = self.signatures.get(entry_id)
+            if previous is not None:
+                # Повторный upsert той же строки не меняет индекс и не пишется в файл
+                if np.array_equal(previous, signature):
+                    continue
+                if persist:
+                    self.dead_lines += 1
+            self._insert(entry_id, signature)
+            lines.append(json.dumps({"id": entry_id, "sig": signature.tolist()}))
+
+        if persist and lines:
+            try:
+                self.index_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.index_file, 'a', encoding='utf-8') as f:
+                    f.write('\n'.join(lines) + '\n')
+            except Exception as e:
+                print(f"⚠️ Ошибка сохранения MinHash-индекса: {e}")
+                return
+
+            if self.dead_lines > max(len(self.signatures), 1) * self.compact_ratio:
+                self.compact()
+
+    def query(self, text: str, threshold: float, max_results: int = 5) -> List[Tuple[float, str]]:
+        """Найти почти дословные повторы: [(оценка схожести, id)] по убыванию"""
+        self.stats["queries"] += 1
+        signature = self.signature(text)
+
+        candidates: Set[str] = set()
+        for band, key in self._band_keys(signature):
+            bucket = self.buckets[band].get(key)
+            if bucket:
+                candidates.update(bucket)
+        self.stats["candidates"] += len(candidates)
+
+        scored = []
+        for entry_id in candidates:
+            similarity = float(np.count_nonzero(self.signatures[entry_id] == signature)) / self.num_perm
+            if similarity >= threshold:
+                scored.append((similarity, entry_id))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        if scored:
+            self.stats["hits"] += 1
+        return scored[:max_results]
+
+    def _load(self):
+        """Загрузить сохранённые сигнатуры (последняя запись id побеждает)"""
+        if not self.index_file.exists():
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break
+                    entry = json.loads(line)
+                    signature = np.array(entry["sig"], dtype=np.uint64)
+                    if len(signature) != self.num_perm:
+                        continue
+                    if entry["id"] in self.signatures:
+                        self.dead_lines += 1
+                    self._insert(entry["id"], signature)
+        except Exception as e:
+            print(f"⚠️ Ошибка загрузки MinHash-индекса: {e}")
+
+    def rebuild(self, items: List[Tuple[str, str]]):
+        """Перестроить индекс с нуля и переписать файл"""
+        self.signatures.clear()
+        self.buckets = [{} for _ in range(self.bands)]
+        for entry_id, text in items:
+            self._insert(entry_id, self.signature(text))
+        self.compact()
+
+    def compact(self):
+        """Переписать файл только живыми сигнатурами (атомарно)"""
+        tmp_path = f"{self.index_file}.{os.getpid()}.tmp"
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry_id, signature in self.signatures.items():
+                f.write(json.dumps({"id": entry_id, "sig": signature.tolist()}) + '\n')
+        os.replace(tmp_path, self.index_file)
+        self.dead_lines = 0
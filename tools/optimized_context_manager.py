@@ -6,17 +6,23 @@
 """
 
 import os
-import json
 import time
 import hashlib
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 import chromadb
 from chromadb.config import Settings
-import chromadb.utils.embedding_functions as embedding_functions
-from functools import lru_cache
 import numpy as np
 
+from config import TRANSLATION_MEMORY, LOOKUP_MEMO
+from tools.lru_cache import LRUCache
+from tools.minhash_index import MinHashLSHIndex
+from tools.embeddings import LazyEmbeddingFunction, get_shared_model
+from tools.reference_bundle import ReferenceBundle, get_reference_bundle
+
+# Маркер промаха мемо (None — допустимый закэшированный ответ)
+_MISSING = object()
+
 @dataclass
 class OptimizedTranslationMemory:
     """Оптимизированная память перевода"""
@@ -32,8 +38,10 @@ class OptimizedTranslationMemory:
 class OptimizedTranslationMemoryManager:
     """Оптимизированный менеджер переводческой памяти"""
     
-    def __init__(self, db_path: str = "translation_memory"):
+    def __init__(self, db_path: str = "translation_memory", warm_up_model: bool = True):
         self.db_path = db_path
+        self.reference_file = os.path.join(self.db_path, "translation_memory.json")
+        self.reference: Optional[ReferenceBundle] = None
         self.reference_data = {}
         self.collection = None
         self.client = None
@@ -43,15 +51,30 @@ class OptimizedTranslationMemoryManager:
         self.phrase_cache = {}
         self.character_style_cache = {}
         
+        # Мемо ответов поиска — своё у каждого экземпляра, сбрасывается при перезагрузке справочника
+        self.glossary_memo = LRUCache(LOOKUP_MEMO["glossary_max_entries"])
+        self.phrase_memo = LRUCache(LOOKUP_MEMO["phrase_max_entries"])
+        
+        # MinHash/LSH-индекс почти дословных повторов (первый этап нечёткого поиска)
+        self.minhash_index = None
+        
+        # Модель embeddings грузится лениво: точные поиски её не ждут
+        # (модель и её дисковый кэш embeddings общие с TranslationMemoryManager)
+        self.embedding_model = get_shared_model("all-MiniLM-L6-v2")
+        
         # Статистика
         self.stats = {
             'cache_hits': 0,
             'db_hits': 0,
+            'lsh_hits': 0,
             'total_queries': 0,
             'avg_query_time': 0.0
         }
         
         self._initialize()
+        
+        if warm_up_model:
+            self.embedding_model.warm_up_async()
     
     def _initialize(self):
         """Инициализация с оптимизациями"""
@@ -63,25 +86,23 @@ class OptimizedTranslationMemoryManager:
         # Инициализируем ChromaDB с оптимизациями
         self._init_optimized_chromadb()
         
+        # MinHash-индекс хранится рядом с памятью переводов
+        self._init_minhash_index()
+        
         # Предзагружаем кэши
         self._preload_caches()
         
         print("✅ Оптимизированный менеджер памяти готов")
     
     def _load_reference_data(self):
-        """Загрузить справочную базу из JSON"""
-        try:
-            memory_file = os.path.join(self.db_path, "translation_memory.json")
-            if os.path.exists(memory_file):
-                with open(memory_file, 'r', encoding='utf-8') as f:
-                    self.reference_data = json.load(f)
-                print("✅ Справочная база загружена")
-            else:
-                print("⚠️ Файл translation_memory.json не найден")
-                self.reference_data = {}
-        except Exception as e:
-            print(f"❌ Ошибка загрузки справочной базы: {e}")
-            self.reference_data = {}
+        """Получить скомпилированную справочную базу (общую с TranslationMemoryManager)"""
+        self.reference = get_reference_bundle(self.reference_file)
+        self.reference_data = self.reference.data
+    
+    def _check_reference_reload(self):
+        """Перестроить кэши и мемо, если translation_memory.json изменился"""
+        if get_reference_bundle(self.reference_file) is not self.reference:
+            self.reload_reference_data()
     
     def _init_optimized_chromadb(self):
         """Инициализация оптимизированного ChromaDB"""
@@ -98,11 +119,8 @@ class OptimizedTranslationMemoryManager:
                 settings=settings
             )
             
-            # Оптимизированная функция embeddings
-            embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-                model_name="all-MiniLM-L6-v2",  # Быстрая и эффективная модель
-                device="cpu"  # Используем CPU для стабильности
-            )
+            # Функция embeddings загружает модель при первом векторном запросе
+            embedding_function = LazyEmbeddingFunction(self.embedding_model)
             
             # Создаем коллекцию с оптимизированными настройками
             self.collection = self.client.get_or_create_collection(
@@ -121,33 +139,83 @@ class OptimizedTranslationMemoryManager:
             print(f"❌ Ошибка инициализации ChromaDB: {e}")
             self.collection = None
     
+    def _init_minhash_index(self):
+        """Загрузить MinHash-индекс и перестроить его, если он отстал от коллекции"""
+        if not self.collection:
+            return
+        
+        try:
+            self.minhash_index = MinHashLSHIndex(os.path.join(self.db_path, "minhash_lsh.jsonl"))
+            
+            if len(self.minhash_index) != self.collection.count():
+                items = []
+                offset, page_size = 0, 1000
+                while True:
+                    page = self.collection.get(include=['documents'], limit=page_size, offset=offset)
+                    items.extend(zip(page['ids'], page['documents']))
+                    if len(page['ids']) < page_size:
+                        break
+                    offset += page_size
+                self.minhash_index.rebuild(items)
+                print(f"✅ MinHash-индекс перестроен: {len(items)} строк")
+        except Exception as e:
+            print(f"⚠️ MinHash-индекс недоступен: {e}")
+            self.minhash_index = None
+    
+    def _search_near_duplicates(self, text: str, limit: int) -> List[Dict[str, Any]]:
+        """Первый этап: почти дословные повторы через MinHash/LSH"""
+        if not self.minhash_index:
+            return []
+        
+        matches = self.minhash_index.query(text, TRANSLATION_MEMORY["similarity_threshold"], limit)
+        if not matches:
+            return []
+        
+        # Тексты и метаданные берём по id, без вычисления embeddings
+        records = self.collection.get(ids=[entry_id for _, entry_id in matches],
+                                      include=['metadatas', 'documents'])
+        by_id = {
+            entry_id: (doc, metadata)
+            for entry_id, doc, metadata in zip(records['ids'], records['documents'], records['metadatas'])
+        }
+        
+        similar_translations = []
+        for similarity, entry_id in matches:
+            if entry_id in by_id:
+                doc, metadata = by_id[entry_id]
+                similar_translations.append({
+                    'text': doc,
+                    'metadata': metadata or {},
+                    'distance': 1.0 - similarity
+                })
+        return similar_translations
+    
     def _preload_caches(self):
         """Предзагрузка кэшей для быстрого доступа"""
         print("🔄 Предзагрузка кэшей...")
         
-        # Кэш глоссария
-        if 'glossary_terms' in self.reference_data:
-            for category, terms in self.reference_data['glossary_terms'].items():
-                for term, translation in terms.items():
-                    self.glossary_cache[term.lower()] = translation
-        
-        # Кэш фраз
-        if 'phrase_translations' in self.reference_data:
-            for chapter, phrases in self.reference_data['phrase_translations'].items():
-                for phrase, translation in phrases.items():
-                    self.phrase_cache[phrase.lower()] = translation
-        
-        # Кэш стилей персонажей
-        if 'contextual_style_rules' in self.reference_data:
-            for character, rules in self.reference_data['contextual_style_rules'].items():
-                if 'examples' in rules:
-                    self.character_style_cache[character] = rules['examples']
+        # Плоские словари уже собраны в скомпилированной справочной базе
+        self.glossary_cache.update(self.reference.glossary_lower)
+        self.phrase_cache.update(self.reference.phrase_lower)
+        self.character_style_cache.update(self.reference.style_examples)
         
         print(f"✅ Кэши загружены: {len(self.glossary_cache)} терминов, {len(self.phrase_cache)} фраз")
     
-    @lru_cache(maxsize=1000)
     def get_glossary_term(self, term: str) -> str:
         """Получить термин из глоссария (с кэшированием)"""
+        self._check_reference_reload()
+        memoized = self.glossary_memo.get(term, _MISSING)
+        if memoized is not _MISSING:
+            self.stats['total_queries'] += 1
+            self.stats['cache_hits'] += 1
+            return memoized
+        
+        translation = self._lookup_glossary_term(term)
+        self.glossary_memo.put(term, translation)
+        return translation
+    
+    def _lookup_glossary_term(self, term: str) -> str:
+        """Поиск термина в кэше глоссария и справочной базе"""
         self.stats['total_queries'] += 1
         start_time = time.time()
         
@@ -158,20 +226,31 @@ class OptimizedTranslationMemoryManager:
             return cached_term
         
         # Поиск в справочной базе
-        if 'glossary_terms' in self.reference_data:
-            for category, terms in self.reference_data['glossary_terms'].items():
-                if term in terms:
-                    translation = terms[term]
-                    self.glossary_cache[term.lower()] = translation
-                    self._update_query_time(time.time() - start_time)
-                    return translation
+        translation = self.reference.glossary.get(term)
+        if translation is not None:
+            self.glossary_cache[term.lower()] = translation
+            self._update_query_time(time.time() - start_time)
+            return translation
         
         self._update_query_time(time.time() - start_time)
         return term
     
-    @lru_cache(maxsize=1000)
     def get_phrase_translation(self, text: str, chapter: str = None) -> Optional[str]:
         """Получить перевод фразы (с кэшированием)"""
+        self._check_reference_reload()
+        key = (text, chapter)
+        memoized = self.phrase_memo.get(key, _MISSING)
+        if memoized is not _MISSING:
+            self.stats['total_queries'] += 1
+            self.stats['cache_hits'] += 1
+            return memoized
+        
+        translation = self._lookup_phrase_translation(text, chapter)
+        self.phrase_memo.put(key, translation)
+        return translation
+    
+    def _lookup_phrase_translation(self, text: str, chapter: Optional[str]) -> Optional[str]:
+        """Поиск фразы в кэше фраз и справочной базе"""
         self.stats['total_queries'] += 1
         start_time = time.time()
         
@@ -181,37 +260,31 @@ class OptimizedTranslationMemoryManager:
             self.stats['cache_hits'] += 1
             return cached_phrase
         
-        # Поиск в справочной базе
-        if 'phrase_translations' in self.reference_data:
-            # Поиск по главе
-            if chapter and chapter in self.reference_data['phrase_translations']:
-                phrases = self.reference_data['phrase_translations'][chapter]
-                if text in phrases:
-                    translation = phrases[text]
-                    self.phrase_cache[text.lower()] = translation
-                    self._update_query_time(time.time() - start_time)
-                    return translation
-            
-            # Поиск во всех главах
-            for chapter_phrases in self.reference_data['phrase_translations'].values():
-                if text in chapter_phrases:
-                    translation = chapter_phrases[text]
-                    self.phrase_cache[text.lower()] = translation
-                    self._update_query_time(time.time() - start_time)
-                    return translation
+        # Поиск в справочной базе: сначала фразы главы, затем все главы
+        phrase_table = self.reference.phrase_table
+        if phrase_table is not None:
+            translation = None
+            if chapter and text in phrase_table.by_chapter.get(chapter, {}):
+                translation = phrase_table.by_chapter[chapter][text]
+            elif text in phrase_table.exact:
+                translation = phrase_table.exact[text]
+            if translation is not None:
+                self.phrase_cache[text.lower()] = translation
+                self._update_query_time(time.time() - start_time)
+                return translation
         
         self._update_query_time(time.time() - start_time)
         return None
     
     def get_character_style(self, character: str) -> Dict[str, str]:
         """Получить стиль персонажа"""
+        self._check_reference_reload()
         return self.character_style_cache.get(character, {})
     
     def get_forbidden_words(self) -> List[str]:
         """Получить список запрещенных слов"""
-        if 'translation_errors' in self.reference_data:
-            return self.reference_data['translation_errors'].get('forbidden_words', [])
-        return []
+        self._check_reference_reload()
+        return self.reference.forbidden_words
     
     def search_similar_translations(self, text: str, limit: int = 5) -> List[Dict[str, Any]]:
         """Поиск похожих переводов с оптимизацией"""
@@ -222,6 +295,13 @@ class OptimizedTranslationMemoryManager:
         self.stats['total_queries'] += 1
         
         try:
+            # Почти дословные повторы находятся без векторного поиска
+            near_duplicates = self._search_near_duplicates(text, limit)
+            if near_duplicates:
+                self.stats['lsh_hits'] += 1
+                self._update_query_time(time.time() - start_time)
+                return near_duplicates
+            
             # Поиск в ChromaDB
             results = self.collection.query(
                 query_texts=[text],
@@ -259,6 +339,7 @@ class OptimizedTranslationMemoryManager:
             
             # Подготавливаем метаданные
             metadata = {
+                'target_text': memory.translated_text,
                 'chapter': memory.chapter,
                 'character': memory.character or '',
                 'quality_score': memory.quality_score,
@@ -269,15 +350,21 @@ class OptimizedTranslationMemoryManager:
             if memory.metadata:
                 metadata.update(memory.metadata)
             
-            # Добавляем в ChromaDB
-            self.collection.add(
+            # Добавляем в ChromaDB (upsert — повторное добавление обновляет запись)
+            self.collection.upsert(
                 documents=[memory.original_text],
                 metadatas=[metadata],
                 ids=[text_hash]
             )
             
-            # Обновляем кэш
-            self.phrase_cache[memory.original_text.lower()] = memory.translated_text
+            if self.minhash_index is not None:
+                self.minhash_index.add(text_hash, memory.original_text)
+            
+            # Обновляем кэш; запомненные ответы по этой фразе (в том числе промахи) устарели
+            lowered = memory.original_text.lower()
+            self.phrase_cache[lowered] = memory.translated_text
+            for key in [key for key, _ in self.phrase_memo.items() if key[0].lower() == lowered]:
+                self.phrase_memo.pop(key)
             
         except Exception as e:
             print(f"❌ Ошибка добавления перевода: {e}")
@@ -298,10 +385,16 @@ class OptimizedTranslationMemoryManager:
             'cache_hits': self.stats['cache_hits'],
             'cache_hit_rate': cache_hit_rate,
             'db_hits': self.stats['db_hits'],
+            'lsh_hits': self.stats['lsh_hits'],
+            'model_loaded': self.embedding_model.is_loaded,
+            'model_load_time': self.embedding_model.load_time,
+            'embedding_cache': self.embedding_model.cache.get_stats() if self.embedding_model.cache else {},
             'avg_query_time': self.stats['avg_query_time'],
             'glossary_cache_size': len(self.glossary_cache),
             'phrase_cache_size': len(self.phrase_cache),
-            'character_style_cache_size': len(self.character_style_cache)
+            'character_style_cache_size': len(self.character_style_cache),
+            'glossary_memo': self.glossary_memo.get_stats(),
+            'phrase_memo': self.phrase_memo.get_stats()
         }
     
     def clear_caches(self):
@@ -310,12 +403,18 @@ class OptimizedTranslationMemoryManager:
         self.phrase_cache.clear()
         self.character_style_cache.clear()
         
-        # Очищаем LRU кэши
-        self.get_glossary_term.cache_clear()
-        self.get_phrase_translation.cache_clear()
+        # Очищаем мемо ответов
+        self.glossary_memo.clear()
+        self.phrase_memo.clear()
         
         print("🧹 Все кэши очищены")
     
+    def reload_reference_data(self):
+        """Перечитать справочную базу: кэши и мемо строятся заново"""
+        self._load_reference_data()
+        self.clear_caches()
+        self._preload_caches()
+    
     def optimize_database(self):
         """Оптимизация базы данных"""
         if not self.collection:
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Скомпилированная таблица готовых переводов фраз (phrase_translations)
+Точные совпадения — через словарь, вхождения фраз в строку — автоматом Ахо–Корасик
+"""
+
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional
+
+from tools.aho_corasick import AhoCorasick
+
+# Разделитель склейки фраз для обратного поиска (строки текста его не содержат)
+_JOIN_SEPARATOR = '\x00'
+
+
+class PhraseTable:
+    """Индекс phrase_translations {глава: {фраза: перевод}}, строится один раз"""
+
+    def __init__(self, phrase_translations: Dict[str, Dict[str, Any]]):
+        # Точные совпадения: по главам и общий (первая глава в порядке файла побеждает)
+        self.by_chapter: Dict[str, Dict[str, Any]] = {}
+        self.exact: Dict[str, Any] = {}
+
+        # Уникальные фразы в нижнем регистре в порядке файла
+        self.phrases: List[str] = []
+        self.translations: List[Any] = []
+        seen = set()
+
+        for chapter, phrases in phrase_translations.items():
+            self.by_chapter[chapter] = dict(phrases)
+            for phrase, translation in phrases.items():
+                self.exact.setdefault(phrase, translation)
+                lowered = phrase.lower()
+                if lowered and lowered not in seen:
+                    seen.add(lowered)
+                    self.phrases.append(lowered)
+                    self.translations.append(translation)
+
+        self.automaton = AhoCorasick(self.phrases)
+
+        # Склейка всех фраз для поиска строки внутри фразы одним str.find
+        self._joined = _JOIN_SEPARATOR.join(self.phrases)
+        self._starts = []
+        offset = 0
+        for phrase in self.phrases:
+            self._starts.append(offset)
+            offset += len(phrase) + 1
+
+    def __len__(self) -> int:
+        return len(self.phrases)
+
+    def lookup(self, text: str, chapter: Optional[str] = None) -> Optional[Any]:
+        """Перевод строки: точное совпадение, затем самая длинная фраза внутри строки,
+        затем фраза, содержащая строку целиком"""
+        if not text:
+            return None
+
+        if chapter and text in self.by_chapter.get(chapter, {}):
+            return self.by_chapter[chapter][text]
+        if text in self.exact:
+            return self.exact[text]
+
+        lowered = text.lower()
+        index = self.automaton.longest_match(lowered)
+        if index is not None:
+            return self.translations[index]
+
+        if _JOIN_SEPARATOR not in lowered:
+            position = self._joined.find(lowered)
+            if position >= 0:
+                return self.translations[bisect_right(self._starts, position) - 1]
+
+        return None
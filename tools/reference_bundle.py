@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Скомпилированная справочная база (translation_memory.json)
+JSON разбирается один раз на процесс: плоские словари глоссария и стилей,
+таблица фраз с автоматом Ахо–Корасик и готовые регулярные выражения.
+Результат кэшируется на диске рядом с JSON (ключ — mtime/размер и хэш
+содержимого) и перечитывается, когда файл меняется, без перезапуска процесса
+"""
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import REFERENCE_BUNDLE
+from tools.phrase_table import PhraseTable
+from tools.glossary_replacer import GlossaryReplacer
+from tools.forbidden_words import ForbiddenWordScanner
+
+# Версия формата кэша: меняется вместе с полями ReferenceBundle
+BUNDLE_FORMAT = 3
+
+
+class ReferenceBundle:
+    """Справочная база в виде, готовом к поиску; строится один раз на версию файла"""
+
+    def __init__(self, data: Dict[str, Any], version: str = ""):
+        self.data = data
+        self.version = version
+
+        # Старый формат файла (список записей памяти) справочных данных не содержит
+        if not isinstance(data, dict):
+            data = {}
+
+        # Глоссарий: все категории в одном словаре (первая категория побеждает)
+        self.glossary: Dict[str, str] = {}
+        for terms in data.get('glossary_terms', {}).values():
+            for term, translation in terms.items():
+                self.glossary.setdefault(term, translation)
+        self.glossary_lower = {}
+        for term, translation in self.glossary.items():
+            self.glossary_lower.setdefault(term.lower(), translation)
+        self.glossary_replacer = GlossaryReplacer(self.glossary)
+
+        # Запрещённые слова и первая из предпочтительных замен
+        errors = data.get('translation_errors', {})
+        self.forbidden_words: List[str] = list(errors.get('forbidden_words', []))
+        self.preferred_alternatives: Dict[str, str] = dict(errors.get('preferred_alternatives', {}))
+        self.forbidden_scanner = ForbiddenWordScanner(self.forbidden_words, self.preferred_alternatives)
+
+        # Стилевые правила и их примеры замен
+        self.style_rules: Dict[str, Dict[str, Any]] = dict(data.get('contextual_style_rules', {}))
+        self.style_examples = {
+            name: rules['examples']
+            for name, rules in self.style_rules.items()
+            if isinstance(rules, dict) and 'examples' in rules
+        }
+
+        phrase_translations = data.get('phrase_translations')
+        self.phrase_table = PhraseTable(phrase_translations) if phrase_translations else None
+        self.phrase_lower: Dict[str, Any] = (
+            dict(zip(self.phrase_table.phrases, self.phrase_table.translations))
+            if self.phrase_table else {}
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.data)
+
+
+class ReferenceBundleLoader:
+    """Загрузчик одного файла справочной базы с горячей перезагрузкой"""
+
+    def __init__(self, path: str, check_interval: float = 1.0, cache_enabled: bool = True):
+        self.path = path
+        self.cache_path = f"{os.path.splitext(path)[0]}.bundle.pickle"
+        self.check_interval = check_interval
+        self.cache_enabled = cache_enabled
+
+        self._bundle: Optional[ReferenceBundle] = None
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def get(self) -> ReferenceBundle:
+        """Актуальная справочная база (файл проверяется не чаще check_interval)"""
+        now = time.monotonic()
+        if self._bundle is not None and now - self._checked_at < self.check_interval:
+            return self._bundle
+
+        with self._lock:
+            self._checked_at = now
+            stamp = self._stat()
+            if self._bundle is None or stamp != self._stamp:
+                self._reload(stamp)
+            return self._bundle
+
+    def _reload(self, stamp: Optional[Tuple[int, int]]):
+        first_load = self._bundle is None
+        if stamp is None:
+            if first_load or self._stamp is not None:
+                print(f"⚠️ Файл {os.path.basename(self.path)} не найден, создается пустая база")
+            self._bundle = ReferenceBundle({})
+            self._stamp = None
+            return
+
+        cached = self._read_cache()
+        if cached is not None and cached.get("stamp") == stamp:
+            self._bundle, self._stamp = cached["bundle"], stamp
+            if first_load:
+                print(f"✅ Справочная база загружена из {os.path.basename(self.path)} (кэш)")
+            return
+
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+            version = hashlib.sha1(raw).hexdigest()
+
+            if cached is not None and cached["bundle"].version == version:
+                # Файл тронут, но содержимое то же: достаточно обновить отметку
+                bundle = cached["bundle"]
+            elif self._bundle is not None and self._bundle.version == version:
+                bundle = self._bundle
+            else:
+                bundle = ReferenceBundle(json.loads(raw.decode('utf-8')), version)
+                if not first_load:
+                    print(f"🔄 Справочная база {os.path.basename(self.path)} изменилась, перезагружена")
+                    self.reloads += 1
+        except Exception as e:
+            print(f"❌ Ошибка загрузки справочной базы: {e}")
+            # Недописанный или битый файл не должен ломать работающий процесс
+            if self._bundle is None:
+                self._bundle = ReferenceBundle({})
+            self._stamp = stamp
+            return
+
+        self._bundle, self._stamp = bundle, stamp
+        self._write_cache(bundle, stamp)
+        if first_load:
+            print(f"✅ Справочная база загружена из {os.path.basename(self.path)}")
+
+    def _read_cache(self) -> Optional[Dict[str, Any]]:
+        if not self.cache_enabled or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get("format") != BUNDLE_FORMAT or cached.get("path") != os.path.abspath(self.path):
+                return None
+            return cached
+        except Exception:
+            return None
+
+    def _write_cache(self, bundle: ReferenceBundle, stamp: Tuple[int, int]):
+        if not self.cache_enabled:
+            return
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({
+                    "format": BUNDLE_FORMAT,
+                    "path": os.path.abspath(self.path),
+                    "stamp": stamp,
+                    "bundle": bundle
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"⚠️ Не удалось сохранить кэш справочной базы: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+# Загрузчики процесса: все потребители одного файла делят одну скомпилированную базу
+_loaders: Dict[str, ReferenceBundleLoader] = {}
+_loaders_lock = threading.Lock()
+
+
+def get_reference_bundle(path: str) -> ReferenceBundle:
+    """Скомпилированная справочная база файла (общая для процесса, с горячей перезагрузкой)"""
+    key = os.path.abspath(path)
+    loader = _loaders.get(key)
+    if loader is None:
+        with _loaders_lock:
+            loader = _loaders.get(key)
+            if loader is None:
+                loader = ReferenceBundleLoader(
+                    path,
+                    check_interval=REFERENCE_BUNDLE["check_interval"],
+                    cache_enabled=REFERENCE_BUNDLE["cache_enabled"]
+                )
+                _loaders[key] = loader
+    return loader.get()
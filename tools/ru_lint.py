@@ -5,115 +5,78 @@ Python скрипт для проверки русского языка в пе
 Альтернатива PowerShell скрипту
 """
 
+import os
 import sys
 import re
 import argparse
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import BANNED_ARCHAISMS, CALQUES, FORMAL_DIALOGUE, MAX_SENTENCE_LENGTH
+from tools.style_rules import RuleMatch, get_style_engine
+
+# Категории общих стилевых правил → тип и важность проблемы в отчёте
+STYLE_ISSUES = {
+    "archaism": ("Архаизм", "Критическая"),
+    "calque": ("Калька", "Высокая"),
+    "formal_dialogue": ("Формальный диалог", "Средняя")
+}
 
 class RussianLinter:
     """Линтер для проверки русского языка"""
     
     def __init__(self):
-        # Запрещённые архаизмы
-        self.banned_archaisms = [
-            "сей", "сия", "оный", "дабы", "ибо", 
-            "воистину", "весьма", "отнюдь", "непременно",
-            "молвить", "воззреть", "вопрошать", "ныне",
-            "осуществлять", "производить впечатление", "испытывать чувство"
-        ]
-        
-        # Кальки и канцеляризмы
-        self.calques = {
-            "крайне": "очень",
-            "слева и справа": "направо и налево",
-            "совершенна": "идеальна",
-            "На его взгляд": "С его точки зрения",
-            "резюмировал": "размышлял",
-            "осуществлять": "делать",
-            "производить впечатление": "впечатлять",
-            "испытывать чувство": "чувствовать"
-        }
-        
-        # Формальные конструкции для диалогов
-        self.formal_dialogue = {
-            "Я собираюсь": "Буду",
-            "Позвольте мне": "Дай мне",
-            "Не могли бы вы": "Можешь",
-            "Я хотел бы": "Хочу",
-            "Кажется, что": "Похоже",
-            "Я боюсь, что": "Боюсь",
-            "Позвольте мне выразить": "Спасибо",
-            "Не соблаговолите ли вы": "Не могли бы вы",
-            "Осмелюсь спросить": "Можно спросить?",
-            "Сие деяние недопустимо": "Так нельзя",
-            "Воистину могущественный": "Реально мощный"
-        }
+        # Правила общие с валидатором, модернизатором и переводчиком (config.py)
+        self.banned_archaisms = BANNED_ARCHAISMS
+        self.calques = CALQUES
+        self.formal_dialogue = FORMAL_DIALOGUE
+        self.style_engine = get_style_engine()
         
         # Максимальная длина предложения
-        self.max_sentence_length = 15
+        self.max_sentence_length = MAX_SENTENCE_LENGTH
     
-    def check_archaisms(self, text: str) -> List[Dict[str, Any]]:
-        """Проверка на архаизмы"""
-        issues = []
+    def scan_style(self, text: str) -> List[RuleMatch]:
+        """Архаизмы, кальки и формальные диалоги — один проход по тексту"""
+        return self.style_engine.scan(text, tuple(STYLE_ISSUES))
+    
+    def check_style(self, text: str, matches: Optional[List[RuleMatch]] = None,
+                    categories: Tuple[str, ...] = tuple(STYLE_ISSUES)) -> List[Dict[str, Any]]:
+        """Проблемы стиля, сгруппированные по типу (архаизмы, кальки, диалоги)"""
+        if matches is None:
+            matches = self.style_engine.scan(text, categories)
         
-        for archaism in self.banned_archaisms:
-            if archaism.lower() in text.lower():
-                # Находим все вхождения
-                for match in re.finditer(re.escape(archaism), text, re.IGNORECASE):
-                    line_number = text[:match.start()].count('\n') + 1
-                    context = text[max(0, match.start()-30):match.end()+30]
-                    
-                    issues.append({
-                        "type": "Архаизм",
-                        "word": archaism,
-                        "line": line_number,
-                        "context": context,
-                        "severity": "Критическая"
-                    })
+        issues = []
+        for category in categories:
+            issue_type, severity = STYLE_ISSUES[category]
+            for match in matches:
+                if match.rule.category != category:
+                    continue
+                issue = {
+                    "type": issue_type,
+                    "word": match.rule.pattern,
+                    "line": match.line,
+                    "column": match.column,
+                    "context": match.context(text),
+                    "severity": severity
+                }
+                if match.rule.replacement is not None:
+                    issue["suggestion"] = match.rule.replacement
+                issues.append(issue)
         
         return issues
     
+    def check_archaisms(self, text: str) -> List[Dict[str, Any]]:
+        """Проверка на архаизмы"""
+        return self.check_style(text, categories=("archaism",))
+    
     def check_calques(self, text: str) -> List[Dict[str, Any]]:
         """Проверка на кальки"""
-        issues = []
-        
-        for calque, suggestion in self.calques.items():
-            if calque in text:
-                for match in re.finditer(re.escape(calque), text):
-                    line_number = text[:match.start()].count('\n') + 1
-                    context = text[max(0, match.start()-30):match.end()+30]
-                    
-                    issues.append({
-                        "type": "Калька",
-                        "word": calque,
-                        "suggestion": suggestion,
-                        "line": line_number,
-                        "context": context,
-                        "severity": "Высокая"
-                    })
-        
-        return issues
+        return self.check_style(text, categories=("calque",))
     
     def check_formal_dialogue(self, text: str) -> List[Dict[str, Any]]:
         """Проверка формальных диалогов"""
-        issues = []
-        
-        for formal, suggestion in self.formal_dialogue.items():
-            if formal in text:
-                for match in re.finditer(re.escape(formal), text):
-                    line_number = text[:match.start()].count('\n') + 1
-                    context = text[max(0, match.start()-30):match.end()+30]
-                    
-                    issues.append({
-                        "type": "Формальный диалог",
-                        "word": formal,
-                        "suggestion": suggestion,
-                        "line": line_number,
-                        "context": context,
-                        "severity": "Средняя"
-                    })
-        
-        return issues
+        return self.check_style(text, categories=("formal_dialogue",))
     
     def check_sentence_length(self, text: str) -> List[Dict[str, Any]]:
         """Проверка длины предложений"""
@@ -138,7 +101,7 @@ class RussianLinter:
         
         return issues
     
-    def calculate_readability(self, text: str) -> Dict[str, Any]:
+    def calculate_readability(self, text: str, matches: Optional[List[RuleMatch]] = None) -> Dict[str, Any]:
         """Расчет читабельности"""
         sentences = re.split(r'[.!?]+', text)
         sentences = [s.strip() for s in sentences if s.strip()]
@@ -149,9 +112,10 @@ class RussianLinter:
         # Средняя длина предложения
         avg_sentence_length = len(words) / len(sentences) if sentences else 0
         
-        # Количество архаизмов
-        archaism_count = sum(1 for archaism in self.banned_archaisms 
-                           if archaism.lower() in text.lower())
+        # Количество архаизмов (разных)
+        if matches is None:
+            matches = self.style_engine.scan(text, ("archaism",))
+        archaism_count = len({match.rule.pattern for match in matches if match.rule.category == "archaism"})
         
         # Процент длинных предложений
         long_sentences = sum(1 for sentence in sentences 
@@ -181,23 +145,15 @@ class RussianLinter:
         except Exception as e:
             return {"error": f"Ошибка чтения файла: {e}"}
         
-        # Выполняем все проверки
-        all_issues = []
-        
-        archaism_issues = self.check_archaisms(text)
-        all_issues.extend(archaism_issues)
-        
-        calque_issues = self.check_calques(text)
-        all_issues.extend(calque_issues)
-        
-        dialogue_issues = self.check_formal_dialogue(text)
-        all_issues.extend(dialogue_issues)
+        # Выполняем все проверки (стилевые правила — одним проходом)
+        style_matches = self.scan_style(text)
+        all_issues = self.check_style(text, style_matches)
         
         length_issues = self.check_sentence_length(text)
         all_issues.extend(length_issues)
         
         # Анализ читабельности
-        readability = self.calculate_readability(text)
+        readability = self.calculate_readability(text, style_matches)
         
         # Статистика
         critical_count = len([i for i in all_issues if i["severity"] == "Критическая"])
@@ -310,14 +266,44 @@ class RussianLinter:
         else:
             print("⚠️ Требуется серьезная доработка")
 
+def test_russian_linter():
+    """Тестирование линтера: общий проход равен объединению отдельных проверок"""
+    print("🧪 ТЕСТИРОВАНИЕ РУССКОГО ЛИНТЕРА")
+    print("=" * 50)
+    
+    linter = RussianLinter()
+    text = ("Воистину могущественный воин кивнул.\n"
+            "«Позвольте мне выразить благодарность, ибо сей путь крайне труден.»\n"
+            "Сейчас он будет осуществлять план.")
+    
+    def issue_key(issue):
+        return issue["type"], issue["word"], issue["line"], issue["column"]
+    
+    combined = sorted(map(issue_key, linter.check_style(text)))
+    separate = sorted(map(issue_key, linter.check_archaisms(text) + linter.check_calques(text)
+                          + linter.check_formal_dialogue(text)))
+    
+    for issue_type, word, line, column in combined:
+        print(f"  • {issue_type}: {word} (строка {line}, позиция {column})")
+    
+    # Вложенные совпадения разных категорий не теряются
+    assert ("Архаизм", "воистину", 1, 1) in combined
+    assert ("Формальный диалог", "Воистину могущественный", 1, 1) in combined
+    assert combined == separate, "check_style не совпадает с объединением отдельных проверок"
+    
+    print("✅ Тестирование завершено")
+
 def main():
     """Главная функция"""
     parser = argparse.ArgumentParser(description="Русский линтер для переводов")
-    parser.add_argument("file_path", help="Путь к файлу для проверки")
+    parser.add_argument("file_path", nargs="?", help="Путь к файлу для проверки (без него — самопроверка)")
     parser.add_argument("--fix", action="store_true", help="Автоматически исправить проблемы")
     parser.add_argument("--verbose", action="store_true", help="Подробный вывод")
     
     args = parser.parse_args()
+    if not args.file_path:
+        test_russian_linter()
+        return
     
     linter = RussianLinter()
     result = linter.lint_file(args.file_path)
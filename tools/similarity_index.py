@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Инвертированный индекс токенов для поиска похожих строк по мере Жаккара
+Кандидаты берутся только из записей с общими токенами, отсекаются по границе
+размеров множеств и ранжируются через кучу, без перебора всей памяти
+"""
+
+import math
+import heapq
+from typing import Dict, FrozenSet, List, Set, Tuple
+
+
+def tokenize(text: str) -> FrozenSet[str]:
+    """Множество токенов строки (регистр не учитывается)"""
+    return frozenset(text.lower().split())
+
+
+class TokenIndex:
+    """Индекс "токен → id записей" с размерами множеств токенов записей"""
+
+    def __init__(self):
+        self.postings: Dict[str, Set[str]] = {}
+        self.entry_tokens: Dict[str, FrozenSet[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entry_tokens)
+
+    def add(self, entry_id: str, text: str):
+        """Проиндексировать запись (повторный id заменяет старую)"""
+        if entry_id in self.entry_tokens:
+            self.remove(entry_id)
+        tokens = tokenize(text)
+        if not tokens:
+            return
+        self.entry_tokens[entry_id] = tokens
+        for token in tokens:
+            self.postings.setdefault(token, set()).add(entry_id)
+
+    def remove(self, entry_id: str):
+        """Убрать запись из индекса"""
+        tokens = self.entry_tokens.pop(entry_id, None)
+        if not tokens:
+            return
+        for token in tokens:
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.discard(entry_id)
+                if not posting:
+                    del self.postings[token]
+
+    def clear(self):
+        """Очистить индекс"""
+        self.postings.clear()
+        self.entry_tokens.clear()
+
+    def search(self, text: str, threshold: float, max_results: int) -> List[Tuple[float, str]]:
+        """Найти записи с мерой Жаккара ≥ threshold: [(схожесть, id)] по убыванию"""
+        query = tokenize(text)
+        query_size = len(query)
+        if not query_size:
+            return []
+
+        # J ≥ t требует пересечения ≥ t·|q|, поэтому хотя бы один общий токен
+        # найдётся среди |q| − ⌈t·|q|⌉ + 1 самых редких токенов запроса (prefix filtering)
+        min_overlap = max(1, math.ceil(threshold * query_size - 1e-9))
+        present = [token for token in query if token in self.postings]
+        if len(present) < min_overlap:
+            return []
+        present.sort(key=lambda token: len(self.postings[token]))
+        prefix = present[:len(present) - min_overlap + 1]
+
+        candidates: Set[str] = set()
+        for token in prefix:
+            candidates.update(self.postings[token])
+
+        # Граница по размерам: J ≤ min(|q|, |e|) / max(|q|, |e|)
+        if threshold > 0:
+            min_size = threshold * query_size
+            max_size = query_size / threshold
+        else:
+            min_size, max_size = 0, float('inf')
+
+        scored = []
+        for entry_id in candidates:
+            tokens = self.entry_tokens[entry_id]
+            size = len(tokens)
+            if size < min_size or size > max_size:
+                continue
+            overlap = len(query & tokens)
+            if overlap < min_overlap:
+                continue
+            similarity = overlap / (query_size + size - overlap)
+            if similarity >= threshold:
+                scored.append((similarity, entry_id))
+
+        return heapq.nlargest(max_results, scored)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Хронология говорящих по главе
+Один проход по строкам главы: кто говорит или думает в каждой строке.
+Реплики без имени получают говорящего из предыдущей строки, где он назван.
+Хронология строится один раз на главу и кэшируется по хэшу текста;
+последующие этапы читают говорящего из неё, а не определяют заново
+"""
+
+import hashlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from config import SPEAKER_TIMELINE
+from tools.character_detector import CharacterDetector, CharacterType
+from tools.lru_cache import LRUCache
+
+
+@dataclass
+class SpeakerTurn:
+    """Говорящий в строке главы"""
+    line_number: int          # С 1, как в ChapterSplitter
+    content: str
+    mode: str                 # 'speech', 'thought', 'system', 'narration', 'empty'
+    character: CharacterType
+    confidence: float
+    carried: bool = False     # Говорящий унаследован от предыдущих строк
+
+
+class SpeakerTimeline:
+    """Говорящие по строкам одной главы"""
+
+    def __init__(self, chapter_hash: str, turns: List[SpeakerTurn]):
+        self.chapter_hash = chapter_hash
+        self.turns = turns
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def turn_at(self, line_number: int, content: Optional[str] = None) -> Optional[SpeakerTurn]:
+        """Строка главы по номеру; None, если номера нет или текст строки другой"""
+        if not 1 <= line_number <= len(self.turns):
+            return None
+        turn = self.turns[line_number - 1]
+        if content is not None and turn.content != content:
+            return None
+        return turn
+
+    def summary(self) -> Dict[str, int]:
+        """Сколько строк приписано персонажам и сколько из них унаследовано"""
+        attributed = [turn for turn in self.turns if turn.character != CharacterType.UNKNOWN]
+        return {
+            'attributed_lines': len(attributed),
+            'carried_lines': sum(1 for turn in attributed if turn.carried),
+            **{f"lines_{character.value}": count
+               for character, count in Counter(turn.character for turn in attributed).items()}
+        }
+
+
+class SpeakerTimelineAnalyzer:
+    """Построение хронологий говорящих с кэшем по хэшу главы"""
+
+    # Тип строки детектора → режим в хронологии
+    MODES = {
+        "dialogue": "speech",
+        "thoughts": "thought",
+        "system": "system",
+        "description": "narration",
+    }
+
+    def __init__(self, detector: Optional[CharacterDetector] = None):
+        self.detector = detector or CharacterDetector()
+        self.max_narration_gap = SPEAKER_TIMELINE["max_narration_gap"]
+        self.carried_confidence = SPEAKER_TIMELINE["carried_confidence"]
+        self.cache = LRUCache(SPEAKER_TIMELINE["max_chapters"])
+
+    def chapter_hash(self, lines: List[str]) -> str:
+        return hashlib.md5('\n'.join(lines).encode('utf-8')).hexdigest()
+
+    def analyze(self, lines: List[str]) -> SpeakerTimeline:
+        """Хронология для строк главы (из кэша, если глава и профили не менялись)"""
+        chapter_hash = self.chapter_hash(lines)
+        key = (chapter_hash, self.detector.profiles_version)
+        timeline = self.cache.get(key)
+        if timeline is None:
+            timeline = SpeakerTimeline(chapter_hash, self._build_turns(lines))
+            self.cache.put(key, timeline)
+        return timeline
+
+    def _build_turns(self, lines: List[str]) -> List[SpeakerTurn]:
+        """Один проход по главе с переносом говорящего через серию реплик"""
+        non_empty = [line for line in lines if line.strip()]
+        detected = dict(zip(non_empty, self.detector.detect_many(non_empty)))
+
+        turns = []
+        speaker: Optional[Tuple[CharacterType, float]] = None
+        narration_gap = 0
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                turns.append(SpeakerTurn(line_number, line, 'empty', CharacterType.UNKNOWN, 0.0))
+                continue
+
+            mode = self.MODES[self.detector.segment_type(line)]
+            character, confidence = detected[line]
+            carried = False
+
+            if mode in ('speech', 'thought'):
+                if character in (CharacterType.UNKNOWN, CharacterType.SYSTEM):
+                    # Реплика без явного говорящего — продолжение текущей серии
+                    if speaker is not None:
+                        character = speaker[0]
+                        confidence = min(speaker[1], self.carried_confidence)
+                        carried = True
+                    else:
+                        character, confidence = CharacterType.UNKNOWN, 0.0
+                else:
+                    speaker = (character, confidence)
+                narration_gap = 0
+            elif mode == 'narration':
+                if confidence >= 1.0:
+                    # Персонаж назван в повествовании — вероятно, следующая реплика его
+                    speaker = (character, confidence)
+                    narration_gap = 0
+                else:
+                    narration_gap += 1
+                    if narration_gap > self.max_narration_gap:
+                        speaker = None
+            # Системные сообщения не прерывают серию реплик
+
+            turns.append(SpeakerTurn(line_number, line, mode, character, confidence, carried))
+        return turns
+
+
+def test_speaker_timeline():
+    """Тестирование хронологии говорящих"""
+    print("🧪 ТЕСТИРОВАНИЕ ХРОНОЛОГИИ ГОВОРЯЩИХ")
+    print("=" * 50)
+
+    analyzer = SpeakerTimelineAnalyzer()
+    lines = [
+        "Цзян Чэнь посмотрел на гору.",
+        "",
+        "«Да пошло оно всё!»",
+        "",
+        "Динь! За успешное безделье получено: Императорское оружие!",
+        "«Серьёзно?»",
+        "Ветер шумел в соснах.",
+        "Облака плыли над горой.",
+        "Солнце садилось.",
+        "«Кто здесь?»",
+    ]
+
+    timeline = analyzer.analyze(lines)
+    for turn in timeline.turns:
+        if turn.mode == 'empty':
+            continue
+        carried = " (унаследован)" if turn.carried else ""
+        print(f"  {turn.line_number}. [{turn.mode}] {turn.character.value} "
+              f"({turn.confidence:.2f}){carried}: {turn.content[:40]}")
+
+    print(f"📊 {timeline.summary()}")
+    print(f"♻️ Повторный анализ из кэша: {analyzer.analyze(lines) is timeline}")
+    print("✅ Тестирование завершено")
+
+
+if __name__ == "__main__":
+    test_speaker_timeline()
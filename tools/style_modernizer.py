@@ -8,30 +8,16 @@
 import re
 from typing import Dict, List, Tuple
 
+from config import BANNED_ARCHAISMS, ARCHAISM_REPLACEMENTS, MAX_SENTENCE_LENGTH
+from tools.style_rules import StyleRuleEngine, default_rules, rules_from_mapping
+
 class StyleModernizer:
     """Приземляет высокопарный стиль до современного уровня"""
     
     def __init__(self):
-        # Основные замены архаизмов
+        # Основные замены: архаизмы (общие, config.py) и замены модернизатора
         self.basic_replacements = {
-            # Архаизмы
-            "воззрел": "посмотрел",
-            "молвил": "сказал", 
-            "вопрошал": "спрашивал",
-            "весьма": "очень",
-            "чрезвычайно": "очень",
-            "дабы": "чтобы",
-            "ибо": "потому что",
-            "сей": "этот",
-            "сия": "эта", 
-            "оный": "тот",
-            "ныне": "сейчас",
-            "отнюдь": "совсем не",
-            "непременно": "обязательно",
-            "воистину": "правда",
-            "осуществлять": "делать",
-            "производить впечатление": "впечатлять",
-            "испытывать чувство": "чувствовать",
+            **ARCHAISM_REPLACEMENTS,
             
             # Культивационные термины (упрощаем)
             "постичь Дао": "понять Дао",
@@ -60,11 +46,7 @@ class StyleModernizer:
         }
         
         # Запрещённые архаизмы (полностью убираем)
-        self.banned_archaisms = [
-            "сей", "сия", "оный", "дабы", "ибо",
-            "воистину", "весьма", "отнюдь", "непременно",
-            "молвить", "воззреть", "вопрошать", "ныне"
-        ]
+        self.banned_archaisms = BANNED_ARCHAISMS
         
         # Современные замены для молодых персонажей
         self.youth_slang = {
@@ -78,35 +60,102 @@ class StyleModernizer:
             "красивый": "красивый как бог"
         }
         
+        # Упрощение диалогов: только замены, безопасные без проверки контекста
+        # (подсказки линтера вроде "Я собираюсь" → "Буду" вслепую не применяются)
+        self.dialogue_replacements = {
+            "Позвольте мне": "Дай мне",
+            "Не соблаговолите ли вы": "Не могли бы вы",
+            "Осмелюсь спросить": "Можно спросить?",
+            "Сие деяние недопустимо": "Так нельзя",
+            "Воистину могущественный": "Реально мощный",
+            "Я хотел бы": "Хочу",
+            "Кажется, что": "Похоже",
+            "Я боюсь, что": "Боюсь",
+            "Что ты думаешь о": "Как тебе",
+            "Я не понимаю": "Не понимаю",
+            "Это не то, что я имел в виду": "Не то имел в виду",
+            "Я не могу поверить": "Не верю"
+        }
+        
+        # Мысли персонажей
+        self.thoughts_replacements = {
+            # Цзян Чэнь - современный, грубоватый
+            "Jiang_Chen": {
+                "Неужели": "Серьёзно?",
+                "Должен ли я": "Мне что,",
+                "смириться с ролью": "быть",
+                "презренного подхалима": "подхалимом",
+                "Да пошло оно всё": "Да ну нафиг",
+                "не буду я больше": "не буду",
+                "подлизываться": "подлизываться",
+                "безмозглая дева": "дурочка",
+                "вновь являет свою глупость": "опять тупит",
+                "не способна узреть очевидное": "не видит очевидного",
+                "Воистину, терпение моё на исходе": "Блин, как же бесит",
+                "Сия": "Эта",
+                "безмозглая": "дурацкая"
+            },
+            # Е Цинчэн - более формальная, но не архаичная
+            "Ye_Qingcheng": {
+                "Неужели": "Неужели",
+                "Должен ли я": "Мне что",
+                "смириться с ролью": "быть",
+                "презренного подхалима": "подхалимом"
+            }
+        }
+        
+        # Системные уведомления
+        self.system_replacements = {
+            "Оповещение: За успешное уклонение от деятельности": "Динь! За успешное безделье",
+            "Вы удостоены награды:": "Получено:",
+            "благословение:": "награда:",
+            "ниспослала": "дала",
+            "даруется": "получено",
+            "Священная Техника": "Священная техника",
+            "Императорское Орудие": "Императорское оружие",
+            "Всенебесное Зеркало": "«Всенебесное Зеркало»",
+            "Вселенная в Длани": "«Вселенная в Ладони»"
+        }
+        
+        # Лишние эпитеты описаний — одно выражение
+        self.description_pattern = re.compile(
+            r'(?:глубочайшим|непостижимыми|бездонным|всепоглощающим|необъятным|неисчерпаемым)\s+',
+            re.IGNORECASE
+        )
+        
+        # Все замены компилируются в один движок; каждый шаг — один проход по тексту
+        rules = default_rules()
+        rules += rules_from_mapping(self.basic_replacements, "modernize")
+        rules += rules_from_mapping(self.dialogue_replacements, "dialogue")
+        rules += rules_from_mapping(self.youth_slang, "youth_slang")
+        for character, replacements in self.thoughts_replacements.items():
+            rules += rules_from_mapping(replacements, f"thoughts:{character}")
+        rules += rules_from_mapping(self.system_replacements, "system")
+        self.style_engine = StyleRuleEngine(rules)
+        
         # Максимальная длина предложения
-        self.max_sentence_length = 15
+        self.max_sentence_length = MAX_SENTENCE_LENGTH
         
     def modernize_text(self, text: str, character_age: str = "adult") -> str:
         """Модернизирует текст для веб-новеллы"""
         
-        # 1. Заменяем архаизмы
-        modernized = self._replace_archaisms(text)
+        # 1. Заменяем архаизмы и формальные диалоги (и сленг для молодых персонажей) — один проход
+        categories = ["modernize", "dialogue"]
+        if character_age in ["young", "teen", "student"]:
+            categories.append("youth_slang")
+        modernized, _ = self.style_engine.rewrite(text, categories)
         
         # 2. Упрощаем длинные предложения
         modernized = self._simplify_sentences(modernized)
         
-        # 3. Применяем сленг для молодых персонажей
-        if character_age in ["young", "teen", "student"]:
-            modernized = self._apply_youth_slang(modernized)
-            
-        # 4. Улучшаем диалоги
-        modernized = self._modernize_dialogue(modernized)
-        
-        # 5. Упрощаем описания
+        # 3. Упрощаем описания
         modernized = self._simplify_descriptions(modernized)
         
         return modernized
     
     def _replace_archaisms(self, text: str) -> str:
         """Заменяет архаизмы на современные слова"""
-        for old, new in self.basic_replacements.items():
-            text = text.replace(old, new)
-        return text
+        return self.style_engine.rewrite(text, ("modernize",))[0]
     
     def _simplify_sentences(self, text: str) -> str:
         """Разбивает длинные предложения на короткие"""
@@ -155,103 +204,25 @@ class StyleModernizer:
     
     def _apply_youth_slang(self, text: str) -> str:
         """Применяет молодёжный сленг"""
-        for old, new in self.youth_slang.items():
-            text = text.replace(old, new)
-        return text
+        return self.style_engine.rewrite(text, ("youth_slang",))[0]
     
     def _modernize_dialogue(self, text: str) -> str:
-        """Улучшает диалоги"""
-        # Убираем излишнюю вежливость
-        dialogue_replacements = {
-            "Позвольте мне": "Дай мне",
-            "Не соблаговолите ли вы": "Не могли бы вы",
-            "Осмелюсь спросить": "Можно спросить?",
-            "Сие деяние недопустимо": "Так нельзя",
-            "Воистину могущественный": "Реально мощный",
-            "Я хотел бы": "Хочу",
-            "Кажется, что": "Похоже",
-            "Я боюсь, что": "Боюсь",
-            "Что ты думаешь о": "Как тебе",
-            "Я не понимаю": "Не понимаю",
-            "Это не то, что я имел в виду": "Не то имел в виду",
-            "Я не могу поверить": "Не верю"
-        }
-        
-        for old, new in dialogue_replacements.items():
-            text = text.replace(old, new)
-        
-        return text
+        """Улучшает диалоги (убирает излишнюю вежливость)"""
+        return self.style_engine.rewrite(text, ("dialogue",))[0]
     
     def _simplify_descriptions(self, text: str) -> str:
-        """Упрощает описания"""
-        # Убираем излишние эпитеты
-        description_patterns = [
-            (r'глубочайшим\s+', ''),
-            (r'непостижимыми\s+', ''),
-            (r'бездонным\s+', ''),
-            (r'всепоглощающим\s+', ''),
-            (r'необъятным\s+', ''),
-            (r'неисчерпаемым\s+', ''),
-        ]
-        
-        for pattern, replacement in description_patterns:
-            text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-        
-        return text
+        """Упрощает описания (убирает излишние эпитеты)"""
+        return self.description_pattern.sub('', text)
     
     def modernize_character_thoughts(self, text: str, character: str) -> str:
         """Модернизирует мысли персонажа"""
-        if character == "Jiang_Chen":
-            # Цзян Чэнь - современный, грубоватый
-            thoughts_replacements = {
-                "Неужели": "Серьёзно?",
-                "Должен ли я": "Мне что,",
-                "смириться с ролью": "быть",
-                "презренного подхалима": "подхалимом",
-                "Да пошло оно всё": "Да ну нафиг",
-                "не буду я больше": "не буду",
-                "подлизываться": "подлизываться",
-                "безмозглая дева": "дурочка",
-                "вновь являет свою глупость": "опять тупит",
-                "не способна узреть очевидное": "не видит очевидного",
-                "Воистину, терпение моё на исходе": "Блин, как же бесит",
-                "Сия": "Эта",
-                "безмозглая": "дурацкая"
-            }
-        elif character == "Ye_Qingcheng":
-            # Е Цинчэн - более формальная, но не архаичная
-            thoughts_replacements = {
-                "Неужели": "Неужели",
-                "Должен ли я": "Мне что",
-                "смириться с ролью": "быть",
-                "презренного подхалима": "подхалимом"
-            }
-        else:
-            thoughts_replacements = {}
-        
-        for old, new in thoughts_replacements.items():
-            text = text.replace(old, new)
-        
-        return text
+        if character not in self.thoughts_replacements:
+            return text
+        return self.style_engine.rewrite(text, (f"thoughts:{character}",))[0]
     
     def modernize_system_notifications(self, text: str) -> str:
         """Модернизирует системные уведомления"""
-        system_replacements = {
-            "Оповещение: За успешное уклонение от деятельности": "Динь! За успешное безделье",
-            "Вы удостоены награды:": "Получено:",
-            "благословение:": "награда:",
-            "ниспослала": "дала",
-            "даруется": "получено",
-            "Священная Техника": "Священная техника",
-            "Императорское Орудие": "Императорское оружие",
-            "Всенебесное Зеркало": "«Всенебесное Зеркало»",
-            "Вселенная в Длани": "«Вселенная в Ладони»"
-        }
-        
-        for old, new in system_replacements.items():
-            text = text.replace(old, new)
-        
-        return text
+        return self.style_engine.rewrite(text, ("system",))[0]
     
     def calculate_readability_score(self, text: str) -> Dict[str, float]:
         """Рассчитывает показатели читабельности"""
@@ -261,9 +232,8 @@ class StyleModernizer:
         # Средняя длина предложения
         avg_sentence_length = len(words) / len(sentences) if sentences else 0
         
-        # Количество архаизмов
-        archaism_count = sum(1 for archaism in self.banned_archaisms 
-                           if archaism in text.lower())
+        # Количество архаизмов (разных)
+        archaism_count = len({match.rule.pattern for match in self.style_engine.scan(text, ("archaism",))})
         
         # Процент длинных предложений
         long_sentences = sum(1 for sentence in sentences 
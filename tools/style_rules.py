@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Единый движок стилевых правил: архаизмы, кальки, формальные диалоги
+Списки правил берутся из config.py и компилируются в одно регулярное
+выражение на набор категорий; проверка и замены выполняются за один проход
+по тексту, для каждого срабатывания известны строка и позиция в строке.
+Проверка находит и вложенные фразы ("воистину" внутри "Воистину могущественный"),
+замены — только непересекающиеся, самые длинные.
+Используется линтером, валидатором, модернизатором и переводчиком глав
+"""
+
+import re
+import hashlib
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import (BANNED_ARCHAISMS, ARCHAISM_REPLACEMENTS, CALQUES,
+                    FORMAL_DIALOGUE, NATURAL_DIALOGUE_MARKERS)
+from tools.glossary_replacer import term_pattern
+
+
+@dataclass(frozen=True)
+class StyleRule:
+    """Правило: фраза, категория и (необязательно) замена"""
+    pattern: str
+    category: str
+    replacement: Optional[str] = None
+    ignore_case: bool = False
+
+
+@dataclass
+class RuleMatch:
+    """Срабатывание правила (строка и столбец считаются с 1)"""
+    rule: StyleRule
+    start: int
+    end: int
+    line: int
+    column: int
+    text: str
+
+    def context(self, source: str, width: int = 30) -> str:
+        """Фрагмент исходного текста вокруг срабатывания"""
+        return source[max(0, self.start - width):self.end + width]
+
+
+@dataclass
+class _CompiledRules:
+    """Скомпилированный набор категорий"""
+    pattern: Optional["re.Pattern"]          # Непересекающиеся совпадения (для замен)
+    overlapping: Optional["re.Pattern"]      # Просмотр вперёд на каждой позиции (для проверки)
+    rule_groups: List[List[StyleRule]]       # Группа выражения → правила фразы
+    prefixes: List[List[Tuple[int, "re.Pattern"]]]  # Группа → более короткие фразы-префиксы
+
+
+class StyleRuleEngine:
+    """Набор правил с ленивой компиляцией по наборам категорий"""
+
+    def __init__(self, rules: Iterable[StyleRule]):
+        self.rules = [rule for rule in rules if rule.pattern]
+        self._compiled: Dict[Optional[Tuple[str, ...]], "_CompiledRules"] = {}
+        # Хэш загруженных правил: меняется только вместе с самими правилами
+        self.version = hashlib.md5(
+            '\x1e'.join(repr(rule) for rule in self.rules).encode('utf-8')
+        ).hexdigest()
+
+    def categories(self) -> List[str]:
+        return list(dict.fromkeys(rule.category for rule in self.rules))
+
+    def _compile(self, categories: Optional[Sequence[str]]):
+        """Одно выражение для правил выбранных категорий; группа выражения → правила"""
+        key = tuple(categories) if categories is not None else None
+        compiled = self._compiled.get(key)
+        if compiled is not None:
+            return compiled
+
+        # Одинаковые фразы разных категорий — одна альтернатива (срабатывают вместе);
+        # регистр для правил с учётом регистра проверяется при срабатывании
+        groups: Dict[str, List[StyleRule]] = {}
+        order = {category: index for index, category in enumerate(key or ())}
+        for rule in self.rules:
+            if categories is None or rule.category in order:
+                groups.setdefault(rule.pattern.lower(), []).append(rule)
+
+        # Самые длинные фразы раньше: на каждой позиции побеждает самая длинная
+        alternatives = sorted(groups.items(), key=lambda item: len(item[0]), reverse=True)
+        parts = []
+        rule_groups: List[List[StyleRule]] = []
+        for _, rules in alternatives:
+            pattern = term_pattern(rules[0].pattern)
+            if any(rule.ignore_case for rule in rules) or len({rule.pattern for rule in rules}) > 1:
+                pattern = f"(?i:{pattern})"
+            parts.append(pattern)
+            rule_groups.append(sorted(rules, key=lambda rule: order.get(rule.category, 0)))
+
+        # Более короткие фразы, с которых начинается длинная: на той же позиции
+        # проверяются отдельно (просмотр вперёд находит только самую длинную)
+        prefixes: List[List[Tuple[int, "re.Pattern"]]] = []
+        for index, (phrase, _) in enumerate(alternatives):
+            prefixes.append([
+                (other, re.compile(parts[other]))
+                for other, (shorter, _) in enumerate(alternatives)
+                if len(shorter) < len(phrase) and phrase.startswith(shorter)
+            ])
+
+        groups_pattern = '|'.join(f"({part})" for part in parts)
+        compiled = _CompiledRules(
+            re.compile(groups_pattern) if parts else None,
+            re.compile(f"(?=(?:{groups_pattern}))") if parts else None,
+            rule_groups,
+            prefixes
+        )
+        self._compiled[key] = compiled
+        return compiled
+
+    @staticmethod
+    def _matching_rules(rules: List[StyleRule], text: str) -> List[StyleRule]:
+        return [rule for rule in rules if rule.ignore_case or rule.pattern == text]
+
+    @staticmethod
+    def _line_starts(text: str) -> List[int]:
+        starts = [0]
+        position = text.find('\n')
+        while position != -1:
+            starts.append(position + 1)
+            position = text.find('\n', position + 1)
+        return starts
+
+    def scan(self, text: str, categories: Optional[Sequence[str]] = None) -> List[RuleMatch]:
+        """Все срабатывания правил за один проход, включая пересекающиеся и вложенные
+
+        Результат не зависит от набора категорий: скан всех категорий сразу
+        равен объединению сканов по отдельности.
+        """
+        compiled = self._compile(categories)
+        if compiled.overlapping is None or not text:
+            return []
+
+        line_starts = self._line_starts(text)
+        matches = []
+        for found in compiled.overlapping.finditer(text):
+            start = found.start()
+            line = bisect_right(line_starts, start)
+            column = start - line_starts[line - 1] + 1
+
+            hits = [(found.lastindex - 1, found.group(found.lastindex))]
+            for other, prefix_pattern in compiled.prefixes[found.lastindex - 1]:
+                prefix_match = prefix_pattern.match(text, start)
+                if prefix_match:
+                    hits.append((other, prefix_match.group(0)))
+
+            for index, matched in hits:
+                for rule in self._matching_rules(compiled.rule_groups[index], matched):
+                    matches.append(RuleMatch(rule, start, start + len(matched), line, column, matched))
+        return matches
+
+    def rewrite(self, text: str, categories: Optional[Sequence[str]] = None) -> Tuple[str, List[RuleMatch]]:
+        """Применить замены за один проход; вернуть текст и применённые срабатывания
+
+        Если фраза есть в нескольких категориях, берётся замена первой
+        категории из переданного списка.
+        """
+        compiled = self._compile(categories)
+        if compiled.pattern is None or not text:
+            return text, []
+
+        applied: List[RuleMatch] = []
+        line_starts = self._line_starts(text)
+
+        def substitute(found: "re.Match") -> str:
+            for rule in self._matching_rules(compiled.rule_groups[found.lastindex - 1], found.group(0)):
+                if rule.replacement is not None:
+                    line = bisect_right(line_starts, found.start())
+                    applied.append(RuleMatch(rule, found.start(), found.end(), line,
+                                             found.start() - line_starts[line - 1] + 1, found.group(0)))
+                    return rule.replacement
+            return found.group(0)
+
+        return compiled.pattern.sub(substitute, text), applied
+
+    def replacement(self, phrase: str, categories: Optional[Sequence[str]] = None) -> Optional[str]:
+        """Замена для отдельной фразы (без поиска по тексту)"""
+        for rule in self.rules:
+            if categories is not None and rule.category not in categories:
+                continue
+            matched = rule.pattern.lower() == phrase.lower() if rule.ignore_case else rule.pattern == phrase
+            if matched and rule.replacement is not None:
+                return rule.replacement
+        return None
+
+
+def rules_from_mapping(mapping: Dict[str, Optional[str]], category: str,
+                       ignore_case: bool = False) -> List[StyleRule]:
+    """Правила из словаря {фраза: замена}"""
+    return [StyleRule(pattern, category, replacement, ignore_case) for pattern, replacement in mapping.items()]
+
+
+def default_rules() -> List[StyleRule]:
+    """Общие правила стиля из config.py
+
+    Категории: archaism (запрещённые архаизмы, без учёта регистра),
+    archaism_replacement (современные замены), calque, formal_dialogue,
+    natural_dialogue (признаки разговорной речи, без замен).
+    """
+    rules = [
+        StyleRule(word, "archaism", ARCHAISM_REPLACEMENTS.get(word), ignore_case=True)
+        for word in BANNED_ARCHAISMS
+    ]
+    rules += rules_from_mapping(ARCHAISM_REPLACEMENTS, "archaism_replacement")
+    rules += rules_from_mapping(CALQUES, "calque")
+    rules += rules_from_mapping(FORMAL_DIALOGUE, "formal_dialogue")
+    rules += [StyleRule(marker, "natural_dialogue") for marker in NATURAL_DIALOGUE_MARKERS]
+    return rules
+
+
+_shared_engine: Optional[StyleRuleEngine] = None
+
+
+def get_style_engine() -> StyleRuleEngine:
+    """Движок с общими правилами (один на процесс, компиляция по первому запросу)"""
+    global _shared_engine
+    if _shared_engine is None:
+        _shared_engine = StyleRuleEngine(default_rules())
+    return _shared_engine
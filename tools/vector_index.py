@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Векторный индекс памяти переводов на NumPy (полный перебор)
+Для памяти в десятки тысяч строк одно матрично-векторное произведение по
+непрерывной матрице быстрее HNSW в SQLite и не требует запуска ChromaDB
+
+Файлы индекса:
+    vectors.npy        нормализованные embeddings (memmap, с запасом ёмкости)
+    vectors.ids.jsonl  сайдкар: id записи → строка матрицы и хэш текста
+    vectors.meta.json  модель, размерность, тип и число занятых строк
+"""
+
+import json
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from tools.embeddings import EmbeddingModel
+from tools.embedding_cache import grow_npy_memmap
+from tools.file_lock import FileLock, atomic_write_json
+
+
+class NumpyVectorIndex:
+    """Индекс "id → нормализованный вектор" с поиском top-k по косинусной схожести
+
+    Подключается к JsonlMemoryStore как индекс по исходному тексту (add/remove/clear).
+    Новые строки считаются пакетно при следующем поиске; векторы строк,
+    чей текст не изменился, переиспользуются из файла без пересчёта.
+    Файлы общие для процессов: запись строк и рост матрицы — под блокировкой,
+    число занятых строк перечитывается из сайдкара.
+    """
+
+    def __init__(self, index_dir: Union[str, Path], model: EmbeddingModel,
+                 dtype: str = "float32", initial_capacity: int = 1024,
+                 lock_timeout: float = 30.0):
+        self.index_dir = Path(index_dir)
+        self.model = model
+        self.dtype = np.dtype(dtype)
+        self.initial_capacity = initial_capacity
+        self.lock_timeout = lock_timeout
+
+        self.vectors_file = self.index_dir / "vectors.npy"
+        self.ids_file = self.index_dir / "vectors.ids.jsonl"
+        self.meta_file = self.index_dir / "vectors.meta.json"
+        self.lock_path = self.index_dir / "vectors.lock"
+
+        # Все строки файла: id → (строка, хэш текста); живые строки — маска
+        self._rows: Dict[str, Tuple[int, str]] = {}
+        self._row_ids: List[Optional[str]] = []
+        self._live_ids: Dict[str, int] = {}
+        self._pending: Dict[str, str] = {}
+
+        self._matrix: Optional[np.ndarray] = None
+        self._live_mask: Optional[np.ndarray] = None
+        self._ids_offset = 0
+        self.count = 0
+
+        self.stats = {"queries": 0, "embedded": 0, "reused": 0}
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        with FileLock(self.lock_path, timeout=self.lock_timeout):
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._live_ids) + len(self._pending)
+
+    @staticmethod
+    def _text_hash(text: str) -> str:
+        return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Файлы
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        """Открыть матрицу и сайдкар, если они построены той же моделью (под блокировкой)"""
+        if not (self.vectors_file.exists() and self.ids_file.exists() and self.meta_file.exists()):
+            return
+        try:
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get("dtype") != self.dtype.name or meta.get("model_id") != self.model.model_id:
+                # Векторы другой модели несовместимы — хранилище добавит записи заново
+                print("🔄 Модель embeddings изменилась, векторный индекс перестраивается")
+                self._reset_files()
+                return
+
+            self._read_ids()
+        except Exception as e:
+            print(f"⚠️ Ошибка загрузки векторного индекса, он будет перестроен: {e}")
+            self._reset_files()
+
+    def _read_ids(self):
+        """Дочитать строки сайдкара, добавленные после последнего чтения (в том числе другими процессами)"""
+        if not self.ids_file.exists():
+            return
+        with open(self.ids_file, 'rb') as f:
+            f.seek(self._ids_offset)
+            for raw_line in f:
+                if not raw_line.endswith(b'\n'):
+                    break
+                self._ids_offset += len(raw_line)
+                entry = json.loads(raw_line)
+                self._assign_row(entry["id"], entry["row"], entry["hash"])
+                self.count = max(self.count, entry["row"] + 1)
+
+        # Файл мог быть создан или увеличен другим процессом — переоткрываем отображение
+        if self.count and (self._matrix is None or self.count > len(self._matrix)):
+            self._matrix = None
+            self._matrix = np.load(self.vectors_file, mmap_mode='r+')
+            live_mask = np.zeros(len(self._matrix), dtype=bool)
+            if self._live_mask is not None:
+                live_mask[:len(self._live_mask)] = self._live_mask
+            self._live_mask = live_mask
+
+    def _reset_files(self):
+        self._matrix = None
+        self._live_mask = None
+        self._rows.clear()
+        self._row_ids = []
+        self._live_ids.clear()
+        self._ids_offset = 0
+        self.count = 0
+        for path in (self.vectors_file, self.ids_file, self.meta_file):
+            if path.exists():
+                path.unlink()
+
+    def _ensure_capacity(self, rows_needed: int, dim: int):
+        """Выделить место под новые строки (удвоение ёмкости с копированием)"""
+        capacity = 0 if self._matrix is None else len(self._matrix)
+        if self.count + rows_needed <= capacity:
+            return
+
+        new_capacity = max(self.initial_capacity, capacity * 2, self.count + rows_needed)
+        # Отображение закрываем до замены файла (строки копируются из самого файла)
+        self._matrix = None
+        self._matrix = grow_npy_memmap(self.vectors_file, self.count, new_capacity, dim, self.dtype)
+
+        live_mask = np.zeros(new_capacity, dtype=bool)
+        if self._live_mask is not None:
+            live_mask[:len(self._live_mask)] = self._live_mask
+        self._live_mask = live_mask
+
+    def _assign_row(self, entry_id: str, row: int, text_hash: str):
+        while len(self._row_ids) <= row:
+            self._row_ids.append(None)
+        previous = self._rows.get(entry_id)
+        if previous is not None and previous[0] != row:
+            self._row_ids[previous[0]] = None
+        self._rows[entry_id] = (row, text_hash)
+        self._row_ids[row] = entry_id
+
+    # ------------------------------------------------------------------
+    # Интерфейс индекса хранилища
+    # ------------------------------------------------------------------
+
+    def add(self, entry_id: str, text: str):
+        """Добавить запись; вектор считается при следующем поиске или flush()"""
+        self.remove(entry_id)
+        stored = self._rows.get(entry_id)
+        if stored is not None and stored[1] == self._text_hash(text) and self._matrix is not None:
+            self._live_ids[entry_id] = stored[0]
+            self._live_mask[stored[0]] = True
+            self.stats["reused"] += 1
+        elif text.strip():
+            self._pending[entry_id] = text
+
+    def remove(self, entry_id: str):
+        """Убрать запись из поиска (строка матрицы остаётся до компакции)"""
+        self._pending.pop(entry_id, None)
+        row = self._live_ids.pop(entry_id, None)
+        if row is not None:
+            self._live_mask[row] = False
+
+    def clear(self):
+        """Снять все записи с поиска (векторы в файле сохраняются для переиспользования)"""
+        self._live_ids.clear()
+        self._pending.clear()
+        if self._live_mask is not None:
+            self._live_mask[:] = False
+
+    def flush(self):
+        """Посчитать векторы ожидающих записей одним пакетом и дописать их в файл"""
+        if not self._pending:
+            return
+
+        items = list(self._pending.items())
+        self._pending.clear()
+        vectors = self.model.encode([text for _, text in items])
+
+        with FileLock(self.lock_path, timeout=self.lock_timeout):
+            # Строки, записанные другими процессами, занимают место до нас
+            self._read_ids()
+            self._ensure_capacity(len(items), vectors.shape[1])
+            start = self.count
+            self._matrix[start:start + len(items)] = vectors.astype(self.dtype)
+            self._matrix.flush()
+
+            lines = []
+            for offset, (entry_id, text) in enumerate(items):
+                row = start + offset
+                text_hash = self._text_hash(text)
+                self._assign_row(entry_id, row, text_hash)
+                self._live_ids[entry_id] = row
+                self._live_mask[row] = True
+                lines.append(json.dumps({"id": entry_id, "row": row, "hash": text_hash}))
+            self.count = start + len(items)
+
+            with open(self.ids_file, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            self._ids_offset = self.ids_file.stat().st_size
+            atomic_write_json(self.meta_file, {
+                "model_id": self.model.model_id,
+                "dim": int(vectors.shape[1]),
+                "dtype": self.dtype.name,
+                "count": self.count
+            })
+        self.stats["embedded"] += len(items)
+
+    # ------------------------------------------------------------------
+    # Поиск
+    # ------------------------------------------------------------------
+
+    def search_many(self, texts: List[str], threshold: float,
+                    max_results: int) -> List[List[Tuple[float, str]]]:
+        """Top-k похожих записей для каждой строки: [(косинусная схожесть, id)]"""
+        self.flush()
+        self.stats["queries"] += len(texts)
+        if not texts or not self._live_ids:
+            return [[] for _ in texts]
+
+        queries = self.model.encode(texts).astype(self.dtype)
+        scores = self._matrix[:self.count] @ queries.T
+        scores[~self._live_mask[:self.count]] = -np.inf
+
+        k = min(max_results, len(self._live_ids))
+        results = []
+        for column in range(len(texts)):
+            column_scores = scores[:, column]
+            top = np.argpartition(-column_scores, k - 1)[:k]
+            top = top[np.argsort(-column_scores[top], kind='stable')]
+            results.append([
+                (float(column_scores[row]), self._row_ids[row])
+                for row in top if column_scores[row] >= threshold
+            ])
+        return results
+
+    def search(self, text: str, threshold: float, max_results: int) -> List[Tuple[float, str]]:
+        """Top-k похожих записей для одной строки"""
+        return self.search_many([text], threshold, max_results)[0]